@@ -1,26 +1,85 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select, tuple_, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta, timezone
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import threading
 import time
 import os
+import io
+import csv
+import json
+import hmac
+import base64
+import ipaddress
+from types import SimpleNamespace
 from functools import wraps
+from urllib.parse import urlparse
 from dotenv import load_dotenv
+import logging
+import metricas
+import registro
+import perfilado
+import backup
+import estaticos
+import migraciones
 
-# Cargar variables de entorno
-load_dotenv()
+# Flask con inicialización diferida: importar app.py no lee el .env, no abre la
+# base de datos ni arranca hilos; create_app() lo hace en el primer uso real
+# (primera petición, app_context() o llamada explícita), ya dentro de cada worker
+class AdminSkypass(Flask):
+    def __call__(self, environ, start_response):
+        create_app()
+        return super().__call__(environ, start_response)
 
-app = Flask(__name__, static_folder='static', static_url_path='/static')
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'tu-clave-secreta-aqui')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///isps.db')
+    def app_context(self):
+        create_app()
+        return super().app_context()
+
+    def test_request_context(self, *args, **kwargs):
+        create_app()
+        return super().test_request_context(*args, **kwargs)
+
+app = AdminSkypass(__name__, static_folder='static', static_url_path='/static')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+
+_app_lock = threading.RLock()
+_app_configurada = [False]
+# True mientras create_app() corre: los app_context() de su interior no re-entran
+_app_configurando = [False]
+
+# SQLite: esperar a que se libere la base (backup, restauración, otro proceso)
+# en lugar de fallar enseguida con "database is locked"
+def configurar_conexion_sqlite(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(os.getenv('SQLITE_BUSY_TIMEOUT', 30000))}")
+    cursor.close()
+
+# Pool de conexiones para servidores de base de datos (PostgreSQL)
+# pool_size por worker: con varios workers de gunicorn el total es
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) y debe caber en max_connections
+def opciones_motor(url, env_config):
+    if url.startswith('sqlite'):
+        return {}
+    opciones = {
+        'pool_size': int(env_config.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(env_config.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(env_config.get('DB_POOL_TIMEOUT', 30)),
+        # Reciclar antes de que un firewall o PgBouncer corte las conexiones inactivas
+        'pool_recycle': int(env_config.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+    if url.startswith('postgresql'):
+        # Las fechas se guardan en UTC sin zona: la sesión también en UTC
+        opciones['connect_args'] = {
+            'connect_timeout': int(env_config.get('DB_CONNECT_TIMEOUT', 10)),
+            'options': '-c timezone=utc',
+        }
+    return opciones
 
 # Función para leer configuración del .env en tiempo real
 def get_env_config():
@@ -40,10 +99,58 @@ def get_env_config():
     
     return config
 
-# Configuración inicial
-env_config = get_env_config()
-GMAIL_USER = env_config['GMAIL_USER']
-GMAIL_PASSWORD = env_config['GMAIL_PASSWORD']
+# Configurar la aplicación una sola vez por proceso (idempotente)
+def create_app():
+    # Camino rápido sin el lock: la bandera solo se activa con la configuración completa
+    if _app_configurada[0]:
+        return app
+    with _app_lock:
+        if _app_configurada[0] or _app_configurando[0]:
+            return app
+        _app_configurando[0] = True
+        try:
+            # Cargar variables de entorno
+            load_dotenv()
+            env_config = get_env_config()
+            
+            app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'tu-clave-secreta-aqui')
+            app.config['SQLALCHEMY_DATABASE_URI'] = migraciones.normalizar_url(os.getenv('DATABASE_URL', 'sqlite:///isps.db'))
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_motor(app.config['SQLALCHEMY_DATABASE_URI'], env_config)
+            db.init_app(app)
+            
+            with app.app_context():
+                if db.engine.url.get_backend_name() == 'sqlite':
+                    event.listen(db.engine, 'connect', configurar_conexion_sqlite)
+            
+            # Registro estructurado (JSON por cola, sin bloquear el monitoreo)
+            registro.configurar_registro(
+                nivel=env_config.get('LOG_LEVEL', 'INFO').upper(),
+                ventana_repeticiones=int(env_config.get('LOG_VENTANA_REPETICIONES', 3600))
+            )
+            
+            # Perfilado de peticiones (opcional): tiempos SQL/plantillas y log de peticiones lentas
+            if env_config.get('PROFILING', 'False').lower() == 'true':
+                perfilado.init_perfilado(
+                    app, db,
+                    umbral_ms=int(env_config.get('PROFILING_UMBRAL_MS', 500)),
+                    archivo_log=env_config.get('PROFILING_LOG', 'peticiones_lentas.log')
+                )
+            
+            # Archivos estáticos con huella de contenido, caché inmutable y variantes gzip/brotli
+            estaticos.init_estaticos(app)
+            
+            # Solo se marca configurada si todo lo anterior terminó bien
+            _app_configurada[0] = True
+        except Exception:
+            # El próximo create_app() vuelve a intentarlo con la base sin registrar
+            app.extensions.pop('sqlalchemy', None)
+            raise
+        finally:
+            _app_configurando[0] = False
+        
+        return app
+
+logger = logging.getLogger('skypass.monitoreo')
 SMTP_SERVER = 'smtp.gmail.com'
 SMTP_PORT = 587
 
@@ -59,11 +166,53 @@ class ISP(db.Model):
     dispositivos_actuales = db.Column(db.Integer, default=0)
     ultima_verificacion = db.Column(db.DateTime)
     ultima_alerta = db.Column(db.DateTime)
+    # Último cambio de un dato visible en la API (ver CAMPOS_ISP_SINCRONIZADOS)
+    fecha_actualizacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    # agregar_isp y editar_isp buscan por ip_vm en cada guardado;
+    # la API filtra por fecha_actualizacion (updated_since)
+    __table_args__ = (
+        db.Index('ix_isp_ip_vm', 'ip_vm', unique=True),
+        db.Index('ix_isp_fecha_actualizacion', 'fecha_actualizacion'),
+    )
+
+# Bajas de ISPs para la API: una sincronización con updated_since no ve las filas borradas
+class ISPEliminado(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_id = db.Column(db.Integer, nullable=False)  # Sin clave foránea: el ISP ya no existe
+    fecha_eliminacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.Index('ix_isp_eliminado_fecha', 'fecha_eliminacion'),
+    )
+
+# Marcar el ISP como actualizado solo cuando cambia un valor (no en cada sondeo con el mismo conteo)
+CAMPOS_ISP_SINCRONIZADOS = ('nombre', 'ip_vm', 'genieacs_url', 'limite_clientes', 'email_alerta', 'dispositivos_actuales')
+
+def _isp_cambiado(isp):
+    estado = inspect(isp)
+    for campo in CAMPOS_ISP_SINCRONIZADOS:
+        historial = estado.attrs[campo].history
+        if historial.has_changes() and list(historial.added) != list(historial.deleted):
+            return True
+    return False
+
+# La fecha se toma al escribir la fila y no al asignar el atributo: el monitoreo
+# asigna el conteo y hace commit después de enviar la alerta por SMTP
+@event.listens_for(Session, 'before_flush')
+def _sellar_cambios_isp(session, flush_context, instances):
+    ahora = datetime.now(timezone.utc)
+    for objeto in session.dirty:
+        if isinstance(objeto, ISP) and _isp_cambiado(objeto):
+            objeto.fecha_actualizacion = ahora
+    for objeto in session.deleted:
+        if isinstance(objeto, ISP):
+            session.add(ISPEliminado(isp_id=objeto.id, fecha_eliminacion=ahora))
 
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
 
 class Alerta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -72,8 +221,160 @@ class Alerta(db.Model):
     fecha_envio = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     enviada = db.Column(db.Boolean, default=False)
     
-    # Relación con ISP
-    isp = db.relationship('ISP', backref=db.backref('alertas', lazy=True))
+    # El dashboard ordena por fecha_envio; las consultas por ISP filtran por isp_id y fecha
+    __table_args__ = (
+        db.Index('ix_alerta_fecha_envio', 'fecha_envio'),
+        db.Index('ix_alerta_isp_fecha', 'isp_id', 'fecha_envio'),
+    )
+    
+    # Relación con ISP (se elimina junto con el ISP; PostgreSQL sí exige la clave foránea)
+    isp = db.relationship('ISP', backref=db.backref('alertas', lazy=True, cascade='all, delete-orphan'))
+
+class EstadoSondeoISP(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_id = db.Column(db.Integer, db.ForeignKey('isp.id'), nullable=False, unique=True)
+    # Marca de agua: _registered más reciente visto en GenieACS
+    hwm_registered = db.Column(db.String(30))
+    # _id (JSON) ya contados con _registered igual a la marca: el delta usa $gte
+    ids_en_marca = db.Column(db.Text)
+    conteo = db.Column(db.Integer, default=0)
+    ultima_reconciliacion = db.Column(db.DateTime)
+    
+    # Relación con ISP (se elimina junto con el ISP)
+    isp = db.relationship('ISP', backref=db.backref('estado_sondeo', uselist=False, cascade='all, delete-orphan'))
+
+class IntentoSondeo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_id = db.Column(db.Integer, db.ForeignKey('isp.id'), nullable=False)
+    fecha = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    endpoint = db.Column(db.String(30))
+    resultado = db.Column(db.String(30))  # ok, error_http, timeout, error_conexion, json_invalido, formato_inesperado
+    http_status = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
+    latencia_ms = db.Column(db.Float)
+    parseo_ms = db.Column(db.Float)
+    error = db.Column(db.String(100))  # Clase del error
+    
+    __table_args__ = (db.Index('ix_intento_sondeo_isp_fecha', 'isp_id', 'fecha'),)
+    
+    # Relación con ISP (se elimina junto con el ISP)
+    isp = db.relationship('ISP', backref=db.backref('intentos_sondeo', lazy='dynamic', cascade='all, delete-orphan'))
+
+class ConteoDispositivos(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_id = db.Column(db.Integer, db.ForeignKey('isp.id'), nullable=False)
+    fecha = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    dispositivos = db.Column(db.Integer, nullable=False)
+    limite_clientes = db.Column(db.Integer)  # Límite vigente al momento del conteo
+    
+    # Las exportaciones filtran por rango de fechas y, opcionalmente, por ISP
+    __table_args__ = (
+        db.Index('ix_conteo_fecha', 'fecha'),
+        db.Index('ix_conteo_isp_fecha', 'isp_id', 'fecha'),
+    )
+    
+    # Relación con ISP (se elimina junto con el ISP)
+    isp = db.relationship('ISP', backref=db.backref('conteos', lazy='dynamic', cascade='all, delete-orphan'))
+
+class DesgloseISP(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_id = db.Column(db.Integer, db.ForeignKey('isp.id'), nullable=False, unique=True)
+    total = db.Column(db.Integer, default=0)
+    # Conteos agregados guardados como JSON ({valor: cantidad})
+    fabricantes = db.Column(db.Text, default='{}')
+    modelos = db.Column(db.Text, default='{}')
+    versiones = db.Column(db.Text, default='{}')
+    antiguedad_inform = db.Column(db.Text, default='{}')
+    fecha_actualizacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    # Relación con ISP (se elimina junto con el ISP)
+    isp = db.relationship('ISP', backref=db.backref('desglose', uselist=False, cascade='all, delete-orphan'))
+    
+    def to_dict(self):
+        return {
+            'isp_id': self.isp_id,
+            'total': self.total,
+            'fabricantes': json.loads(self.fabricantes or '{}'),
+            'modelos': json.loads(self.modelos or '{}'),
+            'versiones': json.loads(self.versiones or '{}'),
+            'antiguedad_inform': json.loads(self.antiguedad_inform or '{}'),
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
+        }
+
+# Último latido de cada tarea programada. Va en la base porque las tareas corren
+# en el proceso de monitoreo y /readyz responde desde los workers de gunicorn
+class LatidoTarea(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(30), nullable=False, unique=True)
+    latido = db.Column(db.DateTime, nullable=False)
+    intervalo = db.Column(db.Integer, nullable=False)  # Segundos esperados entre latidos
+    proceso = db.Column(db.String(100))  # host:pid del proceso de monitoreo
+
+# Función para crear o actualizar el esquema con las migraciones versionadas (migraciones.py)
+def inicializar_base_datos():
+    if db.engine.url.get_backend_name() == 'sqlite':
+        # WAL: los backups en caliente y las lecturas no bloquean a los escritores
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    migraciones.aplicar_migraciones(db.engine)
+    
+    # Reintentar los índices que una migración no pudo crear (p. ej. ip_vm duplicadas)
+    for tabla in db.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            try:
+                indice.create(db.engine, checkfirst=True)
+            except Exception as e:
+                # Por ejemplo, ip_vm duplicadas impiden crear el índice único
+                logger.warning(f"No se pudo crear el índice {indice.name}: {str(e)}")
+
+# Función para archivar alertas antiguas fuera de la base principal
+# Se escriben por lotes en archivos NDJSON comprimidos (uno por mes) y luego se borran
+def archivar_alertas(dias=None, lote=5000, directorio=None):
+    import gzip
+    
+    current_config = get_env_config()
+    dias = dias or int(current_config.get('ALERTAS_RETENCION_DIAS', 180))
+    directorio = directorio or current_config.get('ALERTAS_ARCHIVO_DIR', 'archivo_alertas')
+    corte = datetime.now(timezone.utc) - timedelta(days=dias)
+    os.makedirs(directorio, exist_ok=True)
+    
+    total = 0
+    while True:
+        filas = db.session.query(
+            Alerta.id, Alerta.isp_id, Alerta.mensaje, Alerta.fecha_envio, Alerta.enviada
+        ).filter(Alerta.fecha_envio < corte).order_by(Alerta.fecha_envio).limit(lote).all()
+        if not filas:
+            break
+        
+        # Agrupar por mes para que cada archivo cubra un periodo fijo
+        por_mes = {}
+        for fila in filas:
+            por_mes.setdefault(fila.fecha_envio.strftime('%Y-%m'), []).append(fila)
+        
+        for mes, filas_mes in por_mes.items():
+            ruta = os.path.join(directorio, f"alertas_{mes}.ndjson.gz")
+            # gzip admite miembros concatenados: se puede abrir en modo append
+            with gzip.open(ruta, 'at', encoding='utf-8') as f:
+                for fila in filas_mes:
+                    f.write(json.dumps({
+                        'id': fila.id,
+                        'isp_id': fila.isp_id,
+                        'mensaje': fila.mensaje,
+                        'fecha_envio': fila.fecha_envio.isoformat(),
+                        'enviada': fila.enviada
+                    }, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        
+        # Borrar solo después de que el lote quedó escrito en disco
+        ids = [fila.id for fila in filas]
+        Alerta.query.filter(Alerta.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    
+    if total:
+        logger.info(f"Alertas archivadas: {total} (anteriores a {corte.date()}) en {directorio}")
+    return total
 
 # Decorador para requerir login
 def login_required(f):
@@ -84,37 +385,140 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Decorador para la API de integraciones: Authorization: Bearer <API_TOKEN>
+# (API_TOKEN admite varios tokens separados por comas; sin token la API queda deshabilitada)
+def api_token_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        tokens = [token.strip() for token in get_env_config().get('API_TOKEN', '').split(',') if token.strip()]
+        if not tokens:
+            return jsonify({'error': 'API deshabilitada: configura API_TOKEN en el .env'}), 503
+        autorizacion = request.headers.get('Authorization', '')
+        recibido = autorizacion[len('Bearer '):] if autorizacion.startswith('Bearer ') else ''
+        if not any(hmac.compare_digest(recibido.encode(), token.encode()) for token in tokens):
+            return jsonify({'error': 'No autorizado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Función para normalizar la URL de GenieACS y obtener la URL de la API (puerto 7557)
+def construir_urls_genieacs(url):
+    # Limpiar la URL y asegurar que tenga el protocolo correcto
+    genieacs_url = url.strip()
+    
+    # Siempre usar http:// como protocolo por defecto
+    if genieacs_url.startswith('http://http://'):
+        # Si tiene protocolo duplicado, limpiar
+        genieacs_url = genieacs_url.replace('http://http://', 'http://')
+    elif genieacs_url.startswith('https://'):
+        # Si tiene https, cambiar a http
+        genieacs_url = genieacs_url.replace('https://', 'http://')
+    elif not genieacs_url.startswith('http://'):
+        # Si no tiene protocolo, agregar http://
+        genieacs_url = f"http://{genieacs_url}"
+    
+    # Remover barra final si existe
+    genieacs_url = genieacs_url.rstrip('/')
+    
+    # Extraer la IP base para construir la URL de la API (puerto 7557)
+    parsed_url = urlparse(genieacs_url)
+    base_ip = parsed_url.netloc.split(':')[0]
+    
+    # Construir URL de API con puerto 7557
+    api_base_url = f"http://{base_ip}:7557"
+    return genieacs_url, api_base_url
+
+# Función para construir el filtro (query de MongoDB) que GenieACS aplica en el servidor
+def construir_filtro_genieacs(dias_inform=None, excluir_tags=None):
+    filtro = {}
+    
+    # Solo dispositivos que hayan hecho inform en los últimos N días
+    if dias_inform:
+        try:
+            desde = datetime.now(timezone.utc) - timedelta(days=int(dias_inform))
+            filtro['_lastInform'] = {'$gt': desde.strftime('%Y-%m-%dT%H:%M:%S.000Z')}
+        except ValueError:
+            logger.warning(f"GENIEACS_DIAS_INFORM no es un número de días ({dias_inform!r}): se cuenta sin filtro de inform")
+    
+    # Excluir dispositivos con ciertas etiquetas (ej: "retirado", "bodega")
+    if excluir_tags:
+        if isinstance(excluir_tags, str):
+            excluir_tags = [tag.strip() for tag in excluir_tags.split(',')]
+        excluir_tags = [tag for tag in excluir_tags if tag]
+        if excluir_tags:
+            filtro['_tags'] = {'$nin': excluir_tags}
+    
+    return filtro
+
+# Registro de intentos de sondeo: se acumulan en memoria y se escriben por lotes
+_intentos_pendientes = []
+_intentos_lock = threading.Lock()
+_ultima_purga_intentos = [0.0]
+
+def registrar_intento_sondeo(isp_id, endpoint, resultado, latencia_ms, http_status=None,
+                             bytes_respuesta=None, parseo_ms=None, error=None):
+    with _intentos_lock:
+        _intentos_pendientes.append({
+            'isp_id': isp_id,
+            'fecha': datetime.now(timezone.utc),
+            'endpoint': endpoint,
+            'resultado': resultado,
+            'latencia_ms': latencia_ms,
+            'http_status': http_status,
+            'bytes': bytes_respuesta,
+            'parseo_ms': parseo_ms,
+            'error': error
+        })
+
+# Función para escribir los intentos pendientes (llamar después de un commit)
+def vaciar_intentos_sondeo(forzar=True):
+    current_config = get_env_config()
+    lote = int(current_config.get('INTENTOS_LOTE', 100))
+    with _intentos_lock:
+        if not _intentos_pendientes or (not forzar and len(_intentos_pendientes) < lote):
+            return
+        filas = list(_intentos_pendientes)
+        _intentos_pendientes.clear()
+    
+    try:
+        db.session.execute(IntentoSondeo.__table__.insert(), filas)
+        
+        # Retención: borrar intentos viejos como máximo una vez por hora
+        if time.time() - _ultima_purga_intentos[0] > 3600:
+            dias = int(current_config.get('INTENTOS_RETENCION_DIAS', 7))
+            corte = datetime.now(timezone.utc) - timedelta(days=dias)
+            IntentoSondeo.query.filter(IntentoSondeo.fecha < corte).delete(synchronize_session=False)
+            _ultima_purga_intentos[0] = time.time()
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error al guardar {len(filas)} intentos de sondeo: {str(e)}")
+
+# Endpoints que no devuelven X-Total-Count: se les pide directamente la lista de _id
+_endpoints_sin_total = set()
+
 # Función para verificar dispositivos en GenieACS
-def verificar_dispositivos_genieacs(isp):
+# Devuelve la cantidad de dispositivos, o None si no se pudo obtener
+def verificar_dispositivos_genieacs(isp, dias_inform=None, excluir_tags=None):
+    import requests
+    
     try:
-        # Limpiar la URL y asegurar que tenga el protocolo correcto
-        genieacs_url = isp.genieacs_url.strip()
-        
-        # Siempre usar http:// como protocolo por defecto
-        if genieacs_url.startswith('http://http://'):
-            # Si tiene protocolo duplicado, limpiar
-            genieacs_url = genieacs_url.replace('http://http://', 'http://')
-        elif genieacs_url.startswith('https://'):
-            # Si tiene https, cambiar a http
-            genieacs_url = genieacs_url.replace('https://', 'http://')
-        elif not genieacs_url.startswith('http://'):
-            # Si no tiene protocolo, agregar http://
-            genieacs_url = f"http://{genieacs_url}"
-        
-        # Remover barra final si existe
-        genieacs_url = genieacs_url.rstrip('/')
-        
-        # Extraer la IP base para construir la URL de la API (puerto 7557)
-        from urllib.parse import urlparse
-        parsed_url = urlparse(genieacs_url)
-        base_ip = parsed_url.netloc.split(':')[0]
+        genieacs_url, api_base_url = construir_urls_genieacs(isp.genieacs_url)
         
-        # Construir URL de API con puerto 7557
-        api_base_url = f"http://{base_ip}:7557"
+        logger.debug(f"URLs de {isp.nombre}: original {isp.genieacs_url}, UI {genieacs_url}, API {api_base_url}")
         
-        print(f"URL original: {isp.genieacs_url}")
-        print(f"URL UI (3000): {genieacs_url}")
-        print(f"URL API (7557): {api_base_url}")
+        # Filtro por defecto desde el .env (GENIEACS_DIAS_INFORM, GENIEACS_EXCLUIR_TAGS)
+        if dias_inform is None and excluir_tags is None:
+            current_config = get_env_config()
+            dias_inform = current_config.get('GENIEACS_DIAS_INFORM') or None
+            excluir_tags = current_config.get('GENIEACS_EXCLUIR_TAGS') or None
+        
+        # GenieACS filtra en el servidor y solo devuelve el _id de cada dispositivo
+        params = {'projection': '_id'}
+        filtro = construir_filtro_genieacs(dias_inform, excluir_tags)
+        if filtro:
+            params['query'] = json.dumps(filtro)
+            logger.debug(f"Filtro aplicado: {params['query']}")
         
         # Intentar diferentes endpoints de GenieACS en puerto 7557
         endpoints_to_try = [
@@ -123,48 +527,870 @@ def verificar_dispositivos_genieacs(isp):
             f"{api_base_url}/api/devices",  # API alternativa
         ]
         
+        isp_id = getattr(isp, 'id', None)
+        isp_label = str(isp_id or 'prueba')
+        
         for endpoint in endpoints_to_try:
-            try:
-                print(f"Intentando conectar a: {endpoint}")
-                response = requests.get(endpoint, timeout=10, headers={
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json'
+            variante = urlparse(endpoint).path
+            inicio = time.perf_counter()
+            
+            def registrar_intento(resultado, mensaje, http_status=None, bytes_respuesta=None,
+                                  parseo_ms=None, error=None, dispositivos=None):
+                duracion = time.perf_counter() - inicio
+                metricas.POLL_LATENCIA.labels(isp_label, variante).observe(duracion)
+                metricas.POLL_RESULTADOS.labels(isp_label, variante, resultado).inc()
+                logger.log(logging.INFO if resultado == 'ok' else logging.WARNING, mensaje, extra={
+                    'isp_id': isp_label, 'isp': isp.nombre, 'endpoint': variante,
+                    'duracion_ms': round(duracion * 1000, 1), 'resultado': resultado,
+                    'http_status': http_status, 'dispositivos': dispositivos
                 })
+                # Los ISPs temporales de probar_conexion no tienen id
+                if isp_id:
+                    registrar_intento_sondeo(isp_id, variante, resultado, round(duracion * 1000, 1),
+                                             http_status, bytes_respuesta, parseo_ms, error)
+            
+            try:
+                logger.debug(f"Intentando conectar a: {endpoint}")
+                headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+                # Primero solo el total (limit=1 + X-Total-Count); la lista completa
+                # únicamente si el servidor no informa el total
+                solo_total = endpoint not in _endpoints_sin_total
+                response = requests.get(endpoint, params=dict(params, limit=1) if solo_total else params,
+                                        timeout=10, headers=headers)
+                if response.status_code == 200:
+                    total = response.headers.get('X-Total-Count')
+                    if total is not None and total.isdigit():
+                        device_count = int(total)
+                        registrar_intento('ok', f"Dispositivos encontrados en {isp.nombre}: {device_count}",
+                                          200, len(response.content), dispositivos=device_count)
+                        return device_count
+                    if solo_total:
+                        logger.info(f"{endpoint} no informa X-Total-Count: se cuenta la lista de _id")
+                        _endpoints_sin_total.add(endpoint)
+                        response = requests.get(endpoint, params=params, timeout=10, headers=headers)
+                bytes_respuesta = len(response.content)
                 
                 if response.status_code == 200:
+                    inicio_parseo = time.perf_counter()
                     try:
                         devices = response.json()
-                        if isinstance(devices, list):
-                            device_count = len(devices)
-                            print(f"Dispositivos encontrados en {isp.nombre}: {device_count}")
-                            return device_count
-                        elif isinstance(devices, dict) and 'devices' in devices:
-                            device_count = len(devices['devices'])
-                            print(f"Dispositivos encontrados en {isp.nombre}: {device_count}")
-                            return device_count
-                        else:
-                            print(f"Formato de respuesta inesperado para {isp.nombre}")
-                            continue
                     except ValueError as json_error:
-                        print(f"Error al parsear JSON de {isp.nombre}: {json_error}")
+                        registrar_intento('json_invalido', f"Error al parsear JSON de {isp.nombre}: {json_error}",
+                                          200, bytes_respuesta, round((time.perf_counter() - inicio_parseo) * 1000, 2),
+                                          type(json_error).__name__)
+                        continue
+                    parseo_ms = round((time.perf_counter() - inicio_parseo) * 1000, 2)
+                    
+                    if isinstance(devices, list):
+                        device_count = len(devices)
+                    elif isinstance(devices, dict) and 'devices' in devices:
+                        device_count = len(devices['devices'])
+                    else:
+                        registrar_intento('formato_inesperado', f"Formato de respuesta inesperado para {isp.nombre}",
+                                          200, bytes_respuesta, parseo_ms, type(devices).__name__)
                         continue
+                    
+                    registrar_intento('ok', f"Dispositivos encontrados en {isp.nombre}: {device_count}",
+                                      200, bytes_respuesta, parseo_ms, dispositivos=device_count)
+                    return device_count
                 else:
-                    print(f"Error HTTP {response.status_code} para {isp.nombre} en {endpoint}")
+                    registrar_intento('error_http', f"Error HTTP {response.status_code} para {isp.nombre} en {endpoint}",
+                                      response.status_code, bytes_respuesta, error=f"HTTP {response.status_code}")
                     continue
                     
             except requests.exceptions.RequestException as req_error:
-                print(f"Error de conexión para {isp.nombre} en {endpoint}: {req_error}")
+                registrar_intento('timeout' if isinstance(req_error, requests.exceptions.Timeout) else 'error_conexion',
+                                  f"Error de conexión para {isp.nombre} en {endpoint}: {req_error}",
+                                  error=type(req_error).__name__)
                 continue
         
-        print(f"No se pudo conectar con GenieACS para {isp.nombre} en ningún endpoint")
-        return 0
+        logger.warning(f"No se pudo conectar con GenieACS para {isp.nombre} en ningún endpoint",
+                       extra={'isp_id': isp_label, 'isp': isp.nombre, 'resultado': 'sin_conexion'})
+        return None
+        
+    except Exception as e:
+        logger.exception(f"Error general al verificar dispositivos para {isp.nombre}: {str(e)}",
+                         extra={'isp_id': str(getattr(isp, 'id', None) or 'prueba'), 'isp': isp.nombre, 'resultado': 'error'})
+        return None
+
+# Diagnóstico rápido de conectividad con GenieACS (botón "Probar conexión")
+# En lugar del sondeo completo (endpoints uno tras otro, timeout de 10 s y todos
+# los dispositivos) prueba a la vez cada variante de endpoint en el puerto de la
+# API (7557) y en el de la interfaz (3000 o el de la URL), con timeouts cortos y
+# pidiendo un solo dispositivo; mide por separado DNS, TCP, HTTP y parseo.
+PUERTO_API_GENIEACS = 7557
+PUERTO_UI_GENIEACS = 3000
+VARIANTES_ENDPOINT_GENIEACS = ('/devices', '/api/v1/devices', '/api/devices')
+BYTES_MAXIMOS_DIAGNOSTICO = 64 * 1024  # con limit=1 la respuesta de la API es de unos pocos bytes
+
+def _ms_desde(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+def _probar_endpoint_genieacs(host, direccion, puerto, ruta, timeout_conexion, timeout_lectura):
+    import http.client
+    import socket
+    
+    prueba = {'url': f"http://{host}:{puerto}{ruta}", 'puerto': puerto, 'endpoint': ruta,
+              'resultado': None, 'http_status': None, 'tcp_ms': None, 'http_ms': None,
+              'parseo_ms': None, 'dispositivos': None, 'error': None}
+    
+    inicio = time.perf_counter()
+    try:
+        sock = socket.create_connection((direccion, puerto), timeout=timeout_conexion)
+    except OSError as e:
+        prueba['tcp_ms'] = _ms_desde(inicio)
+        prueba['resultado'] = 'timeout' if isinstance(e, socket.timeout) else 'error_conexion'
+        prueba['error'] = type(e).__name__
+        return prueba
+    prueba['tcp_ms'] = _ms_desde(inicio)
+    
+    # HTTP sobre el socket ya conectado, para que la conexión TCP no cuente en http_ms
+    sock.settimeout(timeout_lectura)
+    conexion = http.client.HTTPConnection(host, puerto, timeout=timeout_lectura)
+    conexion.sock = sock
+    inicio = time.perf_counter()
+    try:
+        conexion.request('GET', f"{ruta}?projection=_id&limit=1", headers={'Accept': 'application/json'})
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read(BYTES_MAXIMOS_DIAGNOSTICO)
+        total = respuesta.getheader('X-Total-Count')
+        prueba['http_status'] = respuesta.status
+    except (OSError, http.client.HTTPException) as e:
+        prueba['http_ms'] = _ms_desde(inicio)
+        prueba['resultado'] = 'timeout' if isinstance(e, socket.timeout) else 'error_conexion'
+        prueba['error'] = type(e).__name__
+        return prueba
+    finally:
+        conexion.close()
+    prueba['http_ms'] = _ms_desde(inicio)
+    
+    if respuesta.status != 200:
+        prueba['resultado'] = 'error_http'
+        prueba['error'] = f"HTTP {respuesta.status}"
+        return prueba
+    
+    inicio = time.perf_counter()
+    try:
+        devices = json.loads(cuerpo)
+    except ValueError as e:
+        # Por ejemplo, la página HTML de la interfaz en el puerto 3000
+        prueba['parseo_ms'] = _ms_desde(inicio)
+        prueba['resultado'] = 'json_invalido'
+        prueba['error'] = type(e).__name__
+        return prueba
+    prueba['parseo_ms'] = _ms_desde(inicio)
+    
+    if not isinstance(devices, list) and not (isinstance(devices, dict) and 'devices' in devices):
+        prueba['resultado'] = 'formato_inesperado'
+        prueba['error'] = type(devices).__name__
+        return prueba
+    
+    # El total solo se conoce si el servidor lo informa (X-Total-Count); no se descarga la lista
+    prueba['resultado'] = 'ok'
+    if total is not None and total.isdigit():
+        prueba['dispositivos'] = int(total)
+    return prueba
+
+def diagnosticar_genieacs(url, timeout_conexion=1.0, timeout_lectura=3.0):
+    import socket
+    from concurrent.futures import ThreadPoolExecutor, TimeoutError as PlazoAgotado
+    
+    inicio_total = time.perf_counter()
+    genieacs_url, _ = construir_urls_genieacs(url)
+    diagnostico = {'url': genieacs_url, 'host': None, 'direccion': None, 'dns_ms': None,
+                   'pruebas': [], 'exito': None, 'error': None, 'duracion_ms': None}
+    
+    try:
+        parsed_url = urlparse(genieacs_url)
+        host = parsed_url.hostname
+        puerto_url = parsed_url.port
+    except ValueError:
+        host = None
+    if not host:
+        diagnostico['error'] = 'URL inválida'
+        diagnostico['duracion_ms'] = _ms_desde(inicio_total)
+        return diagnostico
+    diagnostico['host'] = host
+    
+    puertos = [PUERTO_API_GENIEACS, PUERTO_UI_GENIEACS]
+    if puerto_url and puerto_url not in puertos:
+        puertos.append(puerto_url)
+    combinaciones = [(puerto, ruta) for puerto in puertos for ruta in VARIANTES_ENDPOINT_GENIEACS]
+    
+    # Sin esperar al cerrar: un getaddrinfo colgado termina solo en su hilo
+    executor = ThreadPoolExecutor(max_workers=len(combinaciones))
+    try:
+        # DNS una sola vez y con el mismo plazo que la conexión (getaddrinfo no
+        # acepta timeout): todas las pruebas usan la misma dirección
+        inicio = time.perf_counter()
+        resolucion = executor.submit(socket.getaddrinfo, host, PUERTO_API_GENIEACS, type=socket.SOCK_STREAM)
+        try:
+            direccion = resolucion.result(timeout=timeout_conexion)[0][4][0]
+        except PlazoAgotado:
+            diagnostico['dns_ms'] = _ms_desde(inicio)
+            diagnostico['error'] = f"El DNS no resolvió {host} en {timeout_conexion:g} s (timeout)"
+            diagnostico['duracion_ms'] = _ms_desde(inicio_total)
+            return diagnostico
+        except OSError as e:
+            diagnostico['dns_ms'] = _ms_desde(inicio)
+            diagnostico['error'] = f"No se pudo resolver {host} ({type(e).__name__})"
+            diagnostico['duracion_ms'] = _ms_desde(inicio_total)
+            return diagnostico
+        diagnostico['dns_ms'] = _ms_desde(inicio)
+        diagnostico['direccion'] = direccion
         
+        diagnostico['pruebas'] = list(executor.map(
+            lambda c: _probar_endpoint_genieacs(host, direccion, c[0], c[1], timeout_conexion, timeout_lectura),
+            combinaciones
+        ))
+    finally:
+        executor.shutdown(wait=False)
+    
+    # El monitoreo siempre consulta la API en el puerto 7557: solo ahí cuenta como éxito
+    diagnostico['exito'] = next((p for p in diagnostico['pruebas']
+                                 if p['puerto'] == PUERTO_API_GENIEACS and p['resultado'] == 'ok'), None)
+    if diagnostico['exito'] is None:
+        diagnostico['error'] = _explicar_diagnostico(diagnostico['pruebas'])
+    diagnostico['duracion_ms'] = _ms_desde(inicio_total)
+    return diagnostico
+
+# Mensaje para el administrador a partir de las pruebas fallidas
+def _explicar_diagnostico(pruebas):
+    # http_ms solo se mide si la conexión TCP se estableció
+    api = [p for p in pruebas if p['puerto'] == PUERTO_API_GENIEACS]
+    otros_abiertos = sorted({p['puerto'] for p in pruebas
+                             if p['puerto'] != PUERTO_API_GENIEACS and p['http_ms'] is not None})
+    
+    if all(p['http_ms'] is None for p in api):
+        motivo = 'no responde (timeout)' if any(p['resultado'] == 'timeout' for p in api) else 'rechaza la conexión'
+        mensaje = f"El puerto {PUERTO_API_GENIEACS} de la API de GenieACS {motivo}"
+        if otros_abiertos:
+            mensaje += f"; el puerto {', '.join(str(p) for p in otros_abiertos)} sí responde: revisa el firewall o que genieacs-nbi esté activo"
+        return mensaje
+    
+    if all(p['resultado'] == 'timeout' for p in api):
+        return f"El puerto {PUERTO_API_GENIEACS} acepta la conexión pero GenieACS no respondió a tiempo"
+    
+    detalles = ', '.join(f"{p['endpoint']}: {p['error'] or p['resultado']}" for p in api)
+    return f"La API de GenieACS (puerto {PUERTO_API_GENIEACS}) no devolvió dispositivos ({detalles})"
+
+# Función para consultar /devices de la API de GenieACS y devolver la lista de documentos
+def consultar_devices_genieacs(isp, filtro=None, projection='_id', sort=None, limit=None, skip=None):
+    import requests
+    
+    _, api_base_url = construir_urls_genieacs(isp.genieacs_url)
+    params = {'projection': projection}
+    if filtro:
+        params['query'] = json.dumps(filtro)
+    if sort:
+        params['sort'] = json.dumps(sort)
+    if limit:
+        params['limit'] = limit
+    if skip:
+        params['skip'] = skip
+    
+    inicio = time.perf_counter()
+    response = None
+    parseo_ms = None
+    try:
+        response = requests.get(f"{api_base_url}/devices", params=params, timeout=10,
+                                headers={'Accept': 'application/json'})
+        response.raise_for_status()
+        inicio_parseo = time.perf_counter()
+        devices = response.json()
+        parseo_ms = round((time.perf_counter() - inicio_parseo) * 1000, 2)
+        if not isinstance(devices, list):
+            raise ValueError(f"Formato de respuesta inesperado para {isp.nombre}")
+    except Exception as e:
+        if isinstance(e, requests.exceptions.Timeout):
+            resultado = 'timeout'
+        elif isinstance(e, requests.exceptions.HTTPError):
+            resultado = 'error_http'
+        elif isinstance(e, requests.exceptions.RequestException):
+            resultado = 'error_conexion'
+        else:
+            resultado = 'json_invalido'
+        registrar_intento_sondeo(isp.id, '/devices', resultado, round((time.perf_counter() - inicio) * 1000, 1),
+                                 response.status_code if response is not None else None,
+                                 len(response.content) if response is not None else None,
+                                 parseo_ms, type(e).__name__)
+        raise
+    
+    registrar_intento_sondeo(isp.id, '/devices', 'ok', round((time.perf_counter() - inicio) * 1000, 1),
+                             response.status_code, len(response.content), parseo_ms)
+    return devices
+
+# Función para obtener el _registered más reciente de un ISP (marca de agua)
+# junto con los _id registrados en ese mismo instante
+# Tamaño de página de la consulta incremental (tras una pausa larga el delta puede ser grande)
+LOTE_INCREMENTAL = 1000
+
+# Recorre en orden de _registered los dispositivos registrados desde la marca de agua
+# y devuelve (nuevos, marca, ids en la marca). Con $gte (no $gt) no se pierden los
+# registrados en el mismo milisegundo que la marca; los ya contados en ese
+# instante se descartan por _id
+def recorrer_desde_marca(isp, filtro, hwm=None, ids_en_marca=()):
+    ids_en_marca = set(ids_en_marca)
+    filtro_delta = dict(filtro)
+    if hwm:
+        filtro_delta['_registered'] = {'$gte': hwm}
+    
+    nuevos = 0
+    skip = 0
+    while True:
+        pagina = consultar_devices_genieacs(isp, filtro_delta, projection='_registered',
+                                            sort={'_registered': 1, '_id': 1},
+                                            limit=LOTE_INCREMENTAL, skip=skip)
+        for device in pagina:
+            registrado = device.get('_registered')
+            if registrado is None:
+                # Sin fecha de registro no entra en la marca; solo lo ve el recorrido completo
+                if not hwm:
+                    nuevos += 1
+                continue
+            if registrado != hwm:
+                hwm = registrado
+                ids_en_marca = set()
+            if device['_id'] in ids_en_marca:
+                continue
+            ids_en_marca.add(device['_id'])
+            nuevos += 1
+        if len(pagina) < LOTE_INCREMENTAL:
+            break
+        skip += len(pagina)
+    
+    return nuevos, hwm, ids_en_marca
+
+# Función para contar dispositivos de forma incremental
+# Solo pide a GenieACS los dispositivos registrados después de la marca de agua;
+# cada RECONCILIACION_INTERVAL segundos hace un conteo completo para corregir
+# la deriva (dispositivos eliminados o re-etiquetados).
+def contar_dispositivos_incremental(isp):
+    current_config = get_env_config()
+    excluir_tags = current_config.get('GENIEACS_EXCLUIR_TAGS') or None
+    intervalo_reconciliacion = int(current_config.get('RECONCILIACION_INTERVAL', 3600))
+    filtro = construir_filtro_genieacs(excluir_tags=excluir_tags)
+    ahora = datetime.now(timezone.utc)
+    
+    estado = EstadoSondeoISP.query.filter_by(isp_id=isp.id).first()
+    necesita_reconciliar = (
+        not estado or
+        not estado.ultima_reconciliacion or
+        ahora - estado.ultima_reconciliacion.replace(tzinfo=timezone.utc) > timedelta(seconds=intervalo_reconciliacion)
+    )
+    
+    if necesita_reconciliar:
+        # El conteo completo es el mismo recorrido desde el principio: la marca sale
+        # del último dispositivo contado, así que un registro durante el conteo
+        # queda dentro de la marca (y no se vuelve a contar) o después de ella
+        conteo, hwm, ids_en_marca = recorrer_desde_marca(isp, filtro)
+        if not estado:
+            estado = EstadoSondeoISP(isp_id=isp.id)
+            db.session.add(estado)
+        estado.hwm_registered = hwm
+        estado.ids_en_marca = json.dumps(sorted(ids_en_marca))
+        estado.conteo = conteo
+        estado.ultima_reconciliacion = ahora
+        logger.info(f"Reconciliación completa para {isp.nombre}: {conteo}",
+                    extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'dispositivos': conteo})
+        return conteo
+    
+    # Solo los dispositivos nuevos desde la última marca
+    nuevos, hwm, ids_en_marca = recorrer_desde_marca(isp, filtro, estado.hwm_registered,
+                                                     json.loads(estado.ids_en_marca or '[]'))
+    if nuevos:
+        estado.conteo = (estado.conteo or 0) + nuevos
+    estado.hwm_registered = hwm
+    estado.ids_en_marca = json.dumps(sorted(ids_en_marca))
+    logger.info(f"Conteo incremental para {isp.nombre}: {estado.conteo} (+{nuevos})",
+                extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'dispositivos': estado.conteo})
+    return estado.conteo
+
+# Función para contar dispositivos según el modo configurado en el .env
+def contar_dispositivos(isp):
+    current_config = get_env_config()
+    incremental = current_config.get('MONITOREO_INCREMENTAL', 'False').lower() == 'true'
+    # Con ventana de _lastInform el conteo cambia solo con el paso del tiempo,
+    # así que no se puede calcular por deltas: siempre conteo completo
+    if not incremental or current_config.get('GENIEACS_DIAS_INFORM'):
+        return verificar_dispositivos_genieacs(isp)
+    try:
+        return contar_dispositivos_incremental(isp)
     except Exception as e:
-        print(f"Error general al verificar dispositivos para {isp.nombre}: {str(e)}")
-        return 0
+        logger.warning(f"Error en conteo incremental para {isp.nombre}, usando conteo completo: {str(e)}",
+                       extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'resultado': 'error_incremental'})
+        return verificar_dispositivos_genieacs(isp)
+
+# Campos que el desglose pide a GenieACS (solo estos, no el documento completo)
+CAMPOS_DESGLOSE = [
+    '_deviceId._Manufacturer',
+    '_deviceId._ProductClass',
+    '_lastInform',
+    'InternetGatewayDevice.DeviceInfo.SoftwareVersion',  # TR-098
+    'Device.DeviceInfo.SoftwareVersion',  # TR-181
+]
+
+# Rangos de antigüedad del último inform: (etiqueta, límite superior)
+RANGOS_INFORM = [
+    ('menos_1h', timedelta(hours=1)),
+    ('menos_24h', timedelta(days=1)),
+    ('menos_7d', timedelta(days=7)),
+    ('menos_30d', timedelta(days=30)),
+]
+
+def _valor_proyectado(device, ruta):
+    # Recorre el documento de GenieACS siguiendo la ruta con puntos
+    valor = device
+    for parte in ruta.split('.'):
+        if not isinstance(valor, dict) or parte not in valor:
+            return None
+        valor = valor[parte]
+    if isinstance(valor, dict):
+        valor = valor.get('_value')
+    return valor
+
+def _rango_inform(last_inform, ahora):
+    if not last_inform:
+        return 'nunca'
+    try:
+        fecha = datetime.fromisoformat(str(last_inform).replace('Z', '+00:00'))
+    except ValueError:
+        return 'desconocido'
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    antiguedad = ahora - fecha
+    for etiqueta, limite in RANGOS_INFORM:
+        if antiguedad < limite:
+            return etiqueta
+    return 'mas_30d'
+
+# Función para recolectar el desglose de dispositivos (fabricante, modelo, versión, antigüedad)
+def recolectar_desglose_genieacs(isp, tamano_pagina=500):
+    from collections import Counter
+    import requests
+    
+    _, api_base_url = construir_urls_genieacs(isp.genieacs_url)
+    endpoint = f"{api_base_url}/devices"
+    
+    # Mismo filtro que el conteo (GENIEACS_DIAS_INFORM, GENIEACS_EXCLUIR_TAGS) para que
+    # los totales del desglose coincidan con los dispositivos contados
+    current_config = get_env_config()
+    filtro = construir_filtro_genieacs(current_config.get('GENIEACS_DIAS_INFORM') or None,
+                                       current_config.get('GENIEACS_EXCLUIR_TAGS') or None)
+    
+    fabricantes = Counter()
+    modelos = Counter()
+    versiones = Counter()
+    antiguedad = Counter()
+    total = 0
+    ahora = datetime.now(timezone.utc)
+    
+    # Paginar ordenado por _id para que la memoria usada dependa del tamaño de página
+    skip = 0
+    while True:
+        params = {
+            'projection': ','.join(CAMPOS_DESGLOSE),
+            'sort': json.dumps({'_id': 1}),
+            'skip': skip,
+            'limit': tamano_pagina
+        }
+        if filtro:
+            params['query'] = json.dumps(filtro)
+        response = requests.get(endpoint, timeout=30, params=params, headers={'Accept': 'application/json'})
+        response.raise_for_status()
+        pagina = response.json()
+        if not isinstance(pagina, list):
+            raise ValueError(f"Formato de respuesta inesperado para {isp.nombre}")
+        
+        for device in pagina:
+            fabricantes[_valor_proyectado(device, '_deviceId._Manufacturer') or 'desconocido'] += 1
+            modelos[_valor_proyectado(device, '_deviceId._ProductClass') or 'desconocido'] += 1
+            version = (_valor_proyectado(device, 'InternetGatewayDevice.DeviceInfo.SoftwareVersion') or
+                       _valor_proyectado(device, 'Device.DeviceInfo.SoftwareVersion') or 'desconocido')
+            versiones[str(version)] += 1
+            antiguedad[_rango_inform(device.get('_lastInform'), ahora)] += 1
+        
+        total += len(pagina)
+        if len(pagina) < tamano_pagina:
+            break
+        skip += tamano_pagina
+    
+    return {
+        'total': total,
+        'fabricantes': dict(fabricantes),
+        'modelos': dict(modelos),
+        'versiones': dict(versiones),
+        'antiguedad_inform': dict(antiguedad)
+    }
+
+# Función para guardar el desglose de un ISP (un registro por ISP)
+def guardar_desglose(isp, datos):
+    desglose = DesgloseISP.query.filter_by(isp_id=isp.id).first()
+    if not desglose:
+        desglose = DesgloseISP(isp_id=isp.id)
+        db.session.add(desglose)
+    desglose.total = datos['total']
+    desglose.fabricantes = json.dumps(datos['fabricantes'])
+    desglose.modelos = json.dumps(datos['modelos'])
+    desglose.versiones = json.dumps(datos['versiones'])
+    desglose.antiguedad_inform = json.dumps(datos['antiguedad_inform'])
+    desglose.fecha_actualizacion = datetime.now(timezone.utc)
+    db.session.commit()
+    return desglose
+
+# Importación masiva de ISPs (CSV, JSON o NDJSON): ruta /importar_isps y script importar_isps.py
+CAMPOS_IMPORTACION = ('nombre', 'ip_vm', 'genieacs_url', 'limite_clientes', 'email_alerta')
+CAMPOS_OBLIGATORIOS = ('nombre', 'ip_vm', 'genieacs_url', 'limite_clientes')
+# json y ndjson usan el mismo lector (acepta un arreglo o un objeto por línea)
+FORMATOS_IMPORTACION = ('csv', 'json', 'ndjson')
+# Content-Type que Werkzeug interpreta como formulario (consume el cuerpo)
+TIPOS_FORMULARIO = ('application/x-www-form-urlencoded', 'multipart/form-data')
+
+def detectar_formato_importacion(nombre_archivo, content_type=''):
+    nombre_archivo = (nombre_archivo or '').lower()
+    content_type = content_type or ''
+    if nombre_archivo.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if nombre_archivo.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    if nombre_archivo.endswith('.json') or 'json' in content_type:
+        return 'json'
+    return None
+
+# Objetos de un arreglo JSON o de un NDJSON, leyendo el archivo por bloques.
+# El arreglo debe estar completo: un "[" inicial, "," entre elementos y el "]" final;
+# en NDJSON va un objeto por línea. Lo demás es un error del archivo (ValueError)
+def _objetos_json(archivo, tamano_bloque=65536, maximo_objeto=1024 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    fin_archivo = False
+    
+    def leer():
+        nonlocal buffer, fin_archivo
+        bloque = archivo.read(tamano_bloque)
+        fin_archivo = not bloque
+        buffer += bloque
+    
+    # Siguiente carácter significativo ('' al final del archivo) y si se saltó un fin de línea
+    def siguiente():
+        nonlocal buffer
+        salto = False
+        while True:
+            resto = buffer.lstrip(' \t\r\n')
+            salto = salto or '\n' in buffer[:len(buffer) - len(resto)]
+            buffer = resto
+            if buffer or fin_archivo:
+                return buffer[:1], salto
+            leer()
+    
+    def valor():
+        nonlocal buffer
+        while True:
+            try:
+                objeto, fin = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Objeto incompleto: leer otro bloque (o fallar si ya no hay más)
+                if fin_archivo or len(buffer) > maximo_objeto:
+                    raise ValueError('JSON inválido o fila demasiado grande')
+                leer()
+                continue
+            # Un número al final del bloque puede seguir en el bloque siguiente
+            if fin == len(buffer) and not fin_archivo:
+                leer()
+                continue
+            buffer = buffer[fin:]
+            return objeto
+    
+    caracter, _ = siguiente()
+    if caracter != '[':
+        # NDJSON
+        while caracter:
+            yield valor()
+            caracter, salto = siguiente()
+            if caracter and not salto:
+                raise ValueError('NDJSON inválido: va un objeto por línea')
+        return
+    
+    buffer = buffer[1:]
+    caracter, _ = siguiente()
+    if caracter == ']':
+        buffer = buffer[1:]
+    else:
+        while True:
+            if caracter in (']', ',', ''):
+                raise ValueError('JSON inválido: falta un elemento del arreglo')
+            yield valor()
+            caracter, _ = siguiente()
+            if not caracter:
+                raise ValueError('JSON incompleto: falta el "]" final')
+            if caracter not in (',', ']'):
+                raise ValueError('JSON inválido: falta "," entre los elementos del arreglo')
+            buffer = buffer[1:]
+            if caracter == ']':
+                break
+            caracter, _ = siguiente()
+    
+    if siguiente()[0]:
+        raise ValueError('JSON inválido: hay contenido después del "]" final')
+
+# Filas (número, dict) de un archivo de texto; en CSV la fila 1 es el encabezado
+def leer_filas_importacion(archivo, formato):
+    if formato == 'csv':
+        for numero, fila in enumerate(csv.DictReader(archivo), start=2):
+            yield numero, {(campo or '').strip().lower(): valor for campo, valor in fila.items()}
+    else:
+        yield from enumerate(_objetos_json(archivo), start=1)
+
+# Normalizar y validar una fila: devuelve (datos, None) o (None, mensaje de error)
+def validar_fila_isp(fila):
+    if not isinstance(fila, dict):
+        return None, 'La fila no es un objeto'
+    
+    datos = {}
+    for campo in CAMPOS_IMPORTACION:
+        valor = fila.get(campo)
+        datos[campo] = '' if valor is None else str(valor).strip()
+    
+    faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not datos[campo]]
+    if faltantes:
+        return None, f"Faltan campos: {', '.join(faltantes)}"
+    
+    try:
+        datos['ip_vm'] = str(ipaddress.IPv4Address(datos['ip_vm']))
+    except ValueError:
+        return None, f"IP de VM inválida: {datos['ip_vm']}"
+    
+    try:
+        datos['limite_clientes'] = int(datos['limite_clientes'])
+    except ValueError:
+        return None, 'limite_clientes debe ser un número entero'
+    if datos['limite_clientes'] < 1:
+        return None, 'limite_clientes debe ser mayor que 0'
+    
+    if not urlparse(construir_urls_genieacs(datos['genieacs_url'])[0]).hostname:
+        return None, f"URL de GenieACS inválida: {datos['genieacs_url']}"
+    
+    if datos['email_alerta'] and '@' not in datos['email_alerta']:
+        return None, f"Email inválido: {datos['email_alerta']}"
+    
+    for campo, maximo in (('nombre', 100), ('genieacs_url', 200), ('email_alerta', 100)):
+        if len(datos[campo]) > maximo:
+            return None, f"{campo} supera los {maximo} caracteres"
+    
+    return datos, None
+
+# Guardar un lote validado: una consulta para las ip_vm existentes y un solo commit
+def _guardar_lote_isps(pendientes, actualizar, resumen, a_probar):
+    ips = [datos['ip_vm'] for _, datos in pendientes]
+    existentes = {isp.ip_vm: isp for isp in ISP.query.filter(ISP.ip_vm.in_(ips))}
+    
+    nuevos = []
+    actualizados = []
+    errores = []
+    for numero, datos in pendientes:
+        isp = existentes.get(datos['ip_vm'])
+        if isp is None:
+            isp = ISP(**datos)
+            db.session.add(isp)
+            nuevos.append(isp)
+        elif not actualizar:
+            errores.append({'fila': numero, 'ip_vm': datos['ip_vm'], 'error': 'Ya existe un ISP con esa IP de VM'})
+        else:
+            url_cambiada = isp.genieacs_url != datos['genieacs_url']
+            for campo, valor in datos.items():
+                setattr(isp, campo, valor)
+            actualizados.append((isp, url_cambiada))
+    
+    try:
+        db.session.flush()
+        # Datos para la prueba de conexión, tomados antes de que el commit expire los objetos
+        probar = [SimpleNamespace(id=isp.id, nombre=isp.nombre, genieacs_url=isp.genieacs_url)
+                  for isp in nuevos + [isp for isp, url_cambiada in actualizados if url_cambiada]]
+        db.session.commit()
+    except IntegrityError:
+        # Otro guardado simultáneo usó alguna de estas IP: reintentar fila por fila
+        db.session.rollback()
+        if len(pendientes) == 1:
+            numero, datos = pendientes[0]
+            resumen['errores'].append({'fila': numero, 'ip_vm': datos['ip_vm'], 'error': 'Ya existe un ISP con esa IP de VM'})
+        else:
+            for pendiente in pendientes:
+                _guardar_lote_isps([pendiente], actualizar, resumen, a_probar)
+        return
+    
+    resumen['creados'] += len(nuevos)
+    resumen['actualizados'] += len(actualizados)
+    resumen['errores'].extend(errores)
+    a_probar.extend(probar)
+
+# Probar en paralelo la conexión a GenieACS de los ISPs importados y guardar los conteos
+def probar_conexion_isps(isps, hilos=16):
+    from concurrent.futures import ThreadPoolExecutor
+    
+    def probar(isp):
+        with app.app_context():
+            return isp, verificar_dispositivos_genieacs(isp)
+    
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        resultados = list(executor.map(probar, isps))
+    vaciar_intentos_sondeo()
+    
+    ahora = datetime.now(timezone.utc)
+    conteos = [{'id': isp.id, 'dispositivos_actuales': dispositivos, 'ultima_verificacion': ahora,
+                'fecha_actualizacion': ahora}
+               for isp, dispositivos in resultados if dispositivos is not None]
+    if conteos:
+        db.session.bulk_update_mappings(ISP, conteos)
+        db.session.commit()
+    
+    return [{'isp_id': isp.id, 'nombre': isp.nombre, 'conectado': dispositivos is not None,
+             'dispositivos': dispositivos} for isp, dispositivos in resultados]
+
+# Importar ISPs desde filas (número, dict) por lotes; devuelve el resumen con errores por fila
+def importar_filas_isp(filas, actualizar=True, lote=500, probar=False, hilos=16):
+    resumen = {'total': 0, 'creados': 0, 'actualizados': 0, 'errores': []}
+    vistas = {}  # ip_vm -> fila donde apareció primero (duplicados dentro del archivo)
+    pendientes = []
+    a_probar = []
+    
+    try:
+        for numero, fila in filas:
+            resumen['total'] += 1
+            datos, error = validar_fila_isp(fila)
+            if error is None and datos['ip_vm'] in vistas:
+                error = f"IP de VM repetida en el archivo (fila {vistas[datos['ip_vm']]})"
+            if error:
+                ip_vm = fila.get('ip_vm') if isinstance(fila, dict) else None
+                resumen['errores'].append({'fila': numero, 'ip_vm': ip_vm, 'error': error})
+                continue
+            
+            vistas[datos['ip_vm']] = numero
+            pendientes.append((numero, datos))
+            if len(pendientes) >= lote:
+                _guardar_lote_isps(pendientes, actualizar, resumen, a_probar)
+                pendientes = []
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        # Archivo mal formado: lo ya guardado se conserva, el resto no se procesa
+        resumen['error_archivo'] = f"Archivo inválido después de la fila {resumen['total']}: {str(e)}"
+    
+    if pendientes:
+        _guardar_lote_isps(pendientes, actualizar, resumen, a_probar)
+    
+    if probar and a_probar:
+        resumen['pruebas'] = probar_conexion_isps(a_probar, hilos)
+    
+    logger.info(f"Importación de ISPs: {resumen['total']} filas, {resumen['creados']} creados, "
+                f"{resumen['actualizados']} actualizados, {len(resumen['errores'])} errores")
+    return resumen
+
+# Exportaciones por streaming (CSV o NDJSON): ruta /exportar/<tipo>
+TIPOS_EXPORTACION = ('isps', 'alertas', 'conteos')
+
+# Consulta, columna de fecha (filtro), columna de ISP (filtro) y clave de orden de cada tipo
+def _definicion_exportacion(tipo):
+    if tipo == 'isps':
+        consulta = select(ISP.id, ISP.nombre, ISP.ip_vm, ISP.genieacs_url, ISP.limite_clientes,
+                          ISP.email_alerta, ISP.dispositivos_actuales, ISP.fecha_creacion,
+                          ISP.ultima_verificacion, ISP.ultima_alerta)
+        return consulta, ISP.fecha_creacion, ISP.id, (ISP.id,)
+    if tipo == 'alertas':
+        consulta = (select(Alerta.id, Alerta.isp_id, ISP.nombre.label('isp'), Alerta.fecha_envio,
+                           Alerta.enviada, Alerta.mensaje)
+                    .join(ISP, Alerta.isp_id == ISP.id)
+                    .where(Alerta.fecha_envio.isnot(None)))
+        return consulta, Alerta.fecha_envio, Alerta.isp_id, (Alerta.fecha_envio, Alerta.id)
+    consulta = (select(ConteoDispositivos.id, ConteoDispositivos.isp_id, ISP.nombre.label('isp'),
+                       ConteoDispositivos.fecha, ConteoDispositivos.dispositivos,
+                       ConteoDispositivos.limite_clientes)
+                .join(ISP, ConteoDispositivos.isp_id == ISP.id)
+                .where(ConteoDispositivos.fecha.isnot(None)))
+    return consulta, ConteoDispositivos.fecha, ConteoDispositivos.isp_id, (ConteoDispositivos.fecha, ConteoDispositivos.id)
+
+# Filas de una exportación en páginas cortas por clave (fecha, id); entre páginas se
+# cierra la transacción para no retener la conexión ni un snapshot durante toda la descarga
+def filas_exportacion(tipo, desde=None, hasta=None, isp_ids=None, lote=5000):
+    consulta, columna_fecha, columna_isp, orden = _definicion_exportacion(tipo)
+    if desde:
+        consulta = consulta.where(columna_fecha >= desde)
+    if hasta:
+        consulta = consulta.where(columna_fecha < hasta)
+    if isp_ids:
+        consulta = consulta.where(columna_isp.in_(isp_ids))
+    consulta = consulta.order_by(*orden).limit(lote)
+    
+    ultimo = None
+    while True:
+        pagina = consulta
+        if ultimo is not None:
+            pagina = pagina.where(tuple_(*orden) > tuple_(*ultimo))
+        
+        # yield_per: cursor del lado del servidor, las filas se leen a medida que se escriben
+        cantidad = 0
+        for fila in db.session.execute(pagina.execution_options(yield_per=1000)).mappings():
+            cantidad += 1
+            ultimo = tuple(fila[columna.key] for columna in orden)
+            yield fila
+        db.session.rollback()
+        
+        if cantidad < lote:
+            return
+
+def _valor_exportacion(valor, csv_seguro=False):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    # Evitar que Excel interprete textos como fórmulas
+    if csv_seguro and isinstance(valor, str) and valor[:1] in ('=', '+', '-', '@'):
+        return f"'{valor}"
+    return valor
+
+# Convertir filas en bloques de texto CSV o NDJSON (cientos de filas por bloque)
+def generar_exportacion(filas, columnas, formato, filas_por_bloque=500):
+    if formato == 'ndjson':
+        bloque = []
+        for fila in filas:
+            bloque.append(json.dumps({columna: _valor_exportacion(fila[columna]) for columna in columnas},
+                                     ensure_ascii=False))
+            if len(bloque) >= filas_por_bloque:
+                yield '\n'.join(bloque) + '\n'
+                bloque = []
+        if bloque:
+            yield '\n'.join(bloque) + '\n'
+        return
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for numero, fila in enumerate(filas, start=1):
+        writer.writerow([_valor_exportacion(fila[columna], csv_seguro=True) for columna in columnas])
+        if numero % filas_por_bloque == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Fecha de los parámetros desde/hasta (YYYY-MM-DD o ISO); "hasta" con solo fecha incluye ese día
+def _fecha_exportacion(valor, fin=False):
+    if not valor:
+        return None
+    fecha = datetime.fromisoformat(valor)
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    if fin and len(valor) == 10:
+        fecha += timedelta(days=1)
+    return fecha
+
+def rango_exportacion(args):
+    if args.get('mes'):
+        desde = datetime.strptime(args['mes'], '%Y-%m')
+        return desde, (desde + timedelta(days=32)).replace(day=1)
+    return _fecha_exportacion(args.get('desde')), _fecha_exportacion(args.get('hasta'), fin=True)
 
 # Función para enviar email de alerta
 def enviar_alerta_email(isp, dispositivos_actuales, tipo_alerta="superado"):
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
     try:
         # Leer configuración actual del .env
         current_config = get_env_config()
@@ -247,19 +1473,21 @@ def enviar_alerta_email(isp, dispositivos_actuales, tipo_alerta="superado"):
         msg_admin.attach(MIMEText(body_admin, 'html'))
         
         # Enviar ambos emails
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(current_gmail_user, current_gmail_password)
-        
-        # Email al cliente
-        text_cliente = msg_cliente.as_string()
-        server.sendmail(current_gmail_user, isp.email_alerta, text_cliente)
-        
-        # Email al admin (tú)
-        text_admin = msg_admin.as_string()
-        server.sendmail(current_gmail_user, current_gmail_user, text_admin)
-        
-        server.quit()
+        with metricas.SMTP_LATENCIA.time():
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+            server.starttls()
+            server.login(current_gmail_user, current_gmail_password)
+            
+            # Email al cliente
+            text_cliente = msg_cliente.as_string()
+            server.sendmail(current_gmail_user, isp.email_alerta, text_cliente)
+            
+            # Email al admin (tú)
+            text_admin = msg_admin.as_string()
+            server.sendmail(current_gmail_user, current_gmail_user, text_admin)
+            
+            server.quit()
+        metricas.EMAILS.labels(tipo_alerta, 'ok').inc()
         
         # Registrar la alerta en la base de datos
         if tipo_alerta == "superado":
@@ -276,54 +1504,394 @@ def enviar_alerta_email(isp, dispositivos_actuales, tipo_alerta="superado"):
         isp.ultima_alerta = datetime.now(timezone.utc)
         db.session.commit()
         
-        print(f"Alerta enviada para {isp.nombre} (cliente y admin)")
+        logger.info(f"Alerta enviada para {isp.nombre} (cliente y admin)",
+                    extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'tipo_alerta': tipo_alerta, 'resultado': 'ok'})
         return True
     except Exception as e:
-        print(f"Error al enviar email para {isp.nombre}: {str(e)}")
+        metricas.EMAILS.labels(tipo_alerta, 'error').inc()
+        logger.error(f"Error al enviar email para {isp.nombre}: {str(e)}",
+                     extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'tipo_alerta': tipo_alerta, 'resultado': 'error'})
         return False
 
+# Función para ejecutar un ciclo de monitoreo sobre todos los ISPs
+def ejecutar_ciclo_monitoreo():
+    with app.app_context():
+        isps = ISP.query.all()
+        for isp in isps:
+            dispositivos_actuales = contar_dispositivos(isp)
+            
+            # Si el sondeo falló se conserva el último conteo bueno
+            if dispositivos_actuales is None:
+                db.session.commit()
+                vaciar_intentos_sondeo(forzar=False)
+                continue
+            
+            isp.dispositivos_actuales = dispositivos_actuales
+            isp.ultima_verificacion = datetime.now(timezone.utc)
+            
+            # Historial de conteos (exportable para facturación)
+            db.session.add(ConteoDispositivos(isp_id=isp.id, dispositivos=dispositivos_actuales,
+                                              limite_clientes=isp.limite_clientes))
+            
+            # Verificar si necesita alerta (cerca del límite o superado)
+            porcentaje_uso = (dispositivos_actuales / isp.limite_clientes) * 100
+            necesita_alerta = False
+            tipo_alerta = ""
+            
+            if dispositivos_actuales > isp.limite_clientes:
+                necesita_alerta = True
+                tipo_alerta = "superado"
+            elif porcentaje_uso >= 80:  # 80% o más del límite
+                necesita_alerta = True
+                tipo_alerta = "cerca_limite"
+            
+            if (necesita_alerta and 
+                isp.email_alerta and 
+                (not isp.ultima_alerta or 
+                 (isp.ultima_alerta and 
+                  datetime.now(timezone.utc) - isp.ultima_alerta.replace(tzinfo=timezone.utc) > timedelta(days=1)))):
+                enviar_alerta_email(isp, dispositivos_actuales, tipo_alerta)
+            
+            db.session.commit()
+            vaciar_intentos_sondeo(forzar=False)
+        
+        vaciar_intentos_sondeo()
+        logger.info(f"Monitoreo completado: {len(isps)} ISPs")
+
+# Tareas programadas: hilos de este proceso (si las arrancó) y latidos en la base
+# (/readyz las da por caídas si nunca latieron, si el hilo murió o si llevan más
+# de dos intervalos sin latir)
+TAREAS_PROGRAMADAS = ('monitoreo', 'desglose', 'mantenimiento')
+_tareas = {}
+
+def tareas_esperadas():
+    # Los backups en caliente solo existen con SQLite
+    if db.engine.url.get_backend_name() == 'sqlite':
+        return TAREAS_PROGRAMADAS + ('backup',)
+    return TAREAS_PROGRAMADAS
+
+def registrar_latido(nombre, intervalo):
+    import socket
+    
+    try:
+        with app.app_context():
+            latido = LatidoTarea.query.filter_by(nombre=nombre).first()
+            if not latido:
+                latido = LatidoTarea(nombre=nombre)
+                db.session.add(latido)
+            latido.latido = datetime.now(timezone.utc)
+            latido.intervalo = intervalo
+            latido.proceso = f"{socket.gethostname()}:{os.getpid()}"
+            db.session.commit()
+    except Exception as e:
+        # Sin latido /readyz termina marcando la tarea como atrasada; la tarea sigue
+        logger.warning(f"No se pudo registrar el latido de {nombre}: {str(e)}")
+
 # Función para monitoreo automático
 def monitoreo_automatico():
+    programado = time.time()
+    while True:
+        intervalo = int(get_env_config().get('MONITORING_INTERVAL', 600))
+        registrar_latido('monitoreo', intervalo)
+        inicio = time.time()
+        try:
+            ejecutar_ciclo_monitoreo()
+        except Exception as e:
+            logger.exception(f"Error en monitoreo automático: {str(e)}")
+        metricas.registrar_ciclo(inicio, programado)
+        
+        # Intervalo fijo entre inicios de ciclo (10 minutos por defecto);
+        # si se perdió un turno completo se vuelve a anclar en el inicio actual
+        if inicio - programado > intervalo:
+            programado = inicio
+        programado += intervalo
+        time.sleep(max(0, programado - time.time()))
+
+# Función para tareas de mantenimiento diarias (archivo de alertas)
+def mantenimiento_automatico():
     while True:
+        registrar_latido('mantenimiento', 86400)
+        try:
+            with app.app_context():
+                archivar_alertas()
+                
+                # Retención del historial de conteos
+                dias = int(get_env_config().get('CONTEOS_RETENCION_DIAS', 730))
+                corte = datetime.now(timezone.utc) - timedelta(days=dias)
+                ConteoDispositivos.query.filter(ConteoDispositivos.fecha < corte).delete(synchronize_session=False)
+                
+                # Bajas informadas por la API (ver API_BAJAS_RETENCION_DIAS)
+                dias = int(get_env_config().get('API_BAJAS_RETENCION_DIAS', 90))
+                corte = datetime.now(timezone.utc) - timedelta(days=dias)
+                ISPEliminado.query.filter(ISPEliminado.fecha_eliminacion < corte).delete(synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            logger.exception(f"Error en mantenimiento automático: {str(e)}")
+        
+        time.sleep(86400)  # 24 horas
+
+# Función para los backups automáticos en caliente (BACKUP_INTERVAL=0 los desactiva)
+def backup_automatico():
+    logger_backup = logging.getLogger('skypass.backup')
+    while True:
+        current_config = get_env_config()
+        intervalo = int(current_config.get('BACKUP_INTERVAL', 21600))
+        if intervalo <= 0:
+            registrar_latido('backup', 3600)
+            time.sleep(3600)
+            continue
+        
+        registrar_latido('backup', intervalo)
+        time.sleep(intervalo)
+        try:
+            with app.app_context():
+                db_path = db.engine.url.database
+            backup_dir = current_config.get('BACKUP_DIR', 'backups')
+            inicio = time.perf_counter()
+            nombre = backup.crear_backup(db_path, backup_dir, current_config.get('BACKUP_METODO', 'backup'))
+            if nombre:
+                logger_backup.info(f"Backup automático creado: {nombre}",
+                                   extra={'duracion_ms': round((time.perf_counter() - inicio) * 1000, 1)})
+                backup.limpiar_backups_antiguos(backup_dir, int(current_config.get('BACKUP_RETENCION_DIAS', 30)))
+            else:
+                logger_backup.error("No se pudo crear el backup automático")
+        except Exception as e:
+            logger_backup.exception(f"Error en backup automático: {str(e)}")
+
+# Función para el desglose automático (más lento que el monitoreo, en su propio hilo)
+def desglose_automatico():
+    while True:
+        intervalo = int(get_env_config().get('DESGLOSE_INTERVAL', 3600))
+        registrar_latido('desglose', intervalo)
         try:
             with app.app_context():
                 isps = ISP.query.all()
                 for isp in isps:
-                    dispositivos_actuales = verificar_dispositivos_genieacs(isp)
-                    isp.dispositivos_actuales = dispositivos_actuales
-                    isp.ultima_verificacion = datetime.now(timezone.utc)
-                    
-                    # Verificar si necesita alerta (cerca del límite o superado)
-                    porcentaje_uso = (dispositivos_actuales / isp.limite_clientes) * 100
-                    necesita_alerta = False
-                    tipo_alerta = ""
-                    
-                    if dispositivos_actuales > isp.limite_clientes:
-                        necesita_alerta = True
-                        tipo_alerta = "superado"
-                    elif porcentaje_uso >= 80:  # 80% o más del límite
-                        necesita_alerta = True
-                        tipo_alerta = "cerca_limite"
-                    
-                    if (necesita_alerta and 
-                        isp.email_alerta and 
-                        (not isp.ultima_alerta or 
-                         (isp.ultima_alerta and 
-                          datetime.now(timezone.utc) - isp.ultima_alerta.replace(tzinfo=timezone.utc) > timedelta(days=1)))):
-                        enviar_alerta_email(isp, dispositivos_actuales, tipo_alerta)
-                    
-                    db.session.commit()
+                    try:
+                        datos = recolectar_desglose_genieacs(isp)
+                        guardar_desglose(isp, datos)
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.warning(f"Error al recolectar desglose de {isp.nombre}: {str(e)}",
+                                       extra={'isp_id': str(isp.id), 'isp': isp.nombre, 'resultado': 'error_desglose'})
                 
-                print(f"Monitoreo completado: {datetime.now()}")
+                logger.info(f"Desglose completado: {len(isps)} ISPs")
         except Exception as e:
-            print(f"Error en monitoreo automático: {str(e)}")
+            logger.exception(f"Error en desglose automático: {str(e)}")
         
-        time.sleep(600)  # 10 minutos
+        time.sleep(intervalo)  # 1 hora por defecto
+
+# Arrancar los hilos de tareas programadas (solo en el proceso de monitoreo)
+def iniciar_tareas_programadas():
+    funciones = {
+        'monitoreo': monitoreo_automatico,
+        'desglose': desglose_automatico,        # intervalo más largo que el monitoreo
+        'mantenimiento': mantenimiento_automatico,  # archivo diario de alertas antiguas
+        'backup': backup_automatico,            # backups periódicos en caliente (SQLite)
+    }
+    with app.app_context():
+        nombres = tareas_esperadas()
+    
+    for nombre in nombres:
+        hilo = threading.Thread(target=funciones[nombre], name=nombre, daemon=True)
+        _tareas.setdefault(nombre, {})['hilo'] = hilo
+        hilo.start()
+
+# Medición de latencia por ruta
+@app.before_request
+def iniciar_medicion():
+    g.inicio_peticion = time.perf_counter()
+
+@app.after_request
+def registrar_medicion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        metricas.HTTP_LATENCIA.labels(ruta, request.method, str(response.status_code)).observe(time.perf_counter() - inicio)
+    return response
+
+# Liveness: el proceso responde (no toca la base de datos ni GenieACS)
+@app.route('/healthz')
+def healthz():
+    return jsonify({'estado': 'ok'})
+
+# Readiness: base de datos accesible y tareas programadas al día (según sus latidos en la base)
+@app.route('/readyz')
+def readyz():
+    listo = True
+    resultado = {'db': 'ok', 'tareas': {}}
+    
+    inicio = time.perf_counter()
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception as e:
+        listo = False
+        # El detalle solo va al registro: el endpoint no requiere autenticación
+        logger.error(f"readyz: la base de datos no responde: {e}")
+        resultado['db'] = 'error'
+    resultado['db_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    
+    latidos = {}
+    if resultado['db'] == 'ok':
+        try:
+            latidos = {latido.nombre: latido for latido in LatidoTarea.query.all()}
+        except Exception as e:
+            db.session.rollback()
+            listo = False
+            logger.error(f"readyz: no se pudieron leer los latidos: {e}")
+    
+    ahora = datetime.now(timezone.utc)
+    for nombre in tareas_esperadas():
+        latido = latidos.get(nombre)
+        hilo = _tareas.get(nombre, {}).get('hilo')
+        if hilo is not None and not hilo.is_alive():
+            estado = 'detenida'
+        elif latido is None:
+            estado = 'sin_latido'
+        elif (ahora - latido.latido.replace(tzinfo=timezone.utc)).total_seconds() > 2 * latido.intervalo + 60:
+            estado = 'atrasada'
+        else:
+            estado = 'ok'
+        if estado != 'ok':
+            listo = False
+        resultado['tareas'][nombre] = {
+            'estado': estado,
+            'ultimo_latido': _fecha_api(latido.latido) if latido else None,
+        }
+    
+    resultado['estado'] = 'ok' if listo else 'error'
+    return jsonify(resultado), 200 if listo else 503
+
+# Métricas en formato Prometheus: con METRICS_TOKEN exigen el token; sin él solo
+# responden a peticiones locales directas (las etiquetas incluyen nombres de ISP)
+@app.route('/metrics')
+def metrics():
+    token = get_env_config().get('METRICS_TOKEN')
+    if token:
+        autorizacion = request.headers.get('Authorization', '')
+        recibido = autorizacion[len('Bearer '):] if autorizacion.startswith('Bearer ') else ''
+        if not hmac.compare_digest(recibido.encode(), token.encode()):
+            return Response('No autorizado\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+        return Response('Configura METRICS_TOKEN en el .env para consultar las métricas desde otro equipo\n',
+                        status=403, mimetype='text/plain')
+    cuerpo, content_type = metricas.exponer_metricas()
+    return Response(cuerpo, content_type=content_type)
+
+# API de lectura para integraciones (facturación, NOC): devuelve los conteos ya guardados,
+# no consulta GenieACS. Campos disponibles y cómo se calculan a partir de la fila del ISP
+def _fecha_api(valor):
+    return valor.replace(tzinfo=timezone.utc).isoformat() if valor else None
+
+def _estado_isp(dispositivos, limite):
+    if dispositivos > limite:
+        return 'sobrepasado'
+    if dispositivos >= limite * 0.8:
+        return 'cerca_limite'
+    return 'normal'
 
-# Ruta para servir archivos estáticos
-@app.route('/static/<path:filename>')
-def static_files(filename):
-    return app.send_static_file(filename)
+CAMPOS_API = {
+    'id': lambda isp: isp.id,
+    'nombre': lambda isp: isp.nombre,
+    'ip_vm': lambda isp: isp.ip_vm,
+    'genieacs_url': lambda isp: isp.genieacs_url,
+    'email_alerta': lambda isp: isp.email_alerta,
+    'limite_clientes': lambda isp: isp.limite_clientes,
+    'dispositivos_actuales': lambda isp: isp.dispositivos_actuales or 0,
+    'porcentaje_uso': lambda isp: round((isp.dispositivos_actuales or 0) * 100 / isp.limite_clientes, 1) if isp.limite_clientes else None,
+    'estado': lambda isp: _estado_isp(isp.dispositivos_actuales or 0, isp.limite_clientes),
+    'ultima_verificacion': lambda isp: _fecha_api(isp.ultima_verificacion),
+    'ultima_alerta': lambda isp: _fecha_api(isp.ultima_alerta),
+    'fecha_actualizacion': lambda isp: _fecha_api(isp.fecha_actualizacion),
+}
+
+# El cursor guarda el último id devuelto y los filtros de la primera página
+def _codificar_cursor(datos):
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def _decodificar_cursor(cursor):
+    relleno = '=' * (-len(cursor) % 4)
+    datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    
+    # Se valida todo el contenido: un cursor alterado no debe llegar a la consulta
+    def entero(valor):
+        return isinstance(valor, int) and not isinstance(valor, bool)
+    
+    def fecha(valor):
+        try:
+            return isinstance(valor, str) and bool(datetime.fromisoformat(valor))
+        except ValueError:
+            return False
+    
+    if (not isinstance(datos, dict) or not entero(datos.get('id'))
+            or not fecha(datos.get('hasta'))
+            or (datos.get('desde') is not None and not fecha(datos['desde']))
+            or not isinstance(datos.get('ids', []), list)
+            or not all(entero(valor) for valor in datos.get('ids', []))):
+        raise ValueError('cursor inválido')
+    return datos
+
+@app.route('/api/v1/isps')
+@api_token_required
+def api_isps():
+    try:
+        campos = [campo.strip() for campo in request.args.get('fields', '').split(',') if campo.strip()] or list(CAMPOS_API)
+        desconocidos = [campo for campo in campos if campo not in CAMPOS_API]
+        if desconocidos:
+            raise ValueError(f"campos desconocidos: {', '.join(desconocidos)}")
+        
+        limite = int(request.args.get('limit', 500))
+        if not 1 <= limite <= 5000:
+            raise ValueError('limit debe estar entre 1 y 5000')
+        
+        if request.args.get('cursor'):
+            # Páginas siguientes: los filtros vienen en el cursor
+            filtros = _decodificar_cursor(request.args['cursor'])
+        else:
+            desde = _fecha_exportacion(request.args.get('updated_since'))
+            filtros = {
+                'id': 0,
+                'desde': desde.isoformat() if desde else None,
+                'ids': [int(valor) for valor in request.args.get('ids', '').split(',') if valor.strip()],
+                'hasta': datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+            }
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+    
+    consulta = select(*ISP.__table__.columns).where(ISP.id > filtros['id'])
+    if filtros.get('desde'):
+        consulta = consulta.where(ISP.fecha_actualizacion >= datetime.fromisoformat(filtros['desde']))
+    if filtros.get('ids'):
+        consulta = consulta.where(ISP.id.in_(filtros['ids']))
+    filas = db.session.execute(consulta.order_by(ISP.id).limit(limite + 1)).all()
+    
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _codificar_cursor(dict(filtros, id=filas[-1].id))
+    
+    respuesta = {
+        'data': [{campo: CAMPOS_API[campo](fila) for campo in campos} for fila in filas],
+        'next_cursor': siguiente,
+    }
+    
+    # Sincronización incremental: ids borrados desde updated_since (en la primera
+    # página); un id que se volvió a usar ya viene en data y no se informa
+    if filtros.get('desde') and not request.args.get('cursor'):
+        bajas = select(ISPEliminado.isp_id).distinct().where(
+            ISPEliminado.fecha_eliminacion >= datetime.fromisoformat(filtros['desde']),
+            ISPEliminado.isp_id.not_in(select(ISP.id))
+        )
+        if filtros.get('ids'):
+            bajas = bajas.where(ISPEliminado.isp_id.in_(filtros['ids']))
+        respuesta['eliminados'] = db.session.execute(bajas.order_by(ISPEliminado.isp_id)).scalars().all()
+    
+    # Usar como updated_since en la próxima sincronización. Se resta un margen:
+    # una transacción que empezó antes de "hasta" puede confirmar su cambio después
+    # (con una fecha anterior); esas filas se vuelven a entregar, no se pierden
+    margen = int(get_env_config().get('API_MARGEN_SINCRONIZACION', 60))
+    respuesta['sincronizado_hasta'] = _fecha_api(datetime.fromisoformat(filtros['hasta']) - timedelta(seconds=margen))
+    return jsonify(respuesta)
 
 # Rutas de la aplicación
 @app.route('/')
@@ -413,12 +1981,99 @@ def agregar_isp():
         )
         
         db.session.add(nuevo_isp)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Otro guardado simultáneo usó la misma IP (índice único ix_isp_ip_vm)
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Ya existe un ISP con esa IP de VM'})
         
         return jsonify({'success': True, 'message': f'ISP {nombre} agregado correctamente'})
     
     return render_template('agregar_isp.html')
 
+@app.route('/importar_isps', methods=['GET', 'POST'])
+@login_required
+def importar_isps():
+    if request.method == 'POST':
+        # Archivo subido desde el formulario o cuerpo crudo
+        # (curl --data-binary @isps.csv -H 'Content-Type: text/csv' '.../importar_isps?actualizar=true')
+        if request.mimetype in TIPOS_FORMULARIO:
+            archivo = request.files.get('archivo')
+            if archivo is None or not archivo.filename:
+                # Werkzeug ya leyó el cuerpo como formulario: las filas se perderían
+                return jsonify({
+                    'success': False,
+                    'message': "Falta el archivo: súbelo en el campo 'archivo' o envía el cuerpo "
+                               "con Content-Type text/csv, application/json o application/x-ndjson"
+                }), 400
+            stream, nombre_archivo, content_type = archivo.stream, archivo.filename, archivo.mimetype
+            opciones = request.values
+        else:
+            # Cuerpo crudo: las opciones solo pueden venir en la URL
+            stream, nombre_archivo, content_type = request.stream, '', request.mimetype
+            opciones = request.args
+        
+        formato = opciones.get('formato') or detectar_formato_importacion(nombre_archivo, content_type)
+        if formato not in FORMATOS_IMPORTACION:
+            return jsonify({'success': False, 'message': 'Formato no reconocido: usa csv, json o ndjson'})
+        
+        def activado(nombre, defecto):
+            return opciones.get(nombre, defecto).lower() in ('true', '1', 'on', 'si')
+        
+        # Se lee el archivo como flujo de texto, sin cargarlo completo en memoria
+        texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        resumen = importar_filas_isp(
+            leer_filas_importacion(texto, formato),
+            actualizar=activado('actualizar', 'true'),
+            lote=int(get_env_config().get('IMPORTACION_LOTE', 500)),
+            probar=activado('probar', 'false'),
+            hilos=int(get_env_config().get('IMPORTACION_HILOS', 16))
+        )
+        resumen['success'] = 'error_archivo' not in resumen
+        resumen['message'] = resumen.get('error_archivo') or (
+            f"{resumen['creados']} ISPs creados, {resumen['actualizados']} actualizados, "
+            f"{len(resumen['errores'])} filas con errores"
+        )
+        return jsonify(resumen)
+    
+    return render_template('importar_isps.html')
+
+@app.route('/exportar')
+@login_required
+def exportar():
+    isps = db.session.execute(select(ISP.id, ISP.nombre).order_by(ISP.nombre)).all()
+    return render_template('exportar.html', isps=isps)
+
+@app.route('/exportar/<tipo>')
+@login_required
+def exportar_datos(tipo):
+    if tipo not in TIPOS_EXPORTACION:
+        return jsonify({'success': False, 'message': f'Tipo de exportación desconocido: {tipo}'}), 404
+    
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': 'El formato debe ser csv o ndjson'}), 400
+    
+    try:
+        desde, hasta = rango_exportacion(request.args)
+        isp_ids = [int(valor) for parametro in request.args.getlist('isp_id')
+                   for valor in parametro.split(',') if valor.strip()]
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Parámetros inválidos: {str(e)}'}), 400
+    
+    columnas = [columna.key for columna in _definicion_exportacion(tipo)[0].selected_columns]
+    filas = filas_exportacion(tipo, desde, hasta, isp_ids,
+                              lote=int(get_env_config().get('EXPORTACION_LOTE', 5000)))
+    
+    nombre_archivo = f"{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    response = Response(
+        stream_with_context(generar_exportacion(filas, columnas, formato)),
+        mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
 @app.route('/editar_isp/<int:isp_id>', methods=['GET', 'POST'])
 @login_required
 def editar_isp(isp_id):
@@ -442,7 +2097,11 @@ def editar_isp(isp_id):
         isp.limite_clientes = limite_clientes
         isp.email_alerta = email_alerta
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Ya existe otro ISP con esa IP de VM'})
         
         return jsonify({'success': True, 'message': f'ISP {nombre} actualizado correctamente'})
     
@@ -453,16 +2112,80 @@ def editar_isp(isp_id):
 def verificar_dispositivos(isp_id):
     isp = ISP.query.get_or_404(isp_id)
     dispositivos_actuales = verificar_dispositivos_genieacs(isp)
+    vaciar_intentos_sondeo()
+    
+    # Si el sondeo falló se conserva el último conteo bueno
+    if dispositivos_actuales is None:
+        return jsonify({
+            'success': False,
+            'message': 'No se pudo conectar con GenieACS; se conserva el último conteo',
+            'dispositivos_actuales': isp.dispositivos_actuales,
+            'limite_clientes': isp.limite_clientes
+        })
+    
     isp.dispositivos_actuales = dispositivos_actuales
     isp.ultima_verificacion = datetime.now(timezone.utc)
     db.session.commit()
     
     return jsonify({
+        'success': True,
         'dispositivos_actuales': dispositivos_actuales,
         'limite_clientes': isp.limite_clientes,
         'estado': 'sobrepasado' if dispositivos_actuales > isp.limite_clientes else 'normal'
     })
 
+@app.route('/desglose/<int:isp_id>')
+@login_required
+def desglose_isp(isp_id):
+    isp = ISP.query.get_or_404(isp_id)
+    if not isp.desglose:
+        return jsonify({'success': False, 'message': 'Aún no hay desglose para este ISP'})
+    return jsonify({'success': True, 'desglose': isp.desglose.to_dict()})
+
+@app.route('/perfil', methods=['GET', 'POST'])
+@login_required
+def perfil():
+    ruta = request.form.get('ruta', '/')
+    ordenar = request.form.get('ordenar', 'cumulative')
+    resultado = None
+    codigo = None
+    
+    if request.method == 'POST':
+        if ordenar not in ('cumulative', 'tottime', 'ncalls'):
+            ordenar = 'cumulative'
+        try:
+            codigo, resultado = perfilado.perfilar_ruta(app, ruta, ordenar)
+        except ValueError as e:
+            flash(str(e), 'error')
+    
+    rutas = sorted(rule.rule for rule in app.url_map.iter_rules()
+                   if rule.endpoint in perfilado.ENDPOINTS_PERFILABLES and not rule.arguments)
+    
+    return render_template('perfil.html', ruta=ruta, ordenar=ordenar, rutas=rutas,
+                           codigo=codigo, resultado=resultado)
+
+@app.route('/diagnostico/<int:isp_id>')
+@login_required
+def diagnostico_isp(isp_id):
+    isp = ISP.query.get_or_404(isp_id)
+    desde = datetime.now(timezone.utc) - timedelta(hours=24)
+    
+    # Resumen de las últimas 24 horas por endpoint y resultado
+    resumen = db.session.query(
+        IntentoSondeo.endpoint,
+        IntentoSondeo.resultado,
+        db.func.count(IntentoSondeo.id),
+        db.func.avg(IntentoSondeo.latencia_ms),
+        db.func.max(IntentoSondeo.latencia_ms)
+    ).filter(
+        IntentoSondeo.isp_id == isp_id,
+        IntentoSondeo.fecha >= desde
+    ).group_by(IntentoSondeo.endpoint, IntentoSondeo.resultado).all()
+    
+    intentos = isp.intentos_sondeo.order_by(IntentoSondeo.fecha.desc()).limit(100).all()
+    
+    return render_template('diagnostico_isp.html', isp=isp, resumen=resumen, intentos=intentos)
+
 @app.route('/configuracion', methods=['GET', 'POST'])
 @login_required
 def configuracion():
@@ -487,7 +2210,39 @@ def configuracion():
                 "PORT=5000\n",
                 "DEBUG=False\n",
                 "MONITORING_INTERVAL=600\n",
-                "ALERT_COOLDOWN=86400\n"
+                "ALERT_COOLDOWN=86400\n",
+                "GENIEACS_DIAS_INFORM=\n",
+                "GENIEACS_EXCLUIR_TAGS=\n",
+                "DESGLOSE_INTERVAL=3600\n",
+                "MONITOREO_INCREMENTAL=False\n",
+                "RECONCILIACION_INTERVAL=3600\n",
+                "METRICS_TOKEN=\n",
+                "API_TOKEN=\n",
+                "PROFILING=False\n",
+                "PROFILING_UMBRAL_MS=500\n",
+                "LOG_LEVEL=INFO\n",
+                "LOG_VENTANA_REPETICIONES=3600\n",
+                "INTENTOS_LOTE=100\n",
+                "INTENTOS_RETENCION_DIAS=7\n",
+                "ALERTAS_RETENCION_DIAS=180\n",
+                "ALERTAS_ARCHIVO_DIR=archivo_alertas\n",
+                "BACKUP_INTERVAL=21600\n",
+                "BACKUP_DIR=backups\n",
+                "BACKUP_RETENCION_DIAS=30\n",
+                "BACKUP_METODO=backup\n",
+                "IMPORTACION_LOTE=500\n",
+                "IMPORTACION_HILOS=16\n",
+                "EXPORTACION_LOTE=5000\n",
+                "CONTEOS_RETENCION_DIAS=730\n",
+                "API_MARGEN_SINCRONIZACION=60\n",
+                "API_BAJAS_RETENCION_DIAS=90\n",
+                "DB_POOL_SIZE=5\n",
+                "DB_MAX_OVERFLOW=10\n",
+                "DB_POOL_TIMEOUT=30\n",
+                "DB_POOL_RECYCLE=1800\n",
+                "DB_CONNECT_TIMEOUT=10\n",
+                "DIAGNOSTICO_TIMEOUT_CONEXION=1\n",
+                "DIAGNOSTICO_TIMEOUT_LECTURA=3\n"
             ]
         
         # Actualizar variables
@@ -626,25 +2381,31 @@ def probar_conexion():
         if not url:
             return jsonify({'success': False, 'error': 'URL no proporcionada'})
         
-        # Crear un objeto ISP temporal para probar
-        class TempISP:
-            def __init__(self, url):
-                self.nombre = 'Prueba'
-                self.genieacs_url = url
-        
-        temp_isp = TempISP(url)
-        dispositivos = verificar_dispositivos_genieacs(temp_isp)
+        # Diagnóstico en paralelo con timeouts cortos (no el sondeo completo del monitoreo)
+        current_config = get_env_config()
+        diagnostico = diagnosticar_genieacs(
+            url,
+            timeout_conexion=float(current_config.get('DIAGNOSTICO_TIMEOUT_CONEXION', 1)),
+            timeout_lectura=float(current_config.get('DIAGNOSTICO_TIMEOUT_LECTURA', 3))
+        )
+        exito = diagnostico['exito']
         
-        if dispositivos >= 0:
+        if exito is not None:
+            if exito['dispositivos'] is not None:
+                mensaje = f"Conexión exitosa. Se encontraron {exito['dispositivos']} dispositivos."
+            else:
+                mensaje = 'Conexión exitosa. El servidor no informa el total de dispositivos; se contarán en el próximo monitoreo.'
             return jsonify({
                 'success': True, 
-                'dispositivos': dispositivos,
-                'mensaje': f'Conexión exitosa. Se encontraron {dispositivos} dispositivos.'
+                'dispositivos': exito['dispositivos'],
+                'mensaje': mensaje,
+                'diagnostico': diagnostico
             })
         else:
             return jsonify({
                 'success': False, 
-                'error': 'No se pudo conectar con el servidor GenieACS'
+                'error': diagnostico['error'],
+                'diagnostico': diagnostico
             })
             
     except Exception as e:
@@ -655,7 +2416,7 @@ def probar_conexion():
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        inicializar_base_datos()
         
         # Crear usuario admin por defecto si no existe
         admin_existente = Admin.query.filter_by(username='admin').first()
@@ -668,8 +2429,7 @@ if __name__ == '__main__':
             db.session.commit()
             print("Usuario admin creado: admin / admin123")
     
-    # Iniciar monitoreo en hilo separado
-    monitor_thread = threading.Thread(target=monitoreo_automatico, daemon=True)
-    monitor_thread.start()
+    # Iniciar monitoreo, desglose, mantenimiento y backups en hilos separados
+    iniciar_tareas_programadas()
     
     app.run(debug=True, host='0.0.0.0', port=5000)
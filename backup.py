@@ -2,169 +2,516 @@
 """
 Script de backup para Admin Skypass
 Crea copias de seguridad de la base de datos
+
+Formato: cada backup es un manifiesto (manifiestos/<nombre>.json) con la
+lista de bloques de la base de datos. Los bloques se guardan comprimidos
+una sola vez en bloques/ identificados por su SHA-256, así los backups
+sucesivos solo agregan los bloques que cambiaron. catalogo.json resume
+todos los backups para listarlos sin recorrer el directorio.
+
+Los backups se toman en caliente: la copia avanza por pasos con la API de
+backup de SQLite (o con VACUUM INTO) sin bloquear a los escritores, y la
+restauración escribe sobre la base en uso también con la API de backup, así
+que la aplicación solo nota una pausa corta de escritura.
 """
 
 import os
-import shutil
+import sys
+import gzip
+import json
 import sqlite3
-from datetime import datetime
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import argparse
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Crear y limpiar también corren desde el backup automático de la aplicación:
+# informan por el registro (JSON en la app, texto simple en la línea de comandos)
+logger = logging.getLogger('skypass.backup')
+
+# Tamaño de bloque: múltiplo de cualquier tamaño de página de SQLite
+TAMANO_BLOQUE = 256 * 1024
+
+# Copia en caliente: páginas por paso y pausa entre pasos para dejar escribir
+PAGINAS_POR_PASO = 1024
+PAUSA_ENTRE_PASOS = 0.005
+
+# Tiempo máximo (segundos) esperando a que los escritores liberen la base
+ESPERA_BLOQUEO = 30
+
+# Directorios de backups bloqueados por el hilo actual (el bloqueo es reentrante)
+_bloqueos = threading.local()
+
+@contextmanager
+def bloqueo_backups(backup_dir):
+    """Bloqueo exclusivo del directorio de backups, entre procesos y entre hilos
+
+    Crear, limpiar, restaurar y verificar lo toman: así la limpieza no borra
+    bloques de un backup que aún no está en el catálogo, y el backup automático
+    y el de la línea de comandos no se pisan las entradas de catalogo.json.
+    """
+    clave = os.path.abspath(backup_dir)
+    activos = getattr(_bloqueos, 'activos', None)
+    if activos is None:
+        activos = _bloqueos.activos = set()
+    if clave in activos:
+        yield
+        return
+
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, '.bloqueo'), 'a') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        activos.add(clave)
+        try:
+            yield
+        finally:
+            activos.discard(clave)
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+
+def _ruta_bloque(backup_dir, digest):
+    return os.path.join(backup_dir, 'bloques', digest[:2], f"{digest}.gz")
+
+def _ruta_manifiesto(backup_dir, nombre):
+    return os.path.join(backup_dir, 'manifiestos', f"{nombre}.json")
+
+def _escribir_json_atomico(ruta, datos):
+    """Escribir JSON en un archivo temporal y reemplazar el destino"""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+def leer_catalogo(backup_dir='backups'):
+    """Leer el catálogo de backups (lista vacía si no existe)"""
+    ruta = os.path.join(backup_dir, 'catalogo.json')
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_catalogo(catalogo, backup_dir='backups'):
+    """Guardar el catálogo de backups"""
+    _escribir_json_atomico(os.path.join(backup_dir, 'catalogo.json'), catalogo)
+
+def guardar_bloques(archivo, backup_dir, tamano_bloque=TAMANO_BLOQUE):
+    """Trocear un archivo, guardar los bloques nuevos comprimidos y devolver el manifiesto parcial"""
+    bloques = []
+    bytes_nuevos = 0
+    hash_total = hashlib.sha256()
+    tamano = 0
+
+    with open(archivo, 'rb') as f:
+        while True:
+            datos = f.read(tamano_bloque)
+            if not datos:
+                break
+            tamano += len(datos)
+            hash_total.update(datos)
+            digest = hashlib.sha256(datos).hexdigest()
+            bloques.append(digest)
+
+            ruta = _ruta_bloque(backup_dir, digest)
+            if os.path.exists(ruta):
+                continue  # Bloque sin cambios respecto a un backup anterior
+
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.tmp"
+            with open(temporal, 'wb') as destino:
+                destino.write(gzip.compress(datos, compresslevel=6))
+                destino.flush()
+                os.fsync(destino.fileno())
+            os.replace(temporal, ruta)
+            bytes_nuevos += os.path.getsize(ruta)
+
+    return {
+        'tamano': tamano,
+        'sha256': hash_total.hexdigest(),
+        'tamano_bloque': tamano_bloque,
+        'bloques': bloques,
+        'bytes_nuevos': bytes_nuevos,
+    }
+
+def crear_snapshot(db_path, destino, metodo='backup', paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS):
+    """Copiar la base en uso a `destino` sin bloquear a los escritores
+
+    metodo='backup' copia por pasos de `paginas` páginas con una pausa entre
+    pasos (conserva el orden de páginas, mejor para la deduplicación);
+    metodo='vacuum' usa VACUUM INTO, que escribe una copia compactada.
+    """
+    source_conn = sqlite3.connect(db_path, timeout=ESPERA_BLOQUEO)
+    try:
+        if metodo == 'vacuum':
+            source_conn.execute("VACUUM INTO ?", (destino,))
+        else:
+            backup_conn = sqlite3.connect(destino)
+            try:
+                source_conn.backup(backup_conn, pages=paginas, sleep=pausa)
+            finally:
+                backup_conn.close()
+    finally:
+        source_conn.close()
+
+def verificar_integridad(db_path):
+    """Ejecutar PRAGMA integrity_check y devolver (ok, mensajes)"""
+    conn = sqlite3.connect(db_path, timeout=ESPERA_BLOQUEO)
+    try:
+        mensajes = [fila[0] for fila in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return mensajes == ['ok'], mensajes
+
+def contar_filas(conn):
+    """Contar las filas de cada tabla de una conexión"""
+    tablas = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    return {tabla: conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0] for tabla in tablas}
+
+def crear_backup(db_path='isps.db', backup_dir='backups', metodo='backup'):
+    """Crear backup de la base de datos (en caliente, sin detener la aplicación)"""
 
-def crear_backup(db_path='isps.db', backup_dir='backups'):
-    """Crear backup de la base de datos"""
-    
     # Crear directorio de backups si no existe
     if not os.path.exists(backup_dir):
         os.makedirs(backup_dir)
-        print(f"📁 Directorio de backups creado: {backup_dir}")
-    
+        logger.info(f"Directorio de backups creado: {backup_dir}")
+
     # Verificar que la base de datos existe
     if not os.path.exists(db_path):
-        print(f"❌ Error: No se encontró la base de datos {db_path}")
-        return False
-    
-    # Generar nombre del archivo de backup
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_filename = f"isps_backup_{timestamp}.db"
-    backup_path = os.path.join(backup_dir, backup_filename)
-    
-    try:
-        # Crear backup usando SQLite
-        source_conn = sqlite3.connect(db_path)
-        backup_conn = sqlite3.connect(backup_path)
-        
-        source_conn.backup(backup_conn)
-        
-        source_conn.close()
-        backup_conn.close()
-        
-        # Obtener tamaño del archivo
-        file_size = os.path.getsize(backup_path)
-        size_mb = file_size / (1024 * 1024)
-        
-        print(f"✅ Backup creado exitosamente:")
-        print(f"   - Archivo: {backup_path}")
-        print(f"   - Tamaño: {size_mb:.2f} MB")
-        print(f"   - Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error al crear backup: {e}")
+        logger.error(f"No se encontró la base de datos {db_path}")
         return False
 
+    with bloqueo_backups(backup_dir):
+        # Generar nombre del backup
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        nombre = f"isps_backup_{timestamp}"
+        os.makedirs(os.path.join(backup_dir, 'manifiestos'), exist_ok=True)
+
+        # Dos backups en el mismo segundo (p. ej. el automático y el previo a una restauración)
+        sufijo = 1
+        while os.path.exists(_ruta_manifiesto(backup_dir, nombre)):
+            nombre = f"isps_backup_{timestamp}_{sufijo}"
+            sufijo += 1
+
+        try:
+            # Copia consistente en caliente (API de backup por pasos o VACUUM INTO)
+            descriptor, snapshot = tempfile.mkstemp(prefix='skypass_snapshot_', suffix='.db', dir=backup_dir)
+            os.close(descriptor)
+            try:
+                crear_snapshot(db_path, snapshot, metodo)
+                manifiesto = guardar_bloques(snapshot, backup_dir)
+            finally:
+                os.remove(snapshot)
+
+            manifiesto.update({
+                'nombre': nombre,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'origen': os.path.abspath(db_path),
+                'metodo': metodo,
+            })
+            _escribir_json_atomico(_ruta_manifiesto(backup_dir, nombre), manifiesto)
+
+            catalogo = leer_catalogo(backup_dir)
+            catalogo.append({
+                'nombre': nombre,
+                'fecha': manifiesto['fecha'],
+                'tamano': manifiesto['tamano'],
+                'bytes_nuevos': manifiesto['bytes_nuevos'],
+                'bloques': len(manifiesto['bloques']),
+                'sha256': manifiesto['sha256'],
+            })
+            guardar_catalogo(catalogo, backup_dir)
+
+            logger.info(f"Backup creado: {nombre} (base de {manifiesto['tamano'] / (1024 * 1024):.2f} MB, "
+                        f"{manifiesto['bytes_nuevos'] / (1024 * 1024):.2f} MB nuevos comprimidos)")
+            return nombre
+
+        except Exception as e:
+            logger.error(f"Error al crear backup: {e}")
+            return False
+
 def listar_backups(backup_dir='backups'):
     """Listar todos los backups disponibles"""
-    
+
     if not os.path.exists(backup_dir):
         print(f"📁 No existe el directorio de backups: {backup_dir}")
         return
-    
-    backups = []
-    for filename in os.listdir(backup_dir):
-        if filename.startswith('isps_backup_') and filename.endswith('.db'):
-            file_path = os.path.join(backup_dir, filename)
-            stat = os.stat(file_path)
-            backups.append({
-                'filename': filename,
-                'path': file_path,
-                'size': stat.st_size,
-                'date': datetime.fromtimestamp(stat.st_mtime)
-            })
-    
-    if not backups:
+
+    catalogo = leer_catalogo(backup_dir)
+    if not catalogo:
         print("📁 No se encontraron backups")
         return
-    
+
     # Ordenar por fecha (más reciente primero)
-    backups.sort(key=lambda x: x['date'], reverse=True)
-    
+    backups = sorted(catalogo, key=lambda x: x['fecha'], reverse=True)
+
     print(f"📋 Backups disponibles ({len(backups)}):")
     print("-" * 80)
-    print(f"{'Archivo':<30} {'Fecha':<20} {'Tamaño':<10}")
+    print(f"{'Backup':<30} {'Fecha':<20} {'Tamaño':<12} {'Nuevo':<10}")
     print("-" * 80)
-    
+
     for backup in backups:
-        size_mb = backup['size'] / (1024 * 1024)
-        print(f"{backup['filename']:<30} {backup['date'].strftime('%Y-%m-%d %H:%M:%S'):<20} {size_mb:.2f} MB")
+        size_mb = backup['tamano'] / (1024 * 1024)
+        nuevo_mb = backup['bytes_nuevos'] / (1024 * 1024)
+        fecha = datetime.fromisoformat(backup['fecha']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{backup['nombre']:<30} {fecha:<20} {size_mb:.2f} MB    {nuevo_mb:.2f} MB")
+
+    total_mb = sum(b['bytes_nuevos'] for b in backups) / (1024 * 1024)
+    print("-" * 80)
+    print(f"Espacio usado por los bloques: {total_mb:.2f} MB")
+
+def leer_manifiesto(backup, backup_dir='backups'):
+    """Leer un manifiesto por nombre o por ruta"""
+    ruta = backup if os.path.exists(backup) else _ruta_manifiesto(backup_dir, backup)
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-def restaurar_backup(backup_path, db_path='isps.db'):
-    """Restaurar backup de la base de datos"""
-    
-    if not os.path.exists(backup_path):
+def reconstruir_backup(backup, destino, backup_dir='backups'):
+    """Reconstruir la base de datos de un backup en `destino` y verificar su checksum"""
+    manifiesto = leer_manifiesto(backup, backup_dir)
+    hash_total = hashlib.sha256()
+    with open(destino, 'wb') as f:
+        for digest in manifiesto['bloques']:
+            with open(_ruta_bloque(backup_dir, digest), 'rb') as origen:
+                datos = gzip.decompress(origen.read())
+            hash_total.update(datos)
+            f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    if hash_total.hexdigest() != manifiesto['sha256']:
+        raise ValueError(f"Checksum incorrecto al reconstruir {manifiesto['nombre']}")
+    return manifiesto
+
+def restaurar_backup(backup_path, db_path='isps.db', backup_dir='backups'):
+    """Restaurar backup de la base de datos sin detener la aplicación
+
+    El backup se reconstruye y verifica en un temporal; luego se copia sobre
+    la base en uso con la API de backup de SQLite en un solo paso. Durante ese
+    paso SQLite retiene a los escritores (esperan su busy_timeout), y los
+    lectores ven la base anterior o la restaurada, nunca una mezcla.
+    """
+
+    es_manifiesto = not backup_path.endswith('.db')
+    if not es_manifiesto and not os.path.exists(backup_path):
         print(f"❌ Error: No se encontró el archivo de backup {backup_path}")
         return False
-    
+
+    with bloqueo_backups(backup_dir):
+        temporal = None
+        try:
+            if es_manifiesto:
+                # Reconstruir en un temporal con checksum verificado
+                os.makedirs(backup_dir, exist_ok=True)
+                descriptor, temporal = tempfile.mkstemp(prefix='skypass_restaurando_', suffix='.db', dir=backup_dir)
+                os.close(descriptor)
+                reconstruir_backup(backup_path, temporal, backup_dir)
+                origen = temporal
+            else:
+                # Backups antiguos en formato .db completo
+                origen = backup_path
+
+            # Se verifica la copia antes de reemplazar la base: después del paso de
+            # restauración el monitor ya puede estar escribiendo y un conteo sobre
+            # la base en uso no demostraría nada
+            ok, mensajes = verificar_integridad(origen)
+            if not ok:
+                print(f"❌ El backup no pasa integrity_check: {'; '.join(mensajes[:5])}")
+                return False
+            conn = sqlite3.connect(origen)
+            try:
+                filas = contar_filas(conn)
+            finally:
+                conn.close()
+
+            # Backup en caliente de la base actual antes de sobrescribirla
+            if os.path.exists(db_path):
+                backup_actual = crear_backup(db_path, backup_dir)
+                if not backup_actual:
+                    print("❌ No se pudo respaldar la base actual; restauración cancelada")
+                    return False
+                print(f"💾 Backup de la base de datos actual creado: {backup_actual}")
+
+            source_conn = sqlite3.connect(origen)
+            dest_conn = sqlite3.connect(db_path, timeout=ESPERA_BLOQUEO)
+            try:
+                # Un solo paso: SQLite espera a que terminen las escrituras en curso,
+                # bloquea la base y copia todas las páginas
+                inicio = time.perf_counter()
+                source_conn.backup(dest_conn, pages=-1, sleep=PAUSA_ENTRE_PASOS)
+                pausa_ms = (time.perf_counter() - inicio) * 1000
+            finally:
+                source_conn.close()
+                dest_conn.close()
+
+            print(f"✅ Base de datos restaurada desde: {backup_path}")
+            print(f"   - Pausa de escritura: {pausa_ms:.0f} ms")
+            print(f"   - Filas restauradas: {sum(filas.values())} en {len(filas)} tablas")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error al restaurar backup: {e}")
+            return False
+        finally:
+            if temporal and os.path.exists(temporal):
+                os.remove(temporal)
+
+def _verificar_bloque(backup_dir, digest):
+    """Comprobar que un bloque existe y su contenido coincide con su nombre"""
     try:
-        # Crear backup de la base de datos actual
-        if os.path.exists(db_path):
-            backup_actual = f"{db_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            shutil.copy2(db_path, backup_actual)
-            print(f"💾 Backup de la base de datos actual creado: {backup_actual}")
-        
-        # Restaurar desde backup
-        shutil.copy2(backup_path, db_path)
-        
-        print(f"✅ Base de datos restaurada desde: {backup_path}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error al restaurar backup: {e}")
-        return False
+        with open(_ruta_bloque(backup_dir, digest), 'rb') as f:
+            datos = gzip.decompress(f.read())
+        return digest, hashlib.sha256(datos).hexdigest() == digest, len(datos)
+    except Exception:
+        return digest, False, 0
+
+def verificar_backups(backup_dir='backups', nombres=None, hilos=None):
+    """Verificar en paralelo la integridad de los bloques de los backups"""
+
+    with bloqueo_backups(backup_dir):
+        catalogo = leer_catalogo(backup_dir)
+        if nombres:
+            catalogo = [b for b in catalogo if b['nombre'] in nombres]
+        if not catalogo:
+            print("📁 No se encontraron backups para verificar")
+            return False
+
+        manifiestos = [leer_manifiesto(b['nombre'], backup_dir) for b in catalogo]
+        bloques_unicos = {digest for m in manifiestos for digest in m['bloques']}
+
+        # gzip y hashlib liberan el GIL, así que los hilos trabajan en paralelo
+        with ThreadPoolExecutor(max_workers=hilos or min(32, (os.cpu_count() or 1) * 2)) as executor:
+            resultados = {digest: (ok, tamano) for digest, ok, tamano in
+                          executor.map(lambda d: _verificar_bloque(backup_dir, d), bloques_unicos)}
+
+        todo_ok = True
+        for manifiesto in manifiestos:
+            malos = [d for d in manifiesto['bloques'] if not resultados[d][0]]
+            tamano = sum(resultados[d][1] for d in manifiesto['bloques'])
+            if malos or tamano != manifiesto['tamano']:
+                todo_ok = False
+                print(f"❌ {manifiesto['nombre']}: {len(malos)} bloque(s) dañado(s) o faltante(s)")
+            else:
+                print(f"✅ {manifiesto['nombre']}: {len(manifiesto['bloques'])} bloques correctos")
+
+        print(f"🔍 Bloques verificados: {len(bloques_unicos)}")
+        return todo_ok
 
 def limpiar_backups_antiguos(backup_dir='backups', dias=30):
     """Eliminar backups más antiguos que X días"""
-    
+
     if not os.path.exists(backup_dir):
-        print(f"📁 No existe el directorio de backups: {backup_dir}")
+        logger.info(f"No existe el directorio de backups: {backup_dir}")
         return
-    
-    from datetime import timedelta
-    fecha_limite = datetime.now() - timedelta(days=dias)
-    eliminados = 0
-    
-    for filename in os.listdir(backup_dir):
-        if filename.startswith('isps_backup_') and filename.endswith('.db'):
-            file_path = os.path.join(backup_dir, filename)
-            stat = os.stat(file_path)
-            fecha_archivo = datetime.fromtimestamp(stat.st_mtime)
-            
-            if fecha_archivo < fecha_limite:
+
+    with bloqueo_backups(backup_dir):
+        fecha_limite = datetime.now() - timedelta(days=dias)
+        eliminados = 0
+
+        catalogo = leer_catalogo(backup_dir)
+        conservados = []
+        for backup in catalogo:
+            try:
+                antiguo = datetime.fromisoformat(backup['fecha']) < fecha_limite
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Entrada del catálogo sin fecha válida, se conserva: {backup.get('nombre')}: {e}")
+                antiguo = False
+            if antiguo:
                 try:
-                    os.remove(file_path)
-                    print(f"🗑️  Eliminado: {filename}")
+                    os.remove(_ruta_manifiesto(backup_dir, backup['nombre']))
+                    logger.info(f"Eliminado: {backup['nombre']}")
+                    eliminados += 1
+                    continue
+                except FileNotFoundError:
                     eliminados += 1
+                    continue
                 except Exception as e:
-                    print(f"❌ Error al eliminar {filename}: {e}")
-    
-    print(f"✅ Se eliminaron {eliminados} backups antiguos (más de {dias} días)")
+                    logger.error(f"Error al eliminar {backup['nombre']}: {e}")
+            conservados.append(backup)
+        guardar_catalogo(conservados, backup_dir)
+
+        # Eliminar los bloques que ya no usa ningún backup. Un manifiesto
+        # faltante o dañado se informa y no detiene la limpieza (ese backup ya
+        # no se puede restaurar; --verificar lo muestra)
+        en_uso = set()
+        for backup in conservados:
+            try:
+                en_uso.update(leer_manifiesto(backup['nombre'], backup_dir)['bloques'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"No se pudo leer el manifiesto de {backup.get('nombre')}: {e}")
+        bloques_eliminados = 0
+        directorio_bloques = os.path.join(backup_dir, 'bloques')
+        if os.path.exists(directorio_bloques):
+            for subdirectorio in os.listdir(directorio_bloques):
+                ruta_sub = os.path.join(directorio_bloques, subdirectorio)
+                for filename in os.listdir(ruta_sub):
+                    if filename.endswith('.gz') and filename[:-3] not in en_uso:
+                        os.remove(os.path.join(ruta_sub, filename))
+                        bloques_eliminados += 1
+
+        # Backups antiguos en formato .db completo
+        for filename in os.listdir(backup_dir):
+            if filename.startswith('isps_backup_') and filename.endswith('.db'):
+                file_path = os.path.join(backup_dir, filename)
+                stat = os.stat(file_path)
+                fecha_archivo = datetime.fromtimestamp(stat.st_mtime)
+
+                if fecha_archivo < fecha_limite:
+                    try:
+                        os.remove(file_path)
+                        logger.info(f"Eliminado: {filename}")
+                        eliminados += 1
+                    except Exception as e:
+                        logger.error(f"Error al eliminar {filename}: {e}")
+
+        logger.info(f"Se eliminaron {eliminados} backups antiguos (más de {dias} días) y {bloques_eliminados} bloques sin uso")
 
 def main():
     """Función principal"""
     parser = argparse.ArgumentParser(description='Script de backup para Admin Skypass')
     parser.add_argument('--crear', action='store_true', help='Crear nuevo backup')
     parser.add_argument('--listar', action='store_true', help='Listar backups disponibles')
-    parser.add_argument('--restaurar', type=str, help='Restaurar desde backup (ruta del archivo)')
+    parser.add_argument('--restaurar', type=str, help='Restaurar desde backup (nombre, manifiesto o archivo .db)')
+    parser.add_argument('--verificar', nargs='*', metavar='BACKUP', help='Verificar integridad (todos si no se indica)')
     parser.add_argument('--limpiar', type=int, metavar='DIAS', help='Limpiar backups más antiguos que X días')
     parser.add_argument('--db', default='isps.db', help='Ruta de la base de datos (default: isps.db)')
     parser.add_argument('--backup-dir', default='backups', help='Directorio de backups (default: backups)')
-    
+    parser.add_argument('--metodo', choices=('backup', 'vacuum'), default='backup',
+                        help='Copia en caliente: API de backup por pasos o VACUUM INTO (default: backup)')
+
     args = parser.parse_args()
-    
+
+    # Los mensajes de crear y limpiar van por el registro: en la consola, texto simple
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+
     print("🌐 Admin Skypass - Script de Backup")
     print("=" * 40)
-    
+
     if args.crear:
-        crear_backup(args.db, args.backup_dir)
+        crear_backup(args.db, args.backup_dir, args.metodo)
     elif args.listar:
         listar_backups(args.backup_dir)
     elif args.restaurar:
-        restaurar_backup(args.restaurar, args.db)
-    elif args.limpiar:
+        restaurar_backup(args.restaurar, args.db, args.backup_dir)
+    elif args.verificar is not None:
+        if not verificar_backups(args.backup_dir, args.verificar):
+            raise SystemExit(1)
+    elif args.limpiar is not None:
         limpiar_backups_antiguos(args.backup_dir, args.limpiar)
     else:
         # Por defecto, crear backup
-        crear_backup(args.db, args.backup_dir)
+        crear_backup(args.db, args.backup_dir, args.metodo)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark del monitoreo de Admin Skypass
+Ejecuta verificar_dispositivos_genieacs y el ciclo de monitoreo contra una
+flota de servidores GenieACS falsos y guarda los resultados en JSON
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import genieacs_falso
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+def resumen_latencias(valores):
+    """Resumen en milisegundos de una lista de latencias en segundos"""
+    if not valores:
+        return {}
+    return {
+        'muestras': len(valores),
+        'min_ms': round(min(valores) * 1000, 2),
+        'p50_ms': round(percentil(valores, 50) * 1000, 2),
+        'p95_ms': round(percentil(valores, 95) * 1000, 2),
+        'p99_ms': round(percentil(valores, 99) * 1000, 2),
+        'max_ms': round(max(valores) * 1000, 2),
+    }
+
+def _servir_flota(args, listo):
+    # Los servidores corren en otro proceso para no mezclar su memoria con la del monitoreo
+    genieacs_falso.iniciar_flota(args.isps, args.dispositivos, args.latencia, args.jitter,
+                                 args.tasa_error, args.muertos, args.modo_muerto,
+                                 args.total_count)
+    listo.set()
+    while True:
+        time.sleep(1)
+
+def estadisticas_flota(hosts, args):
+    """Sumar los contadores de todos los servidores falsos que responden"""
+    total = {'peticiones': 0, 'errores': 0, 'bytes_enviados': 0}
+    for i, host in enumerate(hosts):
+        if i >= args.isps - args.muertos:
+            continue
+        with urlopen(f"http://{host}:7557/__stats", timeout=5) as respuesta:
+            datos = json.loads(respuesta.read())
+        for clave in total:
+            total[clave] += datos[clave]
+    return total
+
+def ejecutar_benchmark(args):
+    """Preparar la base de datos, levantar la flota y medir"""
+    directorio = tempfile.mkdtemp(prefix='skypass_bench_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+    # El .env del directorio de trabajo define el modo de conteo a medir
+    with open(os.path.join(directorio, '.env'), 'w', encoding='utf-8') as f:
+        f.write(f"MONITOREO_INCREMENTAL={'True' if args.incremental else 'False'}\n")
+        f.write(f"LOG_LEVEL={'DEBUG' if args.verbose else 'ERROR'}\n")
+        if args.dias_inform:
+            f.write(f"GENIEACS_DIAS_INFORM={args.dias_inform}\n")
+    os.chdir(directorio)
+
+    hosts = [genieacs_falso.host_simulado(i) for i in range(args.isps)]
+    listo = multiprocessing.Event()
+    flota = multiprocessing.Process(target=_servir_flota, args=(args, listo), daemon=True)
+    flota.start()
+    if not listo.wait(timeout=300):
+        raise RuntimeError("La flota de GenieACS falsos no arrancó a tiempo")
+
+    import app as skypass
+
+    with skypass.app.app_context():
+        skypass.inicializar_base_datos()
+        for i, host in enumerate(hosts):
+            skypass.db.session.add(skypass.ISP(
+                nombre=f"ISP Simulado {i}",
+                ip_vm=host,
+                genieacs_url=f"{host}:3000",
+                limite_clientes=args.dispositivos * 10
+            ))
+        skypass.db.session.commit()
+
+    # La salida del monitoreo va por el registro JSON (registro.py); su nivel
+    # lo define LOG_LEVEL en el .env de arriba (DEBUG con --verbose, ERROR sin él)
+
+    # Fase 1: verificar_dispositivos_genieacs directo, ISP por ISP
+    latencias_directas = []
+    fallidos_directos = 0
+    with skypass.app.app_context():
+        inicio_fase = time.perf_counter()
+        for isp in skypass.ISP.query.all():
+            inicio = time.perf_counter()
+            if skypass.verificar_dispositivos_genieacs(isp) is None:
+                fallidos_directos += 1
+            latencias_directas.append(time.perf_counter() - inicio)
+        duracion_directa = time.perf_counter() - inicio_fase
+        skypass.vaciar_intentos_sondeo()
+
+    # Fase 2: ciclos completos de monitoreo, midiendo cada ISP dentro del ciclo
+    latencias_ciclo = []
+    duraciones_ciclo = []
+    contar_original = skypass.contar_dispositivos
+
+    def contar_medido(isp):
+        inicio = time.perf_counter()
+        try:
+            return contar_original(isp)
+        finally:
+            latencias_ciclo.append(time.perf_counter() - inicio)
+
+    skypass.contar_dispositivos = contar_medido
+    for _ in range(args.ciclos):
+        inicio = time.perf_counter()
+        skypass.ejecutar_ciclo_monitoreo()
+        duraciones_ciclo.append(time.perf_counter() - inicio)
+    skypass.contar_dispositivos = contar_original
+
+    estadisticas = estadisticas_flota(hosts, args)
+    flota.terminate()
+
+    tiempo_total = duracion_directa + sum(duraciones_ciclo)
+    return {
+        'fecha': datetime.now().isoformat(),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+        },
+        'parametros': {
+            'isps': args.isps,
+            'dispositivos_por_isp': args.dispositivos,
+            'latencia_s': args.latencia,
+            'jitter_s': args.jitter,
+            'tasa_error': args.tasa_error,
+            'muertos': args.muertos,
+            'modo_muerto': args.modo_muerto,
+            'total_count': args.total_count,
+            'incremental': args.incremental,
+            'dias_inform': args.dias_inform,
+            'ciclos': args.ciclos,
+        },
+        'verificacion_directa': {
+            'duracion_s': round(duracion_directa, 3),
+            'fallidos': fallidos_directos,
+            'latencia_por_isp': resumen_latencias(latencias_directas),
+        },
+        'ciclo_monitoreo': {
+            'duracion_s': [round(d, 3) for d in duraciones_ciclo],
+            'latencia_por_isp': resumen_latencias(latencias_ciclo),
+        },
+        'servidor': {
+            'peticiones': estadisticas['peticiones'],
+            'errores_simulados': estadisticas['errores'],
+            'bytes_enviados': estadisticas['bytes_enviados'],
+            'peticiones_por_segundo': round(estadisticas['peticiones'] / tiempo_total, 2) if tiempo_total else None,
+        },
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        'rss_pico_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss /
+                             (1024 * 1024 if sys.platform == 'darwin' else 1024), 2),
+    }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Benchmark del monitoreo de Admin Skypass')
+    parser.add_argument('--isps', type=int, default=20, help='Cantidad de ISPs simulados (default: 20)')
+    parser.add_argument('--dispositivos', type=int, default=1000, help='Dispositivos por ISP (default: 1000)')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Latencia por petición en segundos')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variación aleatoria de la latencia')
+    parser.add_argument('--tasa-error', type=float, default=0.0, help='Probabilidad de HTTP 500 (0-1)')
+    parser.add_argument('--muertos', type=int, default=0, help='Cantidad de ISPs sin respuesta')
+    parser.add_argument('--modo-muerto', choices=['rechazo', 'colgado'], default='rechazo',
+                        help='rechazo: conexión rechazada; colgado: nunca responde')
+    parser.add_argument('--total-count', action='store_true', help='Servidores envían X-Total-Count')
+    parser.add_argument('--incremental', action='store_true', help='Medir el modo de conteo incremental')
+    parser.add_argument('--dias-inform', type=int, help='Filtro GENIEACS_DIAS_INFORM a aplicar')
+    parser.add_argument('--ciclos', type=int, default=3, help='Ciclos de monitoreo a ejecutar (default: 3)')
+    parser.add_argument('--salida', default='bench_monitoreo.json', help='Archivo JSON de resultados')
+    parser.add_argument('--verbose', action='store_true', help='Registro del monitoreo en nivel DEBUG (por defecto solo errores)')
+
+    args = parser.parse_args()
+    if args.muertos > args.isps:
+        parser.error('--muertos no puede ser mayor que --isps')
+
+    print("🌐 Admin Skypass - Benchmark de monitoreo")
+    print("=" * 40)
+
+    salida = os.path.abspath(args.salida)
+    resultados = ejecutar_benchmark(args)
+
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    ciclo = resultados['ciclo_monitoreo']
+    print(f"✅ Ciclos: {', '.join(f'{d:.2f}s' for d in ciclo['duracion_s'])}")
+    print(f"   - Latencia por ISP: p50 {ciclo['latencia_por_isp'].get('p50_ms')} ms, "
+          f"p95 {ciclo['latencia_por_isp'].get('p95_ms')} ms, "
+          f"p99 {ciclo['latencia_por_isp'].get('p99_ms')} ms")
+    print(f"   - Peticiones/s: {resultados['servidor']['peticiones_por_segundo']}")
+    print(f"   - RSS pico: {resultados['rss_pico_mb']} MB")
+    print(f"   - Resultados: {salida}")
+
+if __name__ == '__main__':
+    main()
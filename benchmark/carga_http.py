@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP para las rutas de Admin Skypass
+Levanta la aplicación sobre una base de datos sembrada (o usa una URL
+externa), recorre las rutas con una sesión iniciada y reporta rendimiento,
+percentiles de latencia y consultas SQL por ruta
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_monitoreo import resumen_latencias
+
+RUTAS_POR_DEFECTO = ['/', '/isps', '/desglose/{isp_id}']
+
+def iniciar_app_local(db_path):
+    """Levantar la aplicación en un hilo y contar las consultas SQL por ruta"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    import app as skypass
+    from flask import g, request
+    from sqlalchemy import event
+    from werkzeug.serving import make_server
+
+    consultas_por_ruta = defaultdict(list)
+    lock = threading.Lock()
+
+    def contar_consulta(conn, cursor, statement, parameters, context, executemany):
+        from flask import has_request_context
+        if has_request_context():
+            g.consultas_sql = g.get('consultas_sql', 0) + 1
+
+    @skypass.app.after_request
+    def registrar_consultas(response):
+        regla = request.url_rule.rule if request.url_rule else request.path
+        with lock:
+            consultas_por_ruta[regla].append(g.get('consultas_sql', 0))
+        return response
+
+    with skypass.app.app_context():
+        event.listen(skypass.db.engine, 'before_cursor_execute', contar_consulta)
+
+    servidor = make_server('127.0.0.1', 0, skypass.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor, consultas_por_ruta
+
+def iniciar_sesion(base_url, usuario, password):
+    """Crear una sesión HTTP con login hecho"""
+    sesion = requests.Session()
+    respuesta = sesion.post(f"{base_url}/login", data={'username': usuario, 'password': password},
+                            allow_redirects=False, timeout=30)
+    if respuesta.status_code != 302 or respuesta.headers.get('Location', '').endswith('/login'):
+        raise RuntimeError("No se pudo iniciar sesión (revisa --usuario y --password)")
+    return sesion
+
+def ejecutar_carga(base_url, rutas, isp_ids, concurrencia, peticiones, usuario, password):
+    """Repartir las peticiones entre `concurrencia` sesiones y medir cada una"""
+    resultados = defaultdict(lambda: {'latencias': [], 'errores': 0, 'bytes': 0})
+    lock = threading.Lock()
+    contador = iter(range(peticiones))
+    lock_contador = threading.Lock()
+
+    def trabajador(numero):
+        sesion = iniciar_sesion(base_url, usuario, password)
+        while True:
+            with lock_contador:
+                i = next(contador, None)
+            if i is None:
+                return
+            plantilla = rutas[i % len(rutas)]
+            ruta = plantilla.format(isp_id=isp_ids[(i + numero) % len(isp_ids)] if isp_ids else 1)
+            inicio = time.perf_counter()
+            try:
+                respuesta = sesion.get(f"{base_url}{ruta}", timeout=120)
+                duracion = time.perf_counter() - inicio
+                error = respuesta.status_code >= 400
+                tamano = len(respuesta.content)
+            except requests.exceptions.RequestException:
+                duracion = time.perf_counter() - inicio
+                error = True
+                tamano = 0
+            with lock:
+                datos = resultados[plantilla]
+                datos['latencias'].append(duracion)
+                datos['bytes'] += tamano
+                if error:
+                    datos['errores'] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        for futuro in [executor.submit(trabajador, n) for n in range(concurrencia)]:
+            futuro.result()
+    return resultados, time.perf_counter() - inicio
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Prueba de carga HTTP de Admin Skypass')
+    parser.add_argument('--db', default='carga.db', help='Base de datos sembrada (default: carga.db)')
+    parser.add_argument('--url', help='URL de una instancia ya levantada (sin conteo de SQL)')
+    parser.add_argument('--rutas', nargs='+', default=RUTAS_POR_DEFECTO,
+                        help='Rutas a probar; {isp_id} se reemplaza por IDs existentes')
+    parser.add_argument('--concurrencia', type=int, default=8, help='Sesiones simultáneas (default: 8)')
+    parser.add_argument('--peticiones', type=int, default=200, help='Total de peticiones (default: 200)')
+    parser.add_argument('--usuario', default='admin', help='Usuario admin (default: admin)')
+    parser.add_argument('--password', default='admin123', help='Contraseña admin (default: admin123)')
+    parser.add_argument('--salida', default='bench_http.json', help='Archivo JSON de resultados')
+
+    args = parser.parse_args()
+
+    print("🌐 Admin Skypass - Prueba de carga HTTP")
+    print("=" * 40)
+
+    consultas_por_ruta = None
+    isp_ids = []
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        if not os.path.exists(args.db):
+            print(f"❌ Error: No se encontró la base de datos {args.db} (usa sembrar_datos.py)")
+            sys.exit(1)
+        base_url, _, consultas_por_ruta = iniciar_app_local(args.db)
+        import app as skypass
+        with skypass.app.app_context():
+            isp_ids = [fila[0] for fila in skypass.db.session.query(skypass.ISP.id).limit(1000).all()]
+
+    resultados, duracion = ejecutar_carga(base_url, args.rutas, isp_ids, args.concurrencia,
+                                          args.peticiones, args.usuario, args.password)
+
+    total_peticiones = sum(len(d['latencias']) for d in resultados.values())
+    reporte = {
+        'fecha': datetime.now().isoformat(),
+        'parametros': {
+            'url': args.url,
+            'db': None if args.url else os.path.abspath(args.db),
+            'rutas': args.rutas,
+            'concurrencia': args.concurrencia,
+            'peticiones': args.peticiones,
+        },
+        'duracion_s': round(duracion, 3),
+        'peticiones_por_segundo': round(total_peticiones / duracion, 2) if duracion else None,
+        'rutas': {},
+    }
+    for plantilla, datos in resultados.items():
+        entrada = {
+            'peticiones': len(datos['latencias']),
+            'errores': datos['errores'],
+            'bytes_promedio': round(datos['bytes'] / len(datos['latencias'])) if datos['latencias'] else 0,
+            'latencia': resumen_latencias(datos['latencias']),
+        }
+        if consultas_por_ruta is not None:
+            regla = plantilla.replace('{isp_id}', '<int:isp_id>')
+            conteos = consultas_por_ruta.get(regla, [])
+            if conteos:
+                entrada['consultas_sql'] = {'min': min(conteos), 'max': max(conteos),
+                                            'promedio': round(sum(conteos) / len(conteos), 2)}
+        reporte['rutas'][plantilla] = entrada
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {total_peticiones} peticiones en {duracion:.2f} s ({reporte['peticiones_por_segundo']} req/s)")
+    print("-" * 80)
+    print(f"{'Ruta':<25} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errores':>8} {'SQL':>8}")
+    print("-" * 80)
+    for plantilla, entrada in reporte['rutas'].items():
+        latencia = entrada['latencia']
+        sql = entrada.get('consultas_sql', {}).get('max', '-')
+        print(f"{plantilla:<25} {latencia.get('p50_ms', '-'):>10} {latencia.get('p95_ms', '-'):>10} "
+              f"{latencia.get('p99_ms', '-'):>10} {entrada['errores']:>8} {sql:>8}")
+    print(f"\n   - Resultados: {os.path.abspath(args.salida)}")
+
+if __name__ == '__main__':
+    main()
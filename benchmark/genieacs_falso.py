@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Servidor GenieACS falso para pruebas de carga de Admin Skypass
+Simula la API NBI (puerto 7557) con cantidad de dispositivos, latencia,
+tasa de error y hosts muertos configurables
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FABRICANTES = ['Huawei', 'ZTE', 'Nokia', 'TP-Link', 'FiberHome']
+MODELOS = ['HG8245H', 'F660', 'G-140W-C', 'XC220-G3v', 'AN5506-04']
+VERSIONES = ['V3R017C10S115', 'V6.0.10P2N12', '3FE49362JJIJ50', '1.2.0', '2.1.4']
+
+def _fecha_iso(fecha):
+    return fecha.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def generar_dispositivos(cantidad, semilla=0):
+    """Generar documentos de dispositivos con forma de GenieACS"""
+    rnd = random.Random(semilla)
+    ahora = datetime.now(timezone.utc)
+    base_registro = ahora - timedelta(days=365)
+    dispositivos = []
+    for i in range(cantidad):
+        indice = rnd.randrange(len(FABRICANTES))
+        dispositivos.append({
+            '_id': f"{FABRICANTES[indice]}-{MODELOS[indice]}-{i:08d}",
+            '_registered': _fecha_iso(base_registro + timedelta(minutes=i)),
+            '_lastInform': _fecha_iso(ahora - timedelta(minutes=rnd.randrange(60 * 24 * 60))),
+            '_tags': ['retirado'] if rnd.random() < 0.02 else [],
+            '_deviceId': {
+                '_Manufacturer': FABRICANTES[indice],
+                '_ProductClass': MODELOS[indice],
+                '_SerialNumber': f"SN{i:08d}"
+            },
+            'InternetGatewayDevice': {
+                'DeviceInfo': {
+                    'SoftwareVersion': {'_value': rnd.choice(VERSIONES), '_type': 'xsd:string'}
+                }
+            }
+        })
+    return dispositivos
+
+def _cumple_condicion(valor, condicion):
+    if isinstance(condicion, dict):
+        for operador, esperado in condicion.items():
+            if operador == '$gt' and not (valor is not None and valor > esperado):
+                return False
+            if operador == '$gte' and not (valor is not None and valor >= esperado):
+                return False
+            if operador == '$lt' and not (valor is not None and valor < esperado):
+                return False
+            if operador == '$nin' and any(v in (valor or []) for v in esperado):
+                return False
+            if operador == '$in' and not any(v in (valor or []) for v in esperado):
+                return False
+        return True
+    return valor == condicion
+
+def filtrar_dispositivos(dispositivos, filtro):
+    """Aplicar el subconjunto de la query de MongoDB que usa Admin Skypass"""
+    if not filtro:
+        return dispositivos
+    return [d for d in dispositivos
+            if all(_cumple_condicion(d.get(campo), condicion) for campo, condicion in filtro.items())]
+
+def proyectar(dispositivo, projection):
+    """Devolver solo los campos pedidos (rutas con puntos)"""
+    if not projection:
+        return dispositivo
+    resultado = {'_id': dispositivo['_id']}
+    for ruta in projection.split(','):
+        partes = ruta.strip().split('.')
+        origen, destino = dispositivo, resultado
+        for i, parte in enumerate(partes):
+            if not isinstance(origen, dict) or parte not in origen:
+                break
+            if i == len(partes) - 1:
+                destino[parte] = origen[parte]
+            else:
+                destino = destino.setdefault(parte, {})
+                origen = origen[parte]
+    return resultado
+
+class EstadoServidor:
+    """Configuración y contadores compartidos por un servidor falso"""
+    def __init__(self, dispositivos, latencia=0.0, jitter=0.0, tasa_error=0.0,
+                 colgado=False, total_count=False):
+        self.dispositivos = dispositivos
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.colgado = colgado
+        self.total_count = total_count
+        self.peticiones = 0
+        self.errores = 0
+        self.bytes_enviados = 0
+        self.lock = threading.Lock()
+
+def crear_handler(estado):
+    class GenieACSHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _responder(self, codigo, cuerpo, extra_headers=None):
+            datos = json.dumps(cuerpo).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(datos)))
+            for clave, valor in (extra_headers or {}).items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(datos)
+            with estado.lock:
+                estado.bytes_enviados += len(datos)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if url.path == '/__stats':
+                self._responder(200, {
+                    'peticiones': estado.peticiones,
+                    'errores': estado.errores,
+                    'bytes_enviados': estado.bytes_enviados
+                })
+                return
+
+            with estado.lock:
+                estado.peticiones += 1
+
+            # Host "colgado": acepta la conexión pero nunca responde
+            if estado.colgado:
+                time.sleep(3600)
+                return
+
+            if estado.latencia or estado.jitter:
+                time.sleep(max(0.0, estado.latencia + random.uniform(-estado.jitter, estado.jitter)))
+
+            if random.random() < estado.tasa_error:
+                with estado.lock:
+                    estado.errores += 1
+                self._responder(500, {'error': 'Error simulado'})
+                return
+
+            if url.path not in ('/devices', '/devices/'):
+                self._responder(404, {'error': 'No encontrado'})
+                return
+
+            try:
+                filtro = json.loads(params['query']) if 'query' in params else None
+                orden = json.loads(params['sort']) if 'sort' in params else None
+            except ValueError:
+                self._responder(400, {'error': 'Query inválida'})
+                return
+
+            dispositivos = filtrar_dispositivos(estado.dispositivos, filtro)
+            total = len(dispositivos)
+            if orden:
+                campo, direccion = next(iter(orden.items()))
+                dispositivos = sorted(dispositivos, key=lambda d: d.get(campo) or '', reverse=direccion < 0)
+            skip = int(params.get('skip', 0))
+            limit = int(params['limit']) if 'limit' in params else None
+            dispositivos = dispositivos[skip:skip + limit] if limit else dispositivos[skip:]
+
+            cuerpo = [proyectar(d, params.get('projection')) for d in dispositivos]
+            headers = {'X-Total-Count': str(total)} if estado.total_count else None
+            self._responder(200, cuerpo, headers)
+
+    return GenieACSHandler
+
+def iniciar_servidor(host, puerto, estado):
+    """Iniciar un servidor falso en un hilo y devolverlo"""
+    servidor = ThreadingHTTPServer((host, puerto), crear_handler(estado))
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor
+
+def host_simulado(indice):
+    """IP de loopback para el ISP simulado número `indice` (127.0.0.2, 127.0.0.3, ...)"""
+    indice += 2
+    return f"127.0.{indice // 256}.{indice % 256}"
+
+def host_disponible(host, puerto):
+    """Comprobar que se puede escuchar en host:puerto"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind((host, puerto))
+            return True
+        except OSError:
+            return False
+
+def iniciar_flota(cantidad_isps, dispositivos_por_isp, latencia=0.0, jitter=0.0,
+                  tasa_error=0.0, muertos=0, modo_muerto='rechazo', total_count=False,
+                  puerto=7557):
+    """Levantar un servidor falso por ISP simulado
+
+    Los últimos `muertos` ISPs no tienen servidor (modo "rechazo") o tienen uno
+    que nunca responde (modo "colgado"). Devuelve la lista de hosts y servidores.
+    """
+    hosts = []
+    servidores = []
+    for i in range(cantidad_isps):
+        host = host_simulado(i)
+        hosts.append(host)
+        muerto = i >= cantidad_isps - muertos
+        if muerto and modo_muerto == 'rechazo':
+            continue
+        estado = EstadoServidor(generar_dispositivos(dispositivos_por_isp, semilla=i),
+                                latencia=latencia, jitter=jitter, tasa_error=tasa_error,
+                                colgado=muerto, total_count=total_count)
+        servidores.append(iniciar_servidor(host, puerto, estado))
+    return hosts, servidores
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Servidor GenieACS falso para pruebas')
+    parser.add_argument('--isps', type=int, default=1, help='Cantidad de ISPs simulados (default: 1)')
+    parser.add_argument('--dispositivos', type=int, default=1000, help='Dispositivos por ISP (default: 1000)')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Latencia por petición en segundos')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variación aleatoria de la latencia (+/- segundos)')
+    parser.add_argument('--tasa-error', type=float, default=0.0, help='Probabilidad de responder HTTP 500 (0-1)')
+    parser.add_argument('--muertos', type=int, default=0, help='Cantidad de ISPs sin respuesta')
+    parser.add_argument('--modo-muerto', choices=['rechazo', 'colgado'], default='rechazo',
+                        help='rechazo: conexión rechazada; colgado: nunca responde')
+    parser.add_argument('--total-count', action='store_true', help='Enviar cabecera X-Total-Count')
+    parser.add_argument('--puerto', type=int, default=7557, help='Puerto de la API (default: 7557)')
+
+    args = parser.parse_args()
+
+    print("🌐 Admin Skypass - GenieACS falso")
+    print("=" * 40)
+
+    hosts, servidores = iniciar_flota(args.isps, args.dispositivos, args.latencia, args.jitter,
+                                      args.tasa_error, args.muertos, args.modo_muerto,
+                                      args.total_count, args.puerto)
+    for host in hosts:
+        print(f"   - http://{host}:{args.puerto}")
+    print(f"✅ {len(servidores)} servidores activos, {args.isps - len(servidores)} sin servidor")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n👋 Servidores detenidos")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Generador de datos para pruebas de carga de Admin Skypass
+Llena una base de datos con ISPs y alertas a la escala indicada
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def sembrar(db_path, cantidad_isps, cantidad_alertas, lote=10000, semilla=0):
+    """Crear el esquema e insertar ISPs y alertas en lotes"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    import app as skypass
+    from werkzeug.security import generate_password_hash
+
+    rnd = random.Random(semilla)
+    ahora = datetime.now(timezone.utc)
+
+    with skypass.app.app_context():
+        skypass.inicializar_base_datos()
+
+        if not skypass.Admin.query.filter_by(username='admin').first():
+            skypass.db.session.add(skypass.Admin(
+                username='admin',
+                password_hash=generate_password_hash('admin123')
+            ))
+            skypass.db.session.commit()
+
+        primer_id = (skypass.db.session.query(skypass.db.func.max(skypass.ISP.id)).scalar() or 0) + 1
+
+        # ISPs: inserción masiva por lotes
+        filas = []
+        for i in range(cantidad_isps):
+            limite = rnd.choice([100, 250, 500, 1000, 2500, 5000])
+            filas.append({
+                'nombre': f"ISP Carga {primer_id + i}",
+                'ip_vm': f"10.{(primer_id + i) // 65536 % 256}.{(primer_id + i) // 256 % 256}.{(primer_id + i) % 256}",
+                'genieacs_url': f"10.200.{(primer_id + i) // 256 % 256}.{(primer_id + i) % 256}:3000",
+                'limite_clientes': limite,
+                'email_alerta': f"noc{primer_id + i}@example.com" if rnd.random() < 0.7 else '',
+                'fecha_creacion': ahora - timedelta(days=rnd.randrange(730)),
+                'dispositivos_actuales': int(limite * rnd.uniform(0.2, 1.3)),
+                'ultima_verificacion': ahora - timedelta(minutes=rnd.randrange(20)),
+            })
+            if len(filas) >= lote:
+                skypass.db.session.execute(skypass.ISP.__table__.insert(), filas)
+                skypass.db.session.commit()
+                filas = []
+        if filas:
+            skypass.db.session.execute(skypass.ISP.__table__.insert(), filas)
+            skypass.db.session.commit()
+
+        ultimo_id = skypass.db.session.query(skypass.db.func.max(skypass.ISP.id)).scalar() or 0
+        if not ultimo_id:
+            return
+
+        # Alertas: repartidas entre todos los ISPs a lo largo de un año
+        filas = []
+        for i in range(cantidad_alertas):
+            isp_id = rnd.randint(1, ultimo_id)
+            if rnd.random() < 0.5:
+                mensaje = f"🚨 ALERTA: ISP Carga {isp_id} superó el límite"
+            else:
+                mensaje = f"⚠️ CERCA DEL LÍMITE: ISP Carga {isp_id} está cerca del límite"
+            filas.append({
+                'isp_id': isp_id,
+                'mensaje': mensaje,
+                'fecha_envio': ahora - timedelta(seconds=rnd.randrange(365 * 24 * 3600)),
+                'enviada': True,
+            })
+            if len(filas) >= lote:
+                skypass.db.session.execute(skypass.Alerta.__table__.insert(), filas)
+                skypass.db.session.commit()
+                filas = []
+        if filas:
+            skypass.db.session.execute(skypass.Alerta.__table__.insert(), filas)
+            skypass.db.session.commit()
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Generador de datos para pruebas de carga')
+    parser.add_argument('--db', default='carga.db', help='Base de datos a llenar (default: carga.db)')
+    parser.add_argument('--isps', type=int, default=5000, help='Cantidad de ISPs (default: 5000)')
+    parser.add_argument('--alertas', type=int, default=1000000, help='Cantidad de alertas (default: 1000000)')
+    parser.add_argument('--lote', type=int, default=10000, help='Filas por transacción (default: 10000)')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla aleatoria (default: 0)')
+
+    args = parser.parse_args()
+
+    print("🌐 Admin Skypass - Generador de datos")
+    print("=" * 40)
+
+    inicio = time.perf_counter()
+    sembrar(args.db, args.isps, args.alertas, args.lote, args.semilla)
+    duracion = time.perf_counter() - inicio
+
+    size_mb = os.path.getsize(args.db) / (1024 * 1024)
+    print(f"✅ Base de datos lista: {args.db}")
+    print(f"   - ISPs: {args.isps}, alertas: {args.alertas}")
+    print(f"   - Tamaño: {size_mb:.2f} MB")
+    print(f"   - Tiempo: {duracion:.1f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Archivos estáticos de Admin Skypass con huella de contenido
+
+Al iniciar se calcula un hash de cada archivo de static/ y url_for('static')
+genera URLs con esa huella (style.css -> style.<hash>.css). Como la URL cambia
+cuando cambia el archivo, se sirven con Cache-Control inmutable por un año.
+Los archivos de texto se comprimen una vez (gzip y, si está instalado, brotli)
+y se elige la variante según el Accept-Encoding del navegador.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él se sirve solo gzip
+    brotli = None
+
+# Extensiones que vale la pena comprimir (png, jpg, woff2... ya vienen comprimidos)
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+class Estatico:
+    """Contenido y variantes comprimidas de un archivo estático"""
+
+    def __init__(self, ruta, filename):
+        self.ruta = ruta
+        self.filename = filename
+        self.cargar()
+
+    def cargar(self):
+        with open(self.ruta, 'rb') as f:
+            datos = f.read()
+        self.mtime = os.path.getmtime(self.ruta)
+        self.huella = hashlib.sha256(datos).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(self.filename)[0] or 'application/octet-stream'
+
+        base, extension = posixpath.splitext(self.filename)
+        self.nombre_con_huella = f"{base}.{self.huella}{extension}"
+
+        # Variantes por Content-Encoding; solo se guardan si ahorran bytes
+        self.variantes = {'identity': datos}
+        if extension.lower() in EXTENSIONES_COMPRIMIBLES:
+            candidatas = {'gzip': gzip.compress(datos, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidatas['br'] = brotli.compress(datos, quality=11)
+            for codificacion, comprimido in candidatas.items():
+                if len(comprimido) < len(datos):
+                    self.variantes[codificacion] = comprimido
+
+    def desactualizado(self):
+        try:
+            return os.path.getmtime(self.ruta) != self.mtime
+        except OSError:
+            return False
+
+def _aceptadas(cabecera):
+    """Codificaciones aceptadas en Accept-Encoding (las de q=0 no cuentan)"""
+    aceptadas = set()
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        parametros = parametros.replace(' ', '')
+        if nombre and parametros not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+def init_estaticos(app):
+    """Precalcular huellas y variantes y reemplazar el servidor de estáticos de Flask"""
+    por_nombre = {}
+    por_huella = {}
+
+    def registrar(estatico):
+        por_nombre[estatico.filename] = estatico
+        por_huella[estatico.nombre_con_huella] = estatico
+
+    carpeta = app.static_folder
+    for raiz, _, archivos in os.walk(carpeta):
+        for archivo in archivos:
+            ruta = os.path.join(raiz, archivo)
+            filename = os.path.relpath(ruta, carpeta).replace(os.sep, '/')
+            registrar(Estatico(ruta, filename))
+
+    def vigente(estatico):
+        # En desarrollo los estáticos se editan sin reiniciar: recalcular si cambió
+        if app.debug and estatico.desactualizado():
+            del por_huella[estatico.nombre_con_huella]
+            estatico.cargar()
+            registrar(estatico)
+        return estatico
+
+    @app.url_defaults
+    def agregar_huella(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in por_nombre:
+            values['filename'] = vigente(por_nombre[values['filename']]).nombre_con_huella
+
+    def servir_estatico(filename):
+        estatico = por_huella.get(filename)
+        if estatico is None:
+            # Nombre sin huella (o de un despliegue anterior): servicio normal con revalidación
+            return app.send_static_file(filename)
+
+        aceptadas = _aceptadas(request.headers.get('Accept-Encoding', ''))
+        codificacion = next((c for c in ('br', 'gzip') if c in aceptadas and c in estatico.variantes), 'identity')
+
+        response = Response(estatico.variantes[codificacion], mimetype=estatico.mimetype)
+        if codificacion != 'identity':
+            response.headers['Content-Encoding'] = codificacion
+        if len(estatico.variantes) > 1:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = CACHE_INMUTABLE
+        response.set_etag(f"{estatico.huella}-{codificacion}")
+        return response.make_conditional(request)
+
+    app.view_functions['static'] = servir_estatico
+    return por_nombre
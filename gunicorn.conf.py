@@ -0,0 +1,17 @@
+# Configuración de gunicorn para Admin Skypass
+# gunicorn la carga automáticamente desde el directorio de trabajo
+import os
+
+# Directorio compartido para las métricas de todos los procesos
+# (workers y monitoreo deben usar el mismo PROMETHEUS_MULTIPROC_DIR)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/admin_skypass_metricas')
+
+def on_starting(server):
+    # Limpiar los valores de los workers de una ejecución anterior (no los del
+    # proceso de monitoreo, que sigue escribiendo en el mismo directorio)
+    import metricas
+    metricas.limpiar_procesos_terminados()
+
+def child_exit(server, worker):
+    import metricas
+    metricas.proceso_terminado(worker.pid)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de ISPs para Admin Skypass
+Lee un archivo CSV, JSON o NDJSON por flujo, valida cada fila y guarda los
+ISPs por lotes (las IP de VM existentes se actualizan o se informan).
+"""
+
+import sys
+import argparse
+from app import (create_app, importar_filas_isp, leer_filas_importacion, detectar_formato_importacion,
+                 FORMATOS_IMPORTACION)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Importación masiva de ISPs para Admin Skypass')
+    parser.add_argument('archivo', help='Archivo .csv, .json o .ndjson ("-" para leer de la entrada estándar)')
+    parser.add_argument('--formato', choices=FORMATOS_IMPORTACION, help='Formato del archivo (default: según la extensión)')
+    parser.add_argument('--omitir-existentes', action='store_true',
+                        help='No actualizar los ISPs cuya IP de VM ya existe (se informan como error)')
+    parser.add_argument('--probar', action='store_true', help='Probar la conexión a GenieACS de los ISPs importados')
+    parser.add_argument('--lote', type=int, default=500, help='Filas por transacción (default: 500)')
+    parser.add_argument('--hilos', type=int, default=16, help='Pruebas de conexión simultáneas (default: 16)')
+
+    args = parser.parse_args()
+
+    print("🌐 Admin Skypass - Importación de ISPs")
+    print("=" * 40)
+
+    formato = args.formato or detectar_formato_importacion(args.archivo)
+    if formato is None:
+        print("❌ Error: No se reconoce el formato; usa --formato csv, json o ndjson")
+        sys.exit(1)
+
+    app = create_app()
+    try:
+        archivo = sys.stdin if args.archivo == '-' else open(args.archivo, 'r', encoding='utf-8-sig', newline='')
+    except OSError as e:
+        print(f"❌ Error: No se pudo abrir el archivo {args.archivo}: {e}")
+        sys.exit(1)
+
+    with app.app_context(), archivo:
+        resumen = importar_filas_isp(
+            leer_filas_importacion(archivo, formato),
+            actualizar=not args.omitir_existentes,
+            lote=args.lote,
+            probar=args.probar,
+            hilos=args.hilos
+        )
+
+    print(f"✅ Filas procesadas: {resumen['total']}")
+    print(f"   - Creados: {resumen['creados']}")
+    print(f"   - Actualizados: {resumen['actualizados']}")
+    print(f"   - Con errores: {len(resumen['errores'])}")
+
+    for error in resumen['errores']:
+        print(f"   ❌ Fila {error['fila']} ({error['ip_vm'] or 'sin IP'}): {error['error']}")
+
+    if 'error_archivo' in resumen:
+        print(f"❌ {resumen['error_archivo']}")
+
+    for prueba in resumen.get('pruebas', []):
+        if prueba['conectado']:
+            print(f"   🟢 {prueba['nombre']}: {prueba['dispositivos']} dispositivos")
+        else:
+            print(f"   🔴 {prueba['nombre']}: sin conexión con GenieACS")
+
+    if resumen['errores'] or 'error_archivo' in resumen:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
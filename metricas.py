@@ -0,0 +1,115 @@
+"""
+Métricas de Admin Skypass en formato de exposición de Prometheus
+
+Con la variable PROMETHEUS_MULTIPROC_DIR definida (ver gunicorn.conf.py),
+cada proceso (workers de gunicorn y proceso de monitoreo) escribe sus
+valores en ese directorio y /metrics los suma al exponerlos.
+"""
+
+import os
+import time
+
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram,
+                               CONTENT_TYPE_LATEST, generate_latest)
+from prometheus_client import multiprocess
+
+# Las métricas sin etiquetas abren su archivo al definirse: el directorio debe
+# existir antes (por ejemplo con python app.py y la variable ya definida)
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Buckets pensados para llamadas de red (GenieACS y SMTP)
+BUCKETS_RED = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Sondeo de GenieACS
+POLL_LATENCIA = Histogram(
+    'skypass_genieacs_poll_segundos',
+    'Latencia de cada intento de consulta a GenieACS',
+    ['isp_id', 'endpoint'],
+    buckets=BUCKETS_RED
+)
+POLL_RESULTADOS = Counter(
+    'skypass_genieacs_poll',
+    'Intentos de consulta a GenieACS por resultado',
+    ['isp_id', 'endpoint', 'resultado']
+)
+
+# Ciclo de monitoreo
+CICLO_DURACION = Histogram(
+    'skypass_monitoreo_ciclo_segundos',
+    'Duración de cada ciclo de monitoreo',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+CICLO_RETRASO = Gauge(
+    'skypass_monitoreo_retraso_segundos',
+    'Retraso del último ciclo respecto a su hora programada',
+    multiprocess_mode='max'
+)
+CICLO_ULTIMO = Gauge(
+    'skypass_monitoreo_ultimo_ciclo_timestamp',
+    'Hora (epoch) del último ciclo de monitoreo completado',
+    multiprocess_mode='max'
+)
+
+# Envío de emails
+EMAILS = Counter(
+    'skypass_emails',
+    'Alertas enviadas por email (cliente y admin en un mismo envío) por tipo y resultado',
+    ['tipo', 'resultado']
+)
+SMTP_LATENCIA = Histogram(
+    'skypass_smtp_segundos',
+    'Duración de la sesión SMTP (conexión, login y envío)',
+    buckets=BUCKETS_RED
+)
+
+# Capa web
+HTTP_LATENCIA = Histogram(
+    'skypass_http_peticion_segundos',
+    'Latencia de las peticiones HTTP por ruta',
+    ['ruta', 'metodo', 'codigo'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+def exponer_metricas():
+    """Devolver (cuerpo, content_type) con las métricas de todos los procesos"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def registrar_ciclo(inicio, programado):
+    """Registrar duración y retraso de un ciclo de monitoreo terminado"""
+    fin = time.time()
+    CICLO_DURACION.observe(fin - inicio)
+    CICLO_RETRASO.set(max(0.0, inicio - programado))
+    CICLO_ULTIMO.set(fin)
+
+def proceso_terminado(pid):
+    """Limpiar los gauges de un proceso que terminó (hook child_exit de gunicorn)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def limpiar_procesos_terminados():
+    """Borrar los archivos de los procesos que ya no existen (al arrancar gunicorn)
+
+    Los del proceso de monitoreo, que corre aparte y sigue vivo, se conservan.
+    """
+    directorio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directorio or not os.path.isdir(directorio):
+        return
+    for nombre in os.listdir(directorio):
+        base, extension = os.path.splitext(nombre)
+        pid = base.rsplit('_', 1)[-1]
+        if extension == '.db' and pid.isdigit() and not _proceso_vivo(int(pid)):
+            os.remove(os.path.join(directorio, nombre))
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Migraciones versionadas del esquema de Admin Skypass
+
+Cada migración describe un cambio del esquema con tablas "congeladas" (no usa
+los modelos de app.py, que siguen cambiando) y se registra en la tabla
+esquema_version al aplicarse. Funcionan igual en SQLite y en PostgreSQL.
+
+Las migraciones son idempotentes: una base creada antes con db.create_all()
+(que ya tiene parte de las tablas o índices) se pone al día sin errores.
+"""
+
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Text, Boolean, DateTime, Float,
+    ForeignKey, Index, create_engine, inspect, select, func
+)
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger('skypass.migraciones')
+
+# Clave del advisory lock de PostgreSQL: varios workers arrancando a la vez
+# aplican las migraciones de a uno
+CLAVE_BLOQUEO = 7557300
+
+def normalizar_url(url):
+    """URL de SQLAlchemy con el driver de requirements.txt (psycopg2)
+
+    Heroku y otros proveedores entregan postgres://, que SQLAlchemy ya no acepta,
+    y SQLAlchemy 2.1 usa psycopg 3 por omisión para postgresql://
+    """
+    for prefijo in ('postgres://', 'postgresql://'):
+        if url.startswith(prefijo):
+            return 'postgresql+psycopg2://' + url[len(prefijo):]
+    return url
+
+def url_de_la_app(url):
+    """Misma base que usa la aplicación: Flask-SQLAlchemy resuelve las rutas
+    SQLite relativas dentro de la carpeta instance/ del proyecto"""
+    url = make_url(normalizar_url(url))
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not os.path.isabs(url.database):
+        instancia = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+        url = url.set(database=os.path.join(instancia, url.database))
+    return url
+
+def _ahora():
+    return datetime.now(timezone.utc)
+
+def _referencia_isp(metadata):
+    """Tabla isp mínima, solo para resolver las claves foráneas"""
+    return Table('isp', metadata, Column('id', Integer, primary_key=True))
+
+def _crear(conn, *objetos):
+    for objeto in objetos:
+        objeto.create(conn, checkfirst=True)
+
+def _tablas_iniciales(conn):
+    metadata = MetaData()
+    isp = Table(
+        'isp', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('nombre', String(100), nullable=False),
+        Column('ip_vm', String(15), nullable=False),
+        Column('genieacs_url', String(200), nullable=False),
+        Column('limite_clientes', Integer, nullable=False),
+        Column('email_alerta', String(100)),
+        Column('fecha_creacion', DateTime),
+        Column('dispositivos_actuales', Integer),
+        Column('ultima_verificacion', DateTime),
+        Column('ultima_alerta', DateTime),
+    )
+    admin = Table(
+        'admin', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('username', String(80), nullable=False, unique=True),
+        Column('password_hash', String(120), nullable=False),
+    )
+    alerta = Table(
+        'alerta', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, ForeignKey('isp.id'), nullable=False),
+        Column('mensaje', Text, nullable=False),
+        Column('fecha_envio', DateTime),
+        Column('enviada', Boolean),
+    )
+    _crear(conn, isp, admin, alerta)
+
+def _desglose_isp(conn):
+    metadata = MetaData()
+    _referencia_isp(metadata)
+    desglose = Table(
+        'desglose_isp', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, ForeignKey('isp.id'), nullable=False, unique=True),
+        Column('total', Integer),
+        Column('fabricantes', Text),
+        Column('modelos', Text),
+        Column('versiones', Text),
+        Column('antiguedad_inform', Text),
+        Column('fecha_actualizacion', DateTime),
+    )
+    _crear(conn, desglose)
+
+def _estado_sondeo_isp(conn):
+    metadata = MetaData()
+    _referencia_isp(metadata)
+    estado = Table(
+        'estado_sondeo_isp', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, ForeignKey('isp.id'), nullable=False, unique=True),
+        Column('hwm_registered', String(30)),
+        Column('conteo', Integer),
+        Column('ultima_reconciliacion', DateTime),
+    )
+    _crear(conn, estado)
+
+def _intento_sondeo(conn):
+    metadata = MetaData()
+    _referencia_isp(metadata)
+    intento = Table(
+        'intento_sondeo', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, ForeignKey('isp.id'), nullable=False),
+        Column('fecha', DateTime),
+        Column('endpoint', String(30)),
+        Column('resultado', String(30)),
+        Column('http_status', Integer),
+        Column('bytes', Integer),
+        Column('latencia_ms', Float),
+        Column('parseo_ms', Float),
+        Column('error', String(100)),
+    )
+    _crear(
+        conn, intento,
+        Index('ix_intento_sondeo_fecha', intento.c.fecha),
+        Index('ix_intento_sondeo_isp_fecha', intento.c.isp_id, intento.c.fecha),
+    )
+
+def _indices_alerta_e_ip_vm(conn):
+    metadata = MetaData()
+    isp = Table('isp', metadata, Column('id', Integer, primary_key=True), Column('ip_vm', String(15)))
+    alerta = Table('alerta', metadata, Column('isp_id', Integer), Column('fecha_envio', DateTime))
+    _crear(
+        conn,
+        Index('ix_alerta_fecha_envio', alerta.c.fecha_envio),
+        Index('ix_alerta_isp_fecha', alerta.c.isp_id, alerta.c.fecha_envio),
+    )
+
+    # Con IPs de VM repetidas el índice único no se puede crear: se avisa y
+    # inicializar_base_datos lo reintenta en cada arranque hasta que se corrijan
+    duplicadas = conn.execute(
+        select(isp.c.ip_vm).group_by(isp.c.ip_vm).having(func.count() > 1)
+    ).scalars().all()
+    if duplicadas:
+        logger.warning(f"No se crea ix_isp_ip_vm: IPs de VM repetidas ({', '.join(duplicadas[:10])})")
+    else:
+        _crear(conn, Index('ix_isp_ip_vm', isp.c.ip_vm, unique=True))
+
+def _conteo_dispositivos(conn):
+    metadata = MetaData()
+    _referencia_isp(metadata)
+    conteo = Table(
+        'conteo_dispositivos', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, ForeignKey('isp.id'), nullable=False),
+        Column('fecha', DateTime),
+        Column('dispositivos', Integer, nullable=False),
+        Column('limite_clientes', Integer),
+    )
+    _crear(
+        conn, conteo,
+        Index('ix_conteo_fecha', conteo.c.fecha),
+        Index('ix_conteo_isp_fecha', conteo.c.isp_id, conteo.c.fecha),
+    )
+
+def _isp_fecha_actualizacion(conn):
+    columnas = {c['name'] for c in inspect(conn).get_columns('isp')}
+    if 'fecha_actualizacion' not in columnas:
+        tipo = DateTime().compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE isp ADD COLUMN fecha_actualizacion {tipo}")
+        conn.exec_driver_sql("UPDATE isp SET fecha_actualizacion = COALESCE(ultima_verificacion, fecha_creacion)")
+
+    metadata = MetaData()
+    isp = Table('isp', metadata, Column('id', Integer, primary_key=True), Column('fecha_actualizacion', DateTime))
+    _crear(conn, Index('ix_isp_fecha_actualizacion', isp.c.fecha_actualizacion))
+
+def _ampliar_password_hash(conn):
+    # Los hash scrypt de Werkzeug 3 miden 162 caracteres; SQLite no limita el
+    # largo de VARCHAR (y no admite ALTER COLUMN), PostgreSQL sí
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql("ALTER TABLE admin ALTER COLUMN password_hash TYPE VARCHAR(256)")
+
+def _estado_sondeo_ids_en_marca(conn):
+    columnas = {c['name'] for c in inspect(conn).get_columns('estado_sondeo_isp')}
+    if 'ids_en_marca' not in columnas:
+        conn.exec_driver_sql(f"ALTER TABLE estado_sondeo_isp ADD COLUMN ids_en_marca {Text().compile(dialect=conn.dialect)}")
+
+def _isp_eliminado(conn):
+    metadata = MetaData()
+    eliminado = Table(
+        'isp_eliminado', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('isp_id', Integer, nullable=False),
+        Column('fecha_eliminacion', DateTime),
+    )
+    _crear(conn, eliminado, Index('ix_isp_eliminado_fecha', eliminado.c.fecha_eliminacion))
+
+def _latido_tarea(conn):
+    metadata = MetaData()
+    latido = Table(
+        'latido_tarea', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('nombre', String(30), nullable=False, unique=True),
+        Column('latido', DateTime, nullable=False),
+        Column('intervalo', Integer, nullable=False),
+        Column('proceso', String(100)),
+    )
+    _crear(conn, latido)
+
+# (versión, descripción, función); nunca modificar una migración publicada:
+# los cambios nuevos van en una versión nueva al final de la lista
+MIGRACIONES = [
+    (1, 'Tablas isp, admin y alerta', _tablas_iniciales),
+    (2, 'Desglose de dispositivos por ISP', _desglose_isp),
+    (3, 'Estado del sondeo incremental', _estado_sondeo_isp),
+    (4, 'Intentos de sondeo', _intento_sondeo),
+    (5, 'Índices de alerta e índice único de ip_vm', _indices_alerta_e_ip_vm),
+    (6, 'Historial de conteos de dispositivos', _conteo_dispositivos),
+    (7, 'Columna isp.fecha_actualizacion', _isp_fecha_actualizacion),
+    (8, 'Ampliar admin.password_hash a 256 caracteres', _ampliar_password_hash),
+    (9, 'Columna estado_sondeo_isp.ids_en_marca', _estado_sondeo_ids_en_marca),
+    (10, 'Bajas de ISPs para la sincronización de la API', _isp_eliminado),
+    (11, 'Latidos de las tareas programadas', _latido_tarea),
+]
+
+_metadata_version = MetaData()
+esquema_version = Table(
+    'esquema_version', _metadata_version,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('descripcion', String(200)),
+    Column('fecha_aplicacion', DateTime),
+)
+
+def versiones_aplicadas(conn):
+    if not inspect(conn).has_table('esquema_version'):
+        return set()
+    return set(conn.execute(select(esquema_version.c.version)).scalars())
+
+def aplicar_migraciones(engine):
+    """Aplicar en orden las migraciones pendientes; devuelve las versiones aplicadas"""
+    aplicadas = []
+    with engine.connect() as conn:
+        postgres = conn.dialect.name == 'postgresql'
+        if postgres:
+            conn.exec_driver_sql(f"SELECT pg_advisory_lock({CLAVE_BLOQUEO})")
+            conn.commit()
+        try:
+            with conn.begin():
+                esquema_version.create(conn, checkfirst=True)
+            # Se leen después del bloqueo: otro worker pudo haberlas aplicado mientras tanto
+            existentes = versiones_aplicadas(conn)
+            conn.rollback()
+
+            # Una transacción por migración (en PostgreSQL también el DDL es transaccional)
+            for version, descripcion, funcion in MIGRACIONES:
+                if version in existentes:
+                    continue
+                with conn.begin():
+                    funcion(conn)
+                    conn.execute(esquema_version.insert().values(
+                        version=version, descripcion=descripcion, fecha_aplicacion=_ahora()
+                    ))
+                logger.info(f"Migración {version} aplicada: {descripcion}")
+                aplicadas.append(version)
+        finally:
+            if postgres:
+                conn.exec_driver_sql(f"SELECT pg_advisory_unlock({CLAVE_BLOQUEO})")
+                conn.commit()
+    return aplicadas
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Migraciones del esquema de Admin Skypass')
+    parser.add_argument('--url', help='URL de la base de datos (default: DATABASE_URL del .env; '
+                        'las rutas SQLite relativas van en instance/, como en la aplicación)')
+    parser.add_argument('--estado', action='store_true', help='Solo mostrar las migraciones aplicadas y pendientes')
+
+    args = parser.parse_args()
+
+    print("🌐 Admin Skypass - Migraciones del esquema")
+    print("=" * 40)
+
+    if args.url:
+        url = args.url
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        url = os.getenv('DATABASE_URL', 'sqlite:///isps.db')
+
+    url = url_de_la_app(url)
+    print(f"📋 Base de datos: {url.render_as_string(hide_password=True)}")
+    sqlite = url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+    if sqlite and not os.path.exists(url.database):
+        if args.estado:
+            # SQLite crearía un archivo vacío solo para informar que no hay nada aplicado
+            print(f"❌ Error: No existe la base de datos {url.database}")
+            sys.exit(1)
+        os.makedirs(os.path.dirname(url.database), exist_ok=True)
+
+    engine = create_engine(url)
+    try:
+        if args.estado:
+            with engine.connect() as conn:
+                existentes = versiones_aplicadas(conn)
+            for version, descripcion, _ in MIGRACIONES:
+                marca = '✅' if version in existentes else '⏳'
+                print(f"{marca} {version:>3}  {descripcion}")
+            return
+
+        aplicadas = aplicar_migraciones(engine)
+    except Exception as e:
+        print(f"❌ Error aplicando migraciones: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+    if aplicadas:
+        print(f"✅ Migraciones aplicadas: {', '.join(str(v) for v in aplicadas)}")
+    else:
+        print("✅ El esquema ya está al día")
+
+if __name__ == '__main__':
+    main()
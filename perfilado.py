@@ -0,0 +1,125 @@
+"""
+Perfilado de peticiones de Admin Skypass (opcional, PROFILING=True en el .env)
+
+Mide por petición el tiempo total, la cantidad y duración de las consultas
+SQL y el tiempo de renderizado de plantillas. Las peticiones más lentas que
+el umbral se escriben con su lista de consultas en el log de perfilado.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import time
+from urllib.parse import urlsplit
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from werkzeug.exceptions import HTTPException
+
+logger = logging.getLogger('skypass.perfilado')
+
+# Endpoints GET de solo lectura que se pueden perfilar desde la página; el resto
+# (eliminar, enviar alertas, consultar GenieACS, exportaciones completas...) no
+ENDPOINTS_PERFILABLES = (
+    'dashboard', 'lista_isps', 'agregar_isp', 'editar_isp', 'importar_isps', 'exportar',
+    'desglose_isp', 'diagnostico_isp', 'configuracion', 'healthz', 'readyz',
+)
+
+def ruta_perfilable(app, ruta):
+    """La ruta corresponde (por GET) a un endpoint de ENDPOINTS_PERFILABLES"""
+    if not ruta.startswith('/'):
+        return False
+    try:
+        endpoint, _ = app.url_map.bind('localhost').match(urlsplit(ruta).path, method='GET')
+    except HTTPException:  # 404, 405 o redirección
+        return False
+    return endpoint in ENDPOINTS_PERFILABLES
+
+def _perfil_activo():
+    return has_request_context() and 'perfil' in g
+
+def _inicio_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _perfil_activo():
+        conn.info.setdefault('perfil_inicio_consulta', []).append(time.perf_counter())
+
+def _fin_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _perfil_activo() and conn.info.get('perfil_inicio_consulta'):
+        duracion = time.perf_counter() - conn.info['perfil_inicio_consulta'].pop()
+        g.perfil['consultas'].append((statement, duracion))
+
+def _inicio_plantilla(sender, template, context, **extra):
+    if _perfil_activo():
+        g.perfil['plantillas_inicio'].append(time.perf_counter())
+
+def _fin_plantilla(sender, template, context, **extra):
+    if _perfil_activo() and g.perfil['plantillas_inicio']:
+        g.perfil['plantillas'] += time.perf_counter() - g.perfil['plantillas_inicio'].pop()
+
+def init_perfilado(app, db, umbral_ms=500, archivo_log='peticiones_lentas.log'):
+    """Registrar los hooks de perfilado en la aplicación"""
+    if not logger.handlers:
+        handler = logging.FileHandler(archivo_log, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _inicio_consulta)
+        event.listen(db.engine, 'after_cursor_execute', _fin_consulta)
+    before_render_template.connect(_inicio_plantilla, app)
+    template_rendered.connect(_fin_plantilla, app)
+
+    @app.before_request
+    def iniciar_perfil():
+        g.perfil = {
+            'inicio': time.perf_counter(),
+            'consultas': [],
+            'plantillas': 0.0,
+            'plantillas_inicio': [],
+        }
+
+    @app.after_request
+    def registrar_perfil(response):
+        perfil = g.pop('perfil', None)
+        if perfil is None:
+            return response
+
+        total_ms = (time.perf_counter() - perfil['inicio']) * 1000
+        sql_ms = sum(duracion for _, duracion in perfil['consultas']) * 1000
+        plantillas_ms = perfil['plantillas'] * 1000
+
+        response.headers['Server-Timing'] = (
+            f'sql;dur={sql_ms:.1f};desc="{len(perfil["consultas"])} consultas", '
+            f'tpl;dur={plantillas_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+
+        if total_ms >= umbral_ms:
+            lineas = [
+                f"LENTA {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+                f"total={total_ms:.1f}ms sql={sql_ms:.1f}ms ({len(perfil['consultas'])} consultas) "
+                f"plantillas={plantillas_ms:.1f}ms"
+            ]
+            for statement, duracion in perfil['consultas']:
+                lineas.append(f"    {duracion * 1000:8.2f}ms  {' '.join(statement.split())}")
+            logger.info('\n'.join(lineas))
+
+        return response
+
+def perfilar_ruta(app, ruta, ordenar='cumulative', limite=40):
+    """Ejecutar una ruta GET bajo cProfile y devolver (código HTTP, salida de pstats)"""
+    if not ruta_perfilable(app, ruta):
+        raise ValueError(f"La ruta {ruta} no se puede perfilar")
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['logged_in'] = True
+        sesion['username'] = 'perfilado'
+
+    profiler = cProfile.Profile()
+    respuesta = profiler.runcall(cliente.get, ruta)
+
+    salida = io.StringIO()
+    pstats.Stats(profiler, stream=salida).sort_stats(ordenar).print_stats(limite)
+    return respuesta.status_code, salida.getvalue()
@@ -0,0 +1,147 @@
+"""
+Registro (logging) estructurado y no bloqueante de Admin Skypass
+
+Los módulos escriben en loggers "skypass.*"; los registros pasan por una
+cola en memoria y un hilo aparte los escribe como JSON (una línea por
+registro) en stderr, así el monitoreo no espera a journald. Los avisos
+repetidos de un mismo ISP y endpoint se limitan a uno por ventana.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Campos extra que se copian al JSON si vienen en `extra=`
+CAMPOS_EXTRA = ('isp_id', 'isp', 'endpoint', 'duracion_ms', 'resultado', 'http_status',
+                'dispositivos', 'tipo_alerta', 'repeticiones_suprimidas')
+
+_listener = None
+_lock = threading.Lock()
+
+class FormatoJSON(logging.Formatter):
+    """Formatear cada registro como una línea JSON"""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for campo in CAMPOS_EXTRA:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                datos[campo] = valor
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class FiltroRepeticiones(logging.Filter):
+    """Dejar pasar un aviso repetido (mismo ISP, endpoint y resultado) por ventana"""
+
+    # Tope de claves recordadas: si se llena, se olvidan las más antiguas
+    MAXIMO_CLAVES = 10000
+
+    def __init__(self, ventana_segundos=3600):
+        super().__init__()
+        self.ventana = ventana_segundos
+        self.vistos = {}
+        self.lock = threading.Lock()
+        self.ultima_poda = time.monotonic()
+
+    def _podar(self, ahora):
+        # Las claves con la ventana vencida ya no suprimen nada; las que tienen
+        # repeticiones suprimidas se guardan una ventana más para informarlas
+        self.vistos = {clave: (ultimo, suprimidos) for clave, (ultimo, suprimidos) in self.vistos.items()
+                       if ahora - ultimo < (2 * self.ventana if suprimidos else self.ventana)}
+        if len(self.vistos) >= self.MAXIMO_CLAVES:
+            # Los dict conservan el orden de inserción: primero las más antiguas
+            for clave in list(self.vistos)[:len(self.vistos) - self.MAXIMO_CLAVES // 2]:
+                del self.vistos[clave]
+        self.ultima_poda = ahora
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or getattr(record, 'isp_id', None) is None:
+            return True
+        clave = (record.name, record.levelno, record.isp_id,
+                 getattr(record, 'endpoint', None), getattr(record, 'resultado', None))
+        ahora = time.monotonic()
+        with self.lock:
+            if len(self.vistos) >= self.MAXIMO_CLAVES or ahora - self.ultima_poda > self.ventana:
+                self._podar(ahora)
+            ultimo, suprimidos = self.vistos.get(clave, (None, 0))
+            if ultimo is not None and ahora - ultimo < self.ventana:
+                self.vistos[clave] = (ultimo, suprimidos + 1)
+                return False
+            # Reinsertar para que el orden del dict siga la hora de la última emisión
+            self.vistos.pop(clave, None)
+            self.vistos[clave] = (ahora, 0)
+        if suprimidos:
+            record.repeticiones_suprimidas = suprimidos
+        return True
+
+class HandlerCola(logging.handlers.QueueHandler):
+    """QueueHandler que conserva los campos extra para el formateador JSON"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _iniciar_listener(handler_salida):
+    global _listener
+    cola = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(cola, handler_salida, respect_handler_level=True)
+    _listener.start()
+    return cola
+
+def configurar_registro(nivel='INFO', ventana_repeticiones=3600, stream=None):
+    """Configurar los loggers "skypass" con cola y salida JSON (idempotente)"""
+    with _lock:
+        logger = logging.getLogger('skypass')
+        if _listener is not None:
+            logger.setLevel(nivel)
+            return logger
+
+        handler_salida = logging.StreamHandler(stream or sys.stderr)
+        handler_salida.setFormatter(FormatoJSON())
+
+        handler_cola = HandlerCola(_iniciar_listener(handler_salida))
+        handler_cola.addFilter(FiltroRepeticiones(ventana_repeticiones))
+
+        logger.addHandler(handler_cola)
+        logger.setLevel(nivel)
+        logger.propagate = False
+
+        atexit.register(detener_registro)
+
+        # El hilo del listener no sobrevive a un fork (gunicorn --preload):
+        # el proceso hijo arranca su propio listener sobre una cola nueva
+        def reiniciar_en_hijo():
+            global _listener
+            _listener = None
+            handler_cola.queue = _iniciar_listener(handler_salida)
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=reiniciar_en_hijo)
+
+        return logger
+
+def detener_registro():
+    """Vaciar la cola y detener el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -4,9 +4,10 @@ Script de inicio para Admin Skypass
 Sistema de Administración de ISPs
 """
 
-import os
 import sys
-from app import app, db
+import importlib.util
+from sqlalchemy.engine import make_url
+from app import create_app, inicializar_base_datos
 
 def main():
     """Función principal para iniciar la aplicación"""
@@ -14,21 +15,21 @@ def main():
     print("🌐 Admin Skypass - Sistema de Administración de ISPs")
     print("=" * 50)
     
-    # Verificar dependencias
-    try:
-        import flask
-        import flask_sqlalchemy
-        import requests
-        print("✅ Dependencias verificadas correctamente")
-    except ImportError as e:
-        print(f"❌ Error: Falta dependencia - {e}")
+    # Verificar dependencias (flask ya se cargó con app; el resto solo se busca, sin importarlo)
+    faltantes = [modulo for modulo in ('flask', 'flask_sqlalchemy', 'requests')
+                 if importlib.util.find_spec(modulo) is None]
+    if faltantes:
+        print(f"❌ Error: Falta dependencia - {', '.join(faltantes)}")
         print("💡 Ejecuta: pip install -r requirements.txt")
         sys.exit(1)
+    print("✅ Dependencias verificadas correctamente")
+    
+    app = create_app()
     
     # Crear base de datos si no existe
     with app.app_context():
         try:
-            db.create_all()
+            inicializar_base_datos()
             print("✅ Base de datos inicializada")
         except Exception as e:
             print(f"❌ Error al inicializar base de datos: {e}")
@@ -36,7 +37,7 @@ def main():
     
     # Verificar configuración
     print("\n🔧 Configuración del sistema:")
-    print(f"   - Base de datos: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(f"   - Base de datos: {make_url(app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True)}")
     print(f"   - Modo debug: {app.config.get('DEBUG', False)}")
     print(f"   - Email configurado: {'Sí' if app.config.get('GMAIL_USER') else 'No'}")
     
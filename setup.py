@@ -6,7 +6,7 @@ Script de configuración inicial para Admin Skypass
 import os
 import sys
 import getpass
-from app import app, db, Admin
+from app import app, db, Admin, inicializar_base_datos
 from werkzeug.security import generate_password_hash
 
 def configurar_admin():
@@ -133,7 +133,7 @@ def main():
     print("\n🗄️  Inicializando base de datos...")
     with app.app_context():
         try:
-            db.create_all()
+            inicializar_base_datos()
             print("✅ Base de datos creada correctamente")
         except Exception as e:
             print(f"❌ Error al crear base de datos: {e}")
@@ -0,0 +1,84 @@
+"""
+Entorno común de las pruebas de la aplicación sobre SQLite
+
+La aplicación se configura una sola vez por proceso, así que todas las pruebas
+comparten una base SQLite temporal creada con las migraciones; cada prueba
+empieza con las tablas vacías. La configuración del .env se reemplaza por la
+de cada prueba (ver PruebaApp.configurar) y GenieACS se simula con el
+servidor falso de benchmark/genieacs_falso.py.
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmark'))
+
+DIRECTORIO = tempfile.mkdtemp(prefix='skypass_pruebas_')
+atexit.register(shutil.rmtree, DIRECTORIO, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DIRECTORIO, 'pruebas.db')}"
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+import app as skypass
+import genieacs_falso
+
+skypass.create_app()
+with skypass.app.app_context():
+    skypass.inicializar_base_datos()
+
+API_TOKEN = 'token-de-prueba'
+
+# Configuración base de las pruebas (lo que estaría en el .env)
+CONFIGURACION = {
+    'SECRET_KEY': 'clave-de-prueba',
+    'API_TOKEN': API_TOKEN,
+    'MONITOREO_INCREMENTAL': 'False',
+}
+
+# Host de loopback libre para el próximo servidor falso (127.0.1.x: el benchmark usa 127.0.0.x)
+_siguiente_host = [1]
+
+def iniciar_genieacs(dispositivos, **opciones):
+    """Levantar un GenieACS falso en el puerto de la API; devuelve (host, estado)"""
+    while True:
+        host = f"127.0.1.{_siguiente_host[0]}"
+        _siguiente_host[0] += 1
+        if genieacs_falso.host_disponible(host, skypass.PUERTO_API_GENIEACS):
+            break
+    estado = genieacs_falso.EstadoServidor(dispositivos, **opciones)
+    servidor = genieacs_falso.iniciar_servidor(host, skypass.PUERTO_API_GENIEACS, estado)
+    atexit.register(servidor.shutdown)
+    return host, estado
+
+class PruebaApp(unittest.TestCase):
+    """Prueba con contexto de aplicación, tablas vacías y configuración propia"""
+
+    def setUp(self):
+        self.contexto = skypass.app.app_context()
+        self.contexto.push()
+        self.addCleanup(self.contexto.pop)
+        self.addCleanup(skypass.db.session.remove)
+        for tabla in reversed(skypass.db.metadata.sorted_tables):
+            skypass.db.session.execute(tabla.delete())
+        skypass.db.session.commit()
+        self.configurar()
+
+    def configurar(self, **valores):
+        """Reemplazar la configuración del .env durante la prueba"""
+        configuracion = dict(CONFIGURACION, **valores)
+        parche = mock.patch.object(skypass, 'get_env_config', lambda: dict(configuracion))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def crear_isp(self, host='127.0.0.1', **datos):
+        isp = skypass.ISP(**dict({'nombre': f"ISP {host}", 'ip_vm': host, 'genieacs_url': f"{host}:3000",
+                                  'limite_clientes': 100}, **datos))
+        skypass.db.session.add(isp)
+        skypass.db.session.commit()
+        return isp
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la API de lectura /api/v1/isps (paginación, sincronización incremental y bajas)
+"""
+
+import json
+import base64
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from entorno_sqlite import PruebaApp, API_TOKEN, skypass
+
+ANTES = datetime(2020, 1, 1)
+
+def ahora():
+    # La base guarda las fechas en UTC sin zona
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class PruebaAPI(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        self.cliente = skypass.app.test_client()
+
+    def pedir(self, token=API_TOKEN, **params):
+        return self.cliente.get('/api/v1/isps', query_string=params,
+                                headers={'Authorization': f"Bearer {token}"} if token else {})
+
+    def crear_isps(self, cantidad):
+        isps = [self.crear_isp(f"10.0.0.{i}") for i in range(1, cantidad + 1)]
+        return [isp.id for isp in isps]
+
+    def envejecer(self, *ids):
+        # fecha_actualizacion no es un campo sincronizado: asignarla no vuelve a sellar la fila
+        skypass.ISP.query.filter(skypass.ISP.id.in_(ids)).update({'fecha_actualizacion': ANTES})
+        skypass.db.session.commit()
+
+    def paginas(self, **params):
+        ids = []
+        while True:
+            respuesta = self.pedir(**params)
+            self.assertEqual(respuesta.status_code, 200, respuesta.get_data(as_text=True))
+            datos = respuesta.get_json()
+            ids.extend(isp['id'] for isp in datos['data'])
+            if not datos['next_cursor']:
+                return ids, datos
+            params = {'cursor': datos['next_cursor'], 'limit': params.get('limit', 500)}
+
+    def test_autenticacion(self):
+        self.assertEqual(self.pedir(token=None).status_code, 401)
+        self.assertEqual(self.pedir(token='otro').status_code, 401)
+        self.configurar(API_TOKEN='')
+        self.assertEqual(self.pedir().status_code, 503)
+
+    def test_paginacion_con_cursor(self):
+        todos = self.crear_isps(7)
+        ids, _ = self.paginas(limit=3)
+        self.assertEqual(ids, todos)
+
+        datos = self.pedir(limit=3, fields='id,estado').get_json()
+        self.assertEqual(set(datos['data'][0]), {'id', 'estado'})
+
+    def test_filtro_por_ids_se_mantiene_en_el_cursor(self):
+        todos = self.crear_isps(6)
+        elegidos = todos[1::2]
+        ids, _ = self.paginas(limit=1, ids=','.join(map(str, elegidos)))
+        self.assertEqual(ids, elegidos)
+
+    def test_updated_since_y_eliminados(self):
+        todos = self.crear_isps(5)
+        self.envejecer(*todos)
+        desde = (ahora() - timedelta(minutes=1)).isoformat()
+
+        isp = skypass.db.session.get(skypass.ISP, todos[0])
+        isp.dispositivos_actuales = 42
+        sin_cambio = skypass.db.session.get(skypass.ISP, todos[1])
+        sin_cambio.limite_clientes = sin_cambio.limite_clientes
+        skypass.db.session.delete(skypass.db.session.get(skypass.ISP, todos[2]))
+        skypass.db.session.commit()
+
+        ids, datos = self.paginas(limit=1, updated_since=desde)
+        self.assertEqual(ids, [todos[0]])
+        self.assertEqual(datos['eliminados'], [todos[2]])
+        sincronizado = datetime.fromisoformat(datos['sincronizado_hasta']).replace(tzinfo=None)
+        self.assertLess(sincronizado, ahora() - timedelta(seconds=59))
+
+        # Las bajas anteriores a updated_since no se informan
+        posterior = (ahora() + timedelta(minutes=1)).isoformat()
+        self.assertEqual(self.pedir(updated_since=posterior).get_json()['eliminados'], [])
+
+    def test_id_reutilizado_no_figura_como_eliminado(self):
+        desde = (ahora() - timedelta(minutes=1)).isoformat()
+        isp_id = self.crear_isps(1)[0]
+        skypass.db.session.delete(skypass.db.session.get(skypass.ISP, isp_id))
+        skypass.db.session.commit()
+        self.crear_isp('10.0.0.9', id=isp_id)
+        datos = self.pedir(updated_since=desde).get_json()
+        self.assertEqual([isp['id'] for isp in datos['data']], [isp_id])
+        self.assertEqual(datos['eliminados'], [])
+
+    def test_parametros_invalidos(self):
+        for params in ({'limit': 0}, {'limit': 'x'}, {'fields': 'id,secreto'},
+                       {'updated_since': 'ayer'}, {'ids': '1,a'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.pedir(**params).status_code, 400)
+
+    def test_cursor_alterado(self):
+        def cursor(datos):
+            return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+        hasta = ahora().isoformat()
+        for valor in ('no-es-base64!', cursor([1, 2]), cursor({'id': '3', 'hasta': hasta}),
+                      cursor({'id': True, 'hasta': hasta}), cursor({'id': 1}),
+                      cursor({'id': 1, 'hasta': 'ayer'}), cursor({'id': 1, 'hasta': hasta, 'desde': 5}),
+                      cursor({'id': 1, 'hasta': hasta, 'ids': 7}),
+                      cursor({'id': 1, 'hasta': hasta, 'ids': ['1']})):
+            with self.subTest(cursor=valor):
+                respuesta = self.pedir(cursor=valor)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.get_json())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los backups por bloques de backup.py sobre bases SQLite temporales
+"""
+
+import io
+import os
+import sys
+import gzip
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup
+
+class PruebaBackup(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='skypass_backup_')
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.db = os.path.join(self.directorio, 'isps.db')
+        self.backups = os.path.join(self.directorio, 'backups')
+        self.ejecutar("CREATE TABLE isp (id INTEGER PRIMARY KEY, nombre TEXT)")
+        self.ejecutar("INSERT INTO isp (nombre) VALUES " + ','.join(f"('ISP {i}')" for i in range(2000)))
+        # Los mensajes de los scripts no interesan en las pruebas
+        parche = mock.patch('sys.stdout', new_callable=io.StringIO)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def ejecutar(self, sql):
+        conn = sqlite3.connect(self.db)
+        try:
+            conn.execute(sql)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def filas(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return conn.execute("SELECT id, nombre FROM isp ORDER BY id").fetchall()
+        finally:
+            conn.close()
+
+    def crear(self):
+        nombre = backup.crear_backup(self.db, self.backups)
+        self.assertTrue(nombre)
+        return nombre
+
+    def manifiesto(self, nombre):
+        return backup.leer_manifiesto(nombre, self.backups)
+
+class PruebaBloques(PruebaBackup):
+    def test_backup_sin_cambios_no_agrega_bloques(self):
+        primero = self.manifiesto(self.crear())
+        segundo = self.manifiesto(self.crear())
+        self.assertGreater(primero['bytes_nuevos'], 0)
+        self.assertEqual(segundo['bytes_nuevos'], 0)
+        self.assertEqual(segundo['bloques'], primero['bloques'])
+        self.assertEqual(len(backup.leer_catalogo(self.backups)), 2)
+
+    def test_solo_se_guardan_los_bloques_que_cambian(self):
+        # Varios bloques de 256 KB: el cambio de una fila solo toca uno
+        self.ejecutar("INSERT INTO isp (nombre) VALUES " + ','.join(f"('ISP {i}')" for i in range(100000)))
+        primero = self.manifiesto(self.crear())
+        self.ejecutar("UPDATE isp SET nombre = 'cambiado' WHERE id = 1")
+        segundo = self.manifiesto(self.crear())
+        self.assertGreater(len(segundo['bloques']), 2)
+        iguales = sum(1 for a, b in zip(primero['bloques'], segundo['bloques']) if a == b)
+        self.assertGreater(iguales, len(segundo['bloques']) // 2)
+        self.assertNotEqual(primero['sha256'], segundo['sha256'])
+
+    def test_verificar_detecta_bloques_danados(self):
+        nombre = self.crear()
+        self.assertTrue(backup.verificar_backups(self.backups))
+        digest = self.manifiesto(nombre)['bloques'][0]
+        with open(backup._ruta_bloque(self.backups, digest), 'wb') as f:
+            f.write(gzip.compress(b'otro contenido'))
+        self.assertFalse(backup.verificar_backups(self.backups))
+
+    def test_crear_espera_el_bloqueo_del_directorio(self):
+        creados = []
+        with backup.bloqueo_backups(self.backups):
+            hilo = threading.Thread(target=lambda: creados.append(backup.crear_backup(self.db, self.backups)))
+            hilo.start()
+            time.sleep(0.3)
+            self.assertTrue(hilo.is_alive())
+            self.assertEqual(backup.leer_catalogo(self.backups), [])
+        hilo.join(timeout=30)
+        self.assertTrue(creados[0])
+
+class PruebaLimpieza(PruebaBackup):
+    def envejecer(self, nombre, dias=40):
+        catalogo = backup.leer_catalogo(self.backups)
+        for entrada in catalogo:
+            if entrada['nombre'] == nombre:
+                entrada['fecha'] = (datetime.now() - timedelta(days=dias)).isoformat(timespec='seconds')
+        backup.guardar_catalogo(catalogo, self.backups)
+
+    def bloques_guardados(self):
+        return {archivo[:-3] for _, _, archivos in os.walk(os.path.join(self.backups, 'bloques'))
+                for archivo in archivos if archivo.endswith('.gz')}
+
+    def test_elimina_backups_y_bloques_sin_uso(self):
+        antiguo = self.crear()
+        self.ejecutar("UPDATE isp SET nombre = 'cambiado'")
+        reciente = self.crear()
+        self.envejecer(antiguo)
+
+        backup.limpiar_backups_antiguos(self.backups, dias=30)
+
+        self.assertEqual([b['nombre'] for b in backup.leer_catalogo(self.backups)], [reciente])
+        self.assertFalse(os.path.exists(backup._ruta_manifiesto(self.backups, antiguo)))
+        self.assertEqual(self.bloques_guardados(), set(self.manifiesto(reciente)['bloques']))
+        self.assertTrue(backup.verificar_backups(self.backups))
+
+    def test_manifiesto_danado_o_faltante_no_detiene_la_limpieza(self):
+        antiguo = self.crear()
+        self.ejecutar("UPDATE isp SET nombre = 'cambiado'")
+        danado = self.crear()
+        self.ejecutar("UPDATE isp SET nombre = 'otra vez'")
+        faltante = self.crear()
+        self.ejecutar("DELETE FROM isp WHERE id > 10")
+        valido = self.crear()
+        self.envejecer(antiguo)
+        with open(backup._ruta_manifiesto(self.backups, danado), 'w') as f:
+            f.write('{"bloques": [')
+        os.remove(backup._ruta_manifiesto(self.backups, faltante))
+
+        backup.limpiar_backups_antiguos(self.backups, dias=30)
+
+        nombres = [b['nombre'] for b in backup.leer_catalogo(self.backups)]
+        self.assertEqual(nombres, [danado, faltante, valido])
+        self.assertTrue(set(self.manifiesto(valido)['bloques']) <= self.bloques_guardados())
+        self.assertTrue(backup.verificar_backups(self.backups, nombres=[valido]))
+
+    def test_entrada_sin_fecha_valida_se_conserva(self):
+        nombre = self.crear()
+        catalogo = backup.leer_catalogo(self.backups)
+        catalogo[0]['fecha'] = 'sin fecha'
+        backup.guardar_catalogo(catalogo, self.backups)
+        backup.limpiar_backups_antiguos(self.backups, dias=30)
+        self.assertEqual([b['nombre'] for b in backup.leer_catalogo(self.backups)], [nombre])
+
+class PruebaRestauracion(PruebaBackup):
+    def test_restaura_el_backup_y_respalda_la_base_actual(self):
+        original = self.filas()
+        nombre = self.crear()
+        self.ejecutar("DELETE FROM isp WHERE id > 100")
+        modificadas = self.filas()
+
+        self.assertTrue(backup.restaurar_backup(nombre, self.db, self.backups))
+
+        self.assertEqual(self.filas(), original)
+        catalogo = backup.leer_catalogo(self.backups)
+        self.assertEqual(len(catalogo), 2)
+        # El backup previo a la restauración conserva la base que se reemplazó
+        previa = os.path.join(self.directorio, 'previa.db')
+        backup.reconstruir_backup(catalogo[1]['nombre'], previa, self.backups)
+        conn = sqlite3.connect(previa)
+        try:
+            self.assertEqual(conn.execute("SELECT id, nombre FROM isp ORDER BY id").fetchall(), modificadas)
+        finally:
+            conn.close()
+        self.assertEqual([f for f in os.listdir(self.backups) if f.startswith('skypass_')], [])
+
+    def test_conexion_abierta_ve_la_base_restaurada(self):
+        nombre = self.crear()
+        self.ejecutar("DELETE FROM isp")
+        conn = sqlite3.connect(self.db)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM isp").fetchone()[0], 0)
+            self.assertTrue(backup.restaurar_backup(nombre, self.db, self.backups))
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM isp").fetchone()[0], 2000)
+            conn.execute("INSERT INTO isp (nombre) VALUES ('después')")
+            conn.commit()
+        finally:
+            conn.close()
+        self.assertEqual(len(self.filas()), 2001)
+
+    def test_bloque_danado_no_modifica_la_base(self):
+        nombre = self.crear()
+        self.ejecutar("DELETE FROM isp WHERE id > 100")
+        actuales = self.filas()
+        digest = self.manifiesto(nombre)['bloques'][0]
+        with open(backup._ruta_bloque(self.backups, digest), 'wb') as f:
+            f.write(gzip.compress(b'otro contenido'))
+
+        self.assertFalse(backup.restaurar_backup(nombre, self.db, self.backups))
+
+        self.assertEqual(self.filas(), actuales)
+        self.assertEqual(len(backup.leer_catalogo(self.backups)), 1)
+        self.assertEqual([f for f in os.listdir(self.backups) if f.startswith('skypass_')], [])
+
+    def test_backup_db_completo(self):
+        original = self.filas()
+        os.makedirs(self.backups)
+        antiguo = os.path.join(self.backups, 'isps_backup_20240101_000000.db')
+        shutil.copy(self.db, antiguo)
+        self.ejecutar("DELETE FROM isp")
+        self.assertTrue(backup.restaurar_backup(antiguo, self.db, self.backups))
+        self.assertEqual(self.filas(), original)
+
+    def test_backup_que_no_es_una_base_valida(self):
+        os.makedirs(self.backups)
+        danado = os.path.join(self.backups, 'isps_backup_20240101_000000.db')
+        with open(danado, 'wb') as f:
+            f.write(b'esto no es SQLite' * 100)
+        actuales = self.filas()
+        self.assertFalse(backup.restaurar_backup(danado, self.db, self.backups))
+        self.assertEqual(self.filas(), actuales)
+        self.assertEqual(backup.leer_catalogo(self.backups), [])
+
+if __name__ == '__main__':
+    unittest.main()
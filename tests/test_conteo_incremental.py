@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Pruebas del conteo incremental de dispositivos contra un GenieACS falso
+"""
+
+import unittest
+from unittest import mock
+
+from entorno_sqlite import PruebaApp, iniciar_genieacs, skypass, genieacs_falso
+
+def dispositivo(base, _id, registrado=None):
+    nuevo = dict(base, _id=_id, _tags=[])
+    if registrado:
+        nuevo['_registered'] = registrado
+    return nuevo
+
+class PruebaConteoIncremental(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        self.configurar(MONITOREO_INCREMENTAL='True', RECONCILIACION_INTERVAL='3600')
+        self.host, self.genieacs = iniciar_genieacs(genieacs_falso.generar_dispositivos(120), total_count=True)
+        self.isp = self.crear_isp(self.host)
+
+    def contar(self):
+        conteo = skypass.contar_dispositivos(self.isp)
+        skypass.db.session.commit()
+        return conteo
+
+    def test_reconciliacion_coincide_con_el_conteo_completo(self):
+        self.configurar(MONITOREO_INCREMENTAL='True', GENIEACS_EXCLUIR_TAGS='retirado')
+        retirados = sum(1 for d in self.genieacs.dispositivos if 'retirado' in d['_tags'])
+        self.assertEqual(self.contar(), 120 - retirados)
+        self.assertEqual(self.contar(), skypass.verificar_dispositivos_genieacs(self.isp))
+
+    def test_solo_suma_los_registrados_despues_de_la_marca(self):
+        self.assertEqual(self.contar(), 120)
+        ultimo = self.genieacs.dispositivos[-1]
+        self.genieacs.dispositivos.append(dispositivo(ultimo, 'nuevo-1', '2099-01-01T00:00:00.000Z'))
+        self.assertEqual(self.contar(), 121)
+        self.assertEqual(self.contar(), 121)
+
+    def test_registro_en_el_mismo_milisegundo_que_la_marca(self):
+        self.assertEqual(self.contar(), 120)
+        # Mismo _registered que el último ya contado: entra por $gte y se descuenta por _id
+        ultimo = self.genieacs.dispositivos[-1]
+        self.genieacs.dispositivos.append(dispositivo(ultimo, 'mismo-instante'))
+        self.assertEqual(self.contar(), 121)
+        self.assertEqual(self.contar(), 121)
+
+    def test_registro_durante_la_reconciliacion_no_se_cuenta_dos_veces(self):
+        consultar = skypass.consultar_devices_genieacs
+        ultimo = self.genieacs.dispositivos[-1]
+
+        def registrar_durante_el_conteo(*args, **kwargs):
+            pagina = consultar(*args, **kwargs)
+            if not any(d['_id'] == 'durante' for d in self.genieacs.dispositivos):
+                self.genieacs.dispositivos.append(dispositivo(ultimo, 'durante', '2099-01-01T00:00:00.000Z'))
+            return pagina
+
+        with mock.patch.object(skypass, 'LOTE_INCREMENTAL', 50), \
+                mock.patch.object(skypass, 'consultar_devices_genieacs', registrar_durante_el_conteo):
+            self.assertEqual(self.contar(), 121)
+        self.assertEqual(self.contar(), 121)
+
+    def test_con_ventana_de_inform_siempre_cuenta_completo(self):
+        self.configurar(MONITOREO_INCREMENTAL='True', GENIEACS_DIAS_INFORM='30')
+        with mock.patch.object(skypass, 'contar_dispositivos_incremental') as incremental:
+            self.assertEqual(self.contar(), skypass.verificar_dispositivos_genieacs(self.isp))
+        incremental.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
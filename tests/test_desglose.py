@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Pruebas del desglose de dispositivos por fabricante, modelo, versión y antigüedad
+"""
+
+import unittest
+
+from entorno_sqlite import PruebaApp, iniciar_genieacs, skypass, genieacs_falso
+
+class PruebaDesglose(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        self.host, self.genieacs = iniciar_genieacs(genieacs_falso.generar_dispositivos(300))
+        self.isp = self.crear_isp(self.host)
+
+    def test_agrega_todas_las_paginas(self):
+        datos = skypass.recolectar_desglose_genieacs(self.isp, tamano_pagina=70)
+        self.assertEqual(datos['total'], 300)
+        for clave in ('fabricantes', 'modelos', 'versiones', 'antiguedad_inform'):
+            self.assertEqual(sum(datos[clave].values()), 300)
+        esperados = {}
+        for d in self.genieacs.dispositivos:
+            fabricante = d['_deviceId']['_Manufacturer']
+            esperados[fabricante] = esperados.get(fabricante, 0) + 1
+        self.assertEqual(datos['fabricantes'], esperados)
+
+    def test_usa_el_mismo_filtro_que_el_conteo(self):
+        self.configurar(GENIEACS_DIAS_INFORM='30', GENIEACS_EXCLUIR_TAGS='retirado')
+        datos = skypass.recolectar_desglose_genieacs(self.isp, tamano_pagina=70)
+        self.assertLess(datos['total'], 300)
+        self.assertEqual(datos['total'], skypass.verificar_dispositivos_genieacs(self.isp))
+        self.assertNotIn('mas_30d', datos['antiguedad_inform'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas del diagnóstico rápido de conectividad con GenieACS (botón "Probar conexión")
+"""
+
+import time
+import socket
+import unittest
+from unittest import mock
+
+from entorno_sqlite import PruebaApp, iniciar_genieacs, skypass, genieacs_falso
+
+# Nadie escucha en este rango de loopback
+HOST_SIN_SERVIDOR = '127.0.2.1'
+
+class PruebaDiagnostico(PruebaApp):
+    def diagnosticar(self, host, **plazos):
+        inicio = time.perf_counter()
+        diagnostico = skypass.diagnosticar_genieacs(f"{host}:3000", **dict({'timeout_conexion': 0.5,
+                                                                           'timeout_lectura': 0.5}, **plazos))
+        return diagnostico, time.perf_counter() - inicio
+
+    def test_api_que_responde(self):
+        host, _ = iniciar_genieacs(genieacs_falso.generar_dispositivos(30), total_count=True)
+        diagnostico, _ = self.diagnosticar(host)
+        self.assertEqual(diagnostico['direccion'], host)
+        self.assertEqual(diagnostico['exito']['puerto'], skypass.PUERTO_API_GENIEACS)
+        self.assertEqual(diagnostico['exito']['dispositivos'], 30)
+        self.assertIsNone(diagnostico['error'])
+
+    def test_puerto_cerrado(self):
+        diagnostico, _ = self.diagnosticar(HOST_SIN_SERVIDOR)
+        self.assertIsNone(diagnostico['exito'])
+        self.assertIn('rechaza la conexión', diagnostico['error'])
+
+    def test_servidor_colgado_respeta_el_plazo(self):
+        host, _ = iniciar_genieacs([], colgado=True)
+        diagnostico, duracion = self.diagnosticar(host)
+        self.assertIn('no respondió a tiempo', diagnostico['error'])
+        self.assertLess(duracion, 2)
+
+    def test_dns_lento_respeta_el_plazo(self):
+        resolver = socket.getaddrinfo
+
+        def dns_lento(*args, **kwargs):
+            time.sleep(3)
+            return resolver(*args, **kwargs)
+
+        with mock.patch.object(socket, 'getaddrinfo', dns_lento):
+            diagnostico, duracion = self.diagnosticar('genieacs.ejemplo')
+        self.assertIn('timeout', diagnostico['error'])
+        self.assertEqual(diagnostico['pruebas'], [])
+        self.assertLess(duracion, 2)
+
+    def test_dns_sin_respuesta(self):
+        with mock.patch.object(socket, 'getaddrinfo', side_effect=socket.gaierror('no existe')):
+            diagnostico, _ = self.diagnosticar('genieacs.ejemplo')
+        self.assertIn('No se pudo resolver genieacs.ejemplo', diagnostico['error'])
+
+    def test_url_invalida(self):
+        self.assertEqual(skypass.diagnosticar_genieacs('http://:3000')['error'], 'URL inválida')
+
+    def test_ruta_probar_conexion(self):
+        host, _ = iniciar_genieacs(genieacs_falso.generar_dispositivos(12), total_count=True)
+        cliente = skypass.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['logged_in'] = True
+        datos = cliente.post('/probar_conexion', json={'url': f"{host}:3000"}).get_json()
+        self.assertTrue(datos['success'])
+        self.assertEqual(datos['dispositivos'], 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los archivos estáticos con huella de contenido y variantes comprimidas
+"""
+
+import os
+import sys
+import gzip
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, url_for
+
+import estaticos
+
+CSS = b'body { color: #333; }\n' * 200
+
+class PruebaEstaticos(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='skypass_static_')
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        os.makedirs(os.path.join(self.directorio, 'css'))
+        with open(os.path.join(self.directorio, 'css', 'style.css'), 'wb') as f:
+            f.write(CSS)
+        with open(os.path.join(self.directorio, 'logo.png'), 'wb') as f:
+            f.write(os.urandom(256))
+
+        self.app = Flask(__name__, static_folder=self.directorio, static_url_path='/static')
+        estaticos.init_estaticos(self.app)
+        self.cliente = self.app.test_client()
+
+    def url(self, filename):
+        with self.app.test_request_context():
+            return url_for('static', filename=filename)
+
+    def test_url_con_huella(self):
+        url = self.url('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        self.assertEqual(self.url('no_existe.css'), '/static/no_existe.css')
+
+    def test_variante_segun_accept_encoding(self):
+        url = self.url('css/style.css')
+
+        respuesta = self.cliente.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(respuesta.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(respuesta.data), CSS)
+        self.assertEqual(respuesta.headers['Cache-Control'], estaticos.CACHE_INMUTABLE)
+        self.assertIn('Accept-Encoding', respuesta.headers['Vary'])
+
+        respuesta = self.cliente.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', respuesta.headers)
+        self.assertEqual(respuesta.data, CSS)
+
+    def test_revalidacion_con_etag(self):
+        url = self.url('css/style.css')
+        etag = self.cliente.get(url).headers['ETag']
+        self.assertEqual(self.cliente.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_binarios_sin_comprimir(self):
+        respuesta = self.cliente.get(self.url('logo.png'), headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Content-Encoding', respuesta.headers)
+        self.assertNotIn('Vary', respuesta.headers)
+
+    def test_nombre_sin_huella_usa_el_servicio_normal(self):
+        respuesta = self.cliente.get('/static/css/style.css')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta.headers.get('Cache-Control'), estaticos.CACHE_INMUTABLE)
+        respuesta.close()
+
+    def test_en_modo_debug_recalcula_al_cambiar_el_archivo(self):
+        self.app.debug = True
+        anterior = self.url('css/style.css')
+        ruta = os.path.join(self.directorio, 'css', 'style.css')
+        with open(ruta, 'wb') as f:
+            f.write(b'body { color: red; }\n')
+        os.utime(ruta, (0, 0))
+        nueva = self.url('css/style.css')
+        self.assertNotEqual(nueva, anterior)
+        self.assertEqual(self.cliente.get(nueva).data, b'body { color: red; }\n')
+        self.assertEqual(self.cliente.get(anterior).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las exportaciones por streaming (CSV y NDJSON) de /exportar/<tipo>
+"""
+
+import csv
+import io
+import json
+import unittest
+from datetime import datetime
+
+from entorno_sqlite import PruebaApp, skypass
+
+class PruebaExportacion(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        # Páginas de dos filas: las exportaciones cruzan varios límites de página
+        self.configurar(EXPORTACION_LOTE='2')
+        self.cliente = skypass.app.test_client()
+        with self.cliente.session_transaction() as sesion:
+            sesion['logged_in'] = True
+
+    def exportar(self, tipo, **params):
+        respuesta = self.cliente.get(f"/exportar/{tipo}", query_string=params)
+        self.assertEqual(respuesta.status_code, 200, respuesta.get_data(as_text=True))
+        texto = respuesta.get_data(as_text=True)
+        if params.get('formato') == 'ndjson':
+            return [json.loads(linea) for linea in texto.splitlines()]
+        return list(csv.DictReader(io.StringIO(texto)))
+
+    def test_isps_en_csv_y_ndjson(self):
+        ids = [self.crear_isp(f"10.0.0.{i}").id for i in range(1, 6)]
+        self.crear_isp('10.0.0.9', nombre='=HYPERLINK("x")')
+
+        filas = self.exportar('isps')
+        self.assertEqual([int(fila['id']) for fila in filas[:5]], ids)
+        self.assertEqual(filas[-1]['nombre'], '\'=HYPERLINK("x")')
+
+        filas = self.exportar('isps', formato='ndjson')
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[-1]['nombre'], '=HYPERLINK("x")')
+
+    def test_alertas_con_la_misma_fecha_entre_paginas(self):
+        isp = self.crear_isp('10.0.0.1')
+        otro = self.crear_isp('10.0.0.2')
+        fecha = datetime(2024, 3, 10, 12, 0)
+        for i in range(5):
+            skypass.db.session.add(skypass.Alerta(isp_id=isp.id, mensaje=f"alerta {i}", fecha_envio=fecha, enviada=True))
+        skypass.db.session.add(skypass.Alerta(isp_id=otro.id, mensaje='otro ISP', fecha_envio=fecha))
+        skypass.db.session.add(skypass.Alerta(isp_id=isp.id, mensaje='otro mes', fecha_envio=datetime(2024, 4, 1)))
+        skypass.db.session.commit()
+
+        filas = self.exportar('alertas', mes='2024-03', isp_id=str(isp.id))
+        self.assertEqual(sorted(fila['mensaje'] for fila in filas), [f"alerta {i}" for i in range(5)])
+        self.assertEqual(len({fila['id'] for fila in filas}), 5)
+
+    def test_conteos_con_hasta_inclusivo(self):
+        isp = self.crear_isp('10.0.0.1')
+        for dia in (1, 2, 3):
+            skypass.db.session.add(skypass.ConteoDispositivos(isp_id=isp.id, fecha=datetime(2024, 5, dia, 23, 0),
+                                                              dispositivos=dia, limite_clientes=100))
+        skypass.db.session.commit()
+        filas = self.exportar('conteos', desde='2024-05-02', hasta='2024-05-03', formato='ndjson')
+        self.assertEqual([fila['dispositivos'] for fila in filas], [2, 3])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.cliente.get('/exportar/otra_cosa').status_code, 404)
+        self.assertEqual(self.cliente.get('/exportar/isps?formato=xlsx').status_code, 400)
+        self.assertEqual(self.cliente.get('/exportar/alertas?desde=ayer').status_code, 400)
+        self.assertEqual(self.cliente.get('/exportar/alertas?isp_id=uno').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la importación masiva de ISPs (CSV, arreglo JSON y NDJSON)
+"""
+
+import io
+import json
+import unittest
+from unittest import mock
+
+from entorno_sqlite import PruebaApp, iniciar_genieacs, skypass, genieacs_falso
+
+def objetos(texto, tamano_bloque=4):
+    # Bloques pequeños: los valores quedan partidos entre lecturas
+    return list(skypass._objetos_json(io.StringIO(texto), tamano_bloque=tamano_bloque))
+
+def fila(i, **datos):
+    return dict({'nombre': f"ISP {i}", 'ip_vm': f"10.0.0.{i}", 'genieacs_url': f"10.0.0.{i}:3000",
+                 'limite_clientes': 100}, **datos)
+
+class PruebaObjetosJSON(unittest.TestCase):
+    def test_arreglo(self):
+        self.assertEqual(objetos('[{"a": 1}, {"b": [2, 3]}, 12345]'), [{'a': 1}, {'b': [2, 3]}, 12345])
+        self.assertEqual(objetos(' [ ] \n'), [])
+        self.assertEqual(objetos('[\n  {"a": "x,]"}\n]\n', tamano_bloque=1), [{'a': 'x,]'}])
+
+    def test_ndjson(self):
+        self.assertEqual(objetos('{"a": 1}\n\n{"a": 2}\r\n{"a": 3}'), [{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(objetos(''), [])
+
+    def test_arreglos_mal_formados(self):
+        for texto in ('[1,2', '[{"a": 1}', ']]{"a": 1}', '[1 2]', '[1,,2]', '[,1]', '[1,]',
+                      '[1]]', '[1] {"a": 2}', '[{"a": 1}, {"a": '):
+            with self.subTest(texto=texto), self.assertRaises(ValueError):
+                objetos(texto)
+
+    def test_ndjson_mal_formado(self):
+        for texto in ('{"a": 1} {"a": 2}', '{"a": 1}\n{"a": ', '{"a": 1}\n]'):
+            with self.subTest(texto=texto), self.assertRaises(ValueError):
+                objetos(texto)
+
+    def test_objeto_demasiado_grande(self):
+        with self.assertRaises(ValueError):
+            list(skypass._objetos_json(io.StringIO('[{"a": "' + 'x' * 100), tamano_bloque=16, maximo_objeto=64))
+
+class PruebaImportacion(PruebaApp):
+    def test_crea_actualiza_e_informa_errores_por_fila(self):
+        self.crear_isp('10.0.0.1', nombre='Anterior', limite_clientes=5)
+        filas = enumerate([
+            fila(1, nombre='Actualizado'),
+            fila(2),
+            fila(3, ip_vm='999.0.0.1'),
+            fila(4, limite_clientes='muchos'),
+            fila(5, ip_vm='10.0.0.2'),
+            {'nombre': 'Sin IP'},
+            'no es un objeto',
+        ], start=1)
+        resumen = skypass.importar_filas_isp(filas, lote=2)
+
+        self.assertEqual((resumen['total'], resumen['creados'], resumen['actualizados']), (7, 1, 1))
+        self.assertEqual([error['fila'] for error in resumen['errores']], [3, 4, 5, 6, 7])
+        self.assertIn('fila 2', resumen['errores'][2]['error'])
+        self.assertEqual(skypass.ISP.query.filter_by(ip_vm='10.0.0.1').one().nombre, 'Actualizado')
+        self.assertEqual(skypass.ISP.query.count(), 2)
+
+    def test_sin_actualizar_los_existentes(self):
+        self.crear_isp('10.0.0.1', nombre='Anterior')
+        resumen = skypass.importar_filas_isp(enumerate([fila(1), fila(2)], start=1), actualizar=False)
+        self.assertEqual((resumen['creados'], resumen['actualizados']), (1, 0))
+        self.assertEqual(resumen['errores'], [{'fila': 1, 'ip_vm': '10.0.0.1', 'error': 'Ya existe un ISP con esa IP de VM'}])
+        self.assertEqual(skypass.ISP.query.filter_by(ip_vm='10.0.0.1').one().nombre, 'Anterior')
+
+    def test_lote_con_ip_ocupada_se_reintenta_fila_por_fila(self):
+        # Simula otro guardado simultáneo: la IP aparece después de consultar las existentes
+        self.crear_isp('10.0.0.2', nombre='Simultáneo')
+        pendientes = [(1, skypass.validar_fila_isp(fila(1))[0]), (2, skypass.validar_fila_isp(fila(2))[0])]
+        resumen = {'creados': 0, 'actualizados': 0, 'errores': []}
+        with mock.patch.object(skypass.ISP, 'query', skypass.ISP.query.filter(skypass.ISP.id < 0)):
+            skypass._guardar_lote_isps(pendientes, True, resumen, [])
+        self.assertEqual(resumen['creados'], 1)
+        self.assertEqual(resumen['errores'][0]['fila'], 2)
+        self.assertEqual(skypass.ISP.query.count(), 2)
+
+    def test_archivo_truncado_conserva_los_lotes_guardados(self):
+        texto = '[' + ','.join(json.dumps(fila(i)) for i in range(1, 6)) + ',{"nombre": "ISP 6", '
+        resumen = skypass.importar_filas_isp(skypass.leer_filas_importacion(io.StringIO(texto), 'json'), lote=2)
+        self.assertIn('error_archivo', resumen)
+        self.assertEqual(resumen['creados'], 5)
+        self.assertEqual(skypass.ISP.query.count(), 5)
+
+    def test_probar_conexion_guarda_los_conteos(self):
+        host, _ = iniciar_genieacs(genieacs_falso.generar_dispositivos(25), total_count=True)
+        resumen = skypass.importar_filas_isp(enumerate([fila(1, ip_vm=host, genieacs_url=f"{host}:3000")], start=1),
+                                             probar=True, hilos=2)
+        self.assertEqual(resumen['pruebas'][0]['dispositivos'], 25)
+        self.assertEqual(skypass.ISP.query.one().dispositivos_actuales, 25)
+
+    def test_ruta_con_csv_en_el_cuerpo(self):
+        cliente = skypass.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['logged_in'] = True
+        cuerpo = '\ufeffNombre,IP_VM,GenieACS_URL,Limite_Clientes\nISP 1,10.0.0.1,10.0.0.1:3000,50\nISP 2,mal,x,1\n'
+        respuesta = cliente.post('/importar_isps', data=cuerpo.encode('utf-8'), content_type='text/csv')
+        datos = respuesta.get_json()
+        self.assertTrue(datos['success'])
+        self.assertEqual((datos['creados'], len(datos['errores'])), (1, 1))
+        self.assertEqual(datos['errores'][0]['fila'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Pruebas de /metrics y del directorio de métricas compartido entre procesos
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest import mock
+
+from entorno_sqlite import PruebaApp, RAIZ, iniciar_genieacs, skypass, genieacs_falso
+
+import metricas
+
+def pid_terminado():
+    proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proceso.wait()
+    return proceso.pid
+
+class PruebaDirectorioMetricas(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='skypass_metricas_')
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def test_limpiar_conserva_los_procesos_vivos(self):
+        muerto = pid_terminado()
+        nombres = [f"counter_{os.getpid()}.db", f"histogram_{os.getpid()}.db",
+                   f"counter_{muerto}.db", f"gauge_max_{muerto}.db", 'notas.txt']
+        for nombre in nombres:
+            open(os.path.join(self.directorio, nombre), 'w').close()
+
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': self.directorio}):
+            metricas.limpiar_procesos_terminados()
+
+        self.assertEqual(sorted(os.listdir(self.directorio)),
+                         sorted([f"counter_{os.getpid()}.db", f"histogram_{os.getpid()}.db", 'notas.txt']))
+
+    def test_sin_directorio_configurado_no_hace_nada(self):
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': ''}):
+            metricas.limpiar_procesos_terminados()
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': os.path.join(self.directorio, 'no_existe')}):
+            metricas.limpiar_procesos_terminados()
+
+    def test_importar_crea_el_directorio(self):
+        directorio = os.path.join(self.directorio, 'nuevo')
+        entorno = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directorio)
+        resultado = subprocess.run(
+            [sys.executable, '-c', 'import metricas; metricas.POLL_RESULTADOS.labels("1", "/devices", "ok").inc(); '
+                                   'print(metricas.exponer_metricas()[0].decode())'],
+            cwd=RAIZ, env=entorno, capture_output=True, text=True
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+        self.assertIn('skypass_genieacs_poll_total{endpoint="/devices",isp_id="1",resultado="ok"} 1.0', resultado.stdout)
+        self.assertTrue(os.listdir(directorio))
+
+class PruebaRutaMetricas(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        self.cliente = skypass.app.test_client()
+
+    def test_sondeo_aparece_en_las_metricas(self):
+        host, _ = iniciar_genieacs(genieacs_falso.generar_dispositivos(5), total_count=True)
+        isp = self.crear_isp(host)
+        skypass.verificar_dispositivos_genieacs(isp)
+        respuesta = self.cliente.get('/metrics')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(f'skypass_genieacs_poll_total{{endpoint="/devices",isp_id="{isp.id}",resultado="ok"}}',
+                      respuesta.get_data(as_text=True))
+
+    def test_acceso(self):
+        self.assertEqual(self.cliente.get('/metrics', headers={'X-Forwarded-For': '203.0.113.1'}).status_code, 403)
+        self.assertEqual(self.cliente.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.1'}).status_code, 403)
+
+        self.configurar(METRICS_TOKEN='secreto')
+        self.assertEqual(self.cliente.get('/metrics').status_code, 401)
+        self.assertEqual(self.cliente.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code, 401)
+        respuesta = self.cliente.get('/metrics', headers={'Authorization': 'Bearer secreto'},
+                                     environ_base={'REMOTE_ADDR': '203.0.113.1'})
+        self.assertEqual(respuesta.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
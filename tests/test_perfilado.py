@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas del perfilado de peticiones (Server-Timing, log de peticiones lentas y cProfile)
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, render_template_string
+from flask_sqlalchemy import SQLAlchemy
+
+import perfilado
+
+class PruebaPerfilado(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='skypass_perfilado_')
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SECRET_KEY'] = 'prueba'
+        db = SQLAlchemy(self.app)
+
+        @self.app.route('/')
+        def dashboard():
+            for _ in range(3):
+                db.session.execute(db.text('SELECT 1'))
+            return render_template_string('{{ valor }}', valor='ok')
+
+        @self.app.route('/eliminar/<int:id>')
+        def eliminar_isp(id):
+            return 'eliminado'
+
+        # El logger del módulo es global: el archivo de esta prueba se quita al terminar
+        handlers = list(perfilado.logger.handlers)
+        perfilado.init_perfilado(self.app, db, umbral_ms=0, archivo_log=os.path.join(self.directorio, 'lentas.log'))
+        for handler in perfilado.logger.handlers:
+            if handler not in handlers:
+                self.addCleanup(perfilado.logger.removeHandler, handler)
+                self.addCleanup(handler.close)
+
+    def test_server_timing_y_peticiones_lentas(self):
+        with self.assertLogs('skypass.perfilado', logging.INFO) as registros:
+            respuesta = self.app.test_client().get('/?x=1')
+        self.assertEqual(respuesta.data, b'ok')
+        self.assertIn('sql;dur=', respuesta.headers['Server-Timing'])
+        self.assertIn('desc="3 consultas"', respuesta.headers['Server-Timing'])
+        mensaje = registros.output[0]
+        self.assertIn('LENTA GET /?x=1 -> 200', mensaje)
+        self.assertEqual(mensaje.count('SELECT 1'), 3)
+
+    def test_rutas_perfilables(self):
+        self.assertTrue(perfilado.ruta_perfilable(self.app, '/'))
+        self.assertTrue(perfilado.ruta_perfilable(self.app, '/?pagina=2'))
+        self.assertFalse(perfilado.ruta_perfilable(self.app, '/eliminar/1'))
+        self.assertFalse(perfilado.ruta_perfilable(self.app, '/no_existe'))
+        self.assertFalse(perfilado.ruta_perfilable(self.app, 'http://otro/'))
+
+    def test_perfilar_ruta(self):
+        codigo, salida = perfilado.perfilar_ruta(self.app, '/')
+        self.assertEqual(codigo, 200)
+        self.assertIn('function calls', salida)
+        with self.assertRaises(ValueError):
+            perfilado.perfilar_ruta(self.app, '/eliminar/1')
+
+if __name__ == '__main__':
+    unittest.main()
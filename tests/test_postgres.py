@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las migraciones y de la copia a PostgreSQL contra una instancia local
+
+Se omiten si no está definida TEST_POSTGRES_URL. Cada prueba trabaja en un
+esquema propio que se borra al terminar, así que la base puede ser cualquiera:
+
+    TEST_POSTGRES_URL=postgresql://postgres@localhost/postgres python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+import migraciones
+import migrar_a_postgres
+
+URL_POSTGRES = os.getenv('TEST_POSTGRES_URL')
+
+def _url_con_esquema(url, esquema):
+    # search_path por conexión: las tablas de la prueba quedan en su esquema
+    separador = '&' if '?' in url else '?'
+    return f"{url}{separador}options={quote(f'-csearch_path={esquema}')}"
+
+@unittest.skipUnless(URL_POSTGRES, 'TEST_POSTGRES_URL no está definida')
+class PruebaPostgres(unittest.TestCase):
+    def setUp(self):
+        self.esquema = f"prueba_{uuid.uuid4().hex[:12]}"
+        self.admin = create_engine(migraciones.normalizar_url(URL_POSTGRES))
+        with self.admin.begin() as conn:
+            conn.exec_driver_sql(f'CREATE SCHEMA "{self.esquema}"')
+        self.url = _url_con_esquema(URL_POSTGRES, self.esquema)
+        self.motores = []
+
+    def tearDown(self):
+        for motor in self.motores:
+            motor.dispose()
+        with self.admin.begin() as conn:
+            conn.exec_driver_sql(f'DROP SCHEMA "{self.esquema}" CASCADE')
+        self.admin.dispose()
+
+    def motor(self):
+        motor = create_engine(migraciones.normalizar_url(self.url))
+        self.motores.append(motor)
+        return motor
+
+    def contar(self, tabla):
+        with self.motor().connect() as conn:
+            return conn.execute(text(f'SELECT COUNT(*) FROM {tabla}')).scalar()
+
+class PruebaMigraciones(PruebaPostgres):
+    def test_idempotentes(self):
+        motor = self.motor()
+        todas = [version for version, _, _ in migraciones.MIGRACIONES]
+        self.assertEqual(migraciones.aplicar_migraciones(motor), todas)
+        self.assertEqual(migraciones.aplicar_migraciones(motor), [])
+        self.assertEqual(self.contar('esquema_version'), len(todas))
+
+    def test_esquema_previo_sin_versiones(self):
+        # Base creada antes con db.create_all(): tablas presentes, sin esquema_version
+        motor = self.motor()
+        with motor.begin() as conn:
+            migraciones._tablas_iniciales(conn)
+            migraciones._desglose_isp(conn)
+        self.assertEqual(len(migraciones.aplicar_migraciones(motor)), len(migraciones.MIGRACIONES))
+
+    def test_workers_simultaneos(self):
+        resultados = []
+        errores = []
+
+        def migrar():
+            try:
+                resultados.append(migraciones.aplicar_migraciones(self.motor()))
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=migrar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        aplicadas = [version for lista in resultados for version in lista]
+        self.assertEqual(sorted(aplicadas), [version for version, _, _ in migraciones.MIGRACIONES])
+        self.assertEqual(self.contar('esquema_version'), len(migraciones.MIGRACIONES))
+
+    def test_espera_el_advisory_lock(self):
+        motor = self.motor()
+        with self.motor().connect() as bloqueo:
+            bloqueo.exec_driver_sql(f"SELECT pg_advisory_lock({migraciones.CLAVE_BLOQUEO})")
+            hilo = threading.Thread(target=migraciones.aplicar_migraciones, args=(motor,))
+            hilo.start()
+            time.sleep(0.5)
+            self.assertTrue(hilo.is_alive())
+            with motor.connect() as conn:
+                self.assertEqual(migraciones.versiones_aplicadas(conn), set())
+            bloqueo.exec_driver_sql(f"SELECT pg_advisory_unlock({migraciones.CLAVE_BLOQUEO})")
+        hilo.join(timeout=30)
+        self.assertFalse(hilo.is_alive())
+        self.assertEqual(self.contar('esquema_version'), len(migraciones.MIGRACIONES))
+
+class PruebaMigrarAPostgres(PruebaPostgres):
+    def setUp(self):
+        super().setUp()
+        descriptor, self.sqlite = tempfile.mkstemp(prefix='skypass_prueba_', suffix='.db')
+        os.close(descriptor)
+        origen = create_engine(f"sqlite:///{self.sqlite}")
+        migraciones.aplicar_migraciones(origen)
+        with origen.begin() as conn:
+            for i in range(1, 6):
+                conn.execute(text(
+                    "INSERT INTO isp (id, nombre, ip_vm, genieacs_url, limite_clientes) "
+                    "VALUES (:id, :nombre, :ip, :url, 100)"
+                ), {'id': i * 10, 'nombre': f"ISP {i}", 'ip': f"10.0.0.{i}", 'url': f"10.0.0.{i}:3000"})
+            # SQLite no exige las claves foráneas: la última alerta es huérfana
+            for isp_id in (10, 10, 20, 999):
+                conn.execute(text("INSERT INTO alerta (isp_id, mensaje, enviada) VALUES (:isp_id, 'prueba', 1)"),
+                             {'isp_id': isp_id})
+        origen.dispose()
+
+    def tearDown(self):
+        os.remove(self.sqlite)
+        super().tearDown()
+
+    def migrar(self, *extra):
+        argv = ['migrar_a_postgres.py', '--sqlite', self.sqlite, '--destino', self.url, '--lote', '2', *extra]
+        salida = io.StringIO()
+        with mock.patch.object(sys, 'argv', argv), redirect_stdout(salida):
+            migrar_a_postgres.main()
+        return salida.getvalue()
+
+    def test_copia_filas_y_omite_huerfanas(self):
+        salida = self.migrar()
+        self.assertEqual(self.contar('isp'), 5)
+        self.assertEqual(self.contar('alerta'), 3)
+        self.assertIn('alerta: 1 filas huérfanas omitidas', salida)
+
+    def test_secuencias_continuan_tras_el_ultimo_id(self):
+        self.migrar()
+        with self.motor().begin() as conn:
+            nuevo = conn.execute(text(
+                "INSERT INTO isp (nombre, ip_vm, genieacs_url, limite_clientes) "
+                "VALUES ('Nuevo', '10.0.1.1', '10.0.1.1:3000', 100) RETURNING id"
+            )).scalar()
+        self.assertEqual(nuevo, 51)
+
+    def test_no_modifica_el_origen(self):
+        with open(self.sqlite, 'rb') as f:
+            antes = hashlib.sha256(f.read()).hexdigest()
+        self.migrar()
+        with open(self.sqlite, 'rb') as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), antes)
+
+    def test_destino_con_datos(self):
+        self.migrar()
+        with self.assertRaises(SystemExit):
+            self.migrar()
+        self.migrar('--vaciar')
+        self.assertEqual(self.contar('isp'), 5)
+
+    def test_filas_que_postgres_rechazaria(self):
+        origen = create_engine(f"sqlite:///{self.sqlite}")
+        with origen.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_isp_ip_vm")
+            conn.exec_driver_sql("UPDATE isp SET ip_vm = '10.0.0.1' WHERE id = 20")
+        origen.dispose()
+
+        salida = io.StringIO()
+        with self.assertRaises(SystemExit), redirect_stdout(salida):
+            with mock.patch.object(sys, 'argv', ['migrar_a_postgres.py', '--sqlite', self.sqlite,
+                                                 '--destino', self.url]):
+                migrar_a_postgres.main()
+        self.assertIn("ip_vm='10.0.0.1' repetido (id 10, 20)", salida.getvalue())
+        self.assertEqual(self.contar('isp'), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro estructurado: formato JSON, cola y supresión de avisos repetidos
+"""
+
+import io
+import os
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registro
+
+def registro_log(nivel=logging.WARNING, mensaje='aviso', **extra):
+    record = logging.LogRecord('skypass.prueba', nivel, __file__, 1, mensaje, None, None)
+    for campo, valor in extra.items():
+        setattr(record, campo, valor)
+    return record
+
+class PruebaFormatoJSON(unittest.TestCase):
+    def test_campos_extra_y_excepcion(self):
+        record = registro_log(isp_id='7', endpoint='/devices', dispositivos=0, otro='no va')
+        record.exc_text = 'Traceback ...'
+        datos = json.loads(registro.FormatoJSON().format(record))
+        self.assertEqual(datos['nivel'], 'WARNING')
+        self.assertEqual(datos['logger'], 'skypass.prueba')
+        self.assertEqual((datos['isp_id'], datos['endpoint'], datos['dispositivos']), ('7', '/devices', 0))
+        self.assertEqual(datos['excepcion'], 'Traceback ...')
+        self.assertNotIn('otro', datos)
+
+class PruebaFiltroRepeticiones(unittest.TestCase):
+    def setUp(self):
+        self.ahora = 1000.0
+        parche = mock.patch.object(registro.time, 'monotonic', lambda: self.ahora)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.filtro = registro.FiltroRepeticiones(ventana_segundos=60)
+
+    def test_un_aviso_por_ventana_y_endpoint(self):
+        self.assertTrue(self.filtro.filter(registro_log(isp_id='1', endpoint='/devices')))
+        self.assertFalse(self.filtro.filter(registro_log(isp_id='1', endpoint='/devices')))
+        self.assertFalse(self.filtro.filter(registro_log(isp_id='1', endpoint='/devices')))
+        self.assertTrue(self.filtro.filter(registro_log(isp_id='1', endpoint='/api/devices')))
+        self.assertTrue(self.filtro.filter(registro_log(isp_id='2', endpoint='/devices')))
+        # Los registros informativos y los que no son de un ISP no se suprimen
+        self.assertTrue(self.filtro.filter(registro_log(logging.INFO, isp_id='1', endpoint='/devices')))
+        self.assertTrue(self.filtro.filter(registro_log()))
+        self.assertTrue(self.filtro.filter(registro_log()))
+
+        self.ahora += 61
+        record = registro_log(isp_id='1', endpoint='/devices')
+        self.assertTrue(self.filtro.filter(record))
+        self.assertEqual(record.repeticiones_suprimidas, 2)
+
+    def test_claves_acotadas(self):
+        with mock.patch.object(registro.FiltroRepeticiones, 'MAXIMO_CLAVES', 10):
+            for i in range(50):
+                self.filtro.filter(registro_log(isp_id=str(i)))
+                self.assertLessEqual(len(self.filtro.vistos), 10)
+            # Las más recientes siguen suprimiéndose
+            self.assertFalse(self.filtro.filter(registro_log(isp_id='49')))
+
+class PruebaHandlerCola(unittest.TestCase):
+    def test_escribe_desde_el_hilo_del_listener(self):
+        salida = io.StringIO()
+        handler_salida = logging.StreamHandler(salida)
+        handler_salida.setFormatter(registro.FormatoJSON())
+        cola = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(cola, handler_salida)
+        listener.start()
+
+        logger = logging.getLogger('skypass.prueba.cola')
+        logger.propagate = False
+        handler = registro.HandlerCola(cola)
+        logger.addHandler(handler)
+        try:
+            logger.warning('Conteo de %s: %d', 'ISP 1', 5, extra={'isp_id': '1', 'dispositivos': 5})
+            try:
+                raise ValueError('roto')
+            except ValueError:
+                logger.exception('Falló el ciclo')
+        finally:
+            logger.removeHandler(handler)
+            listener.stop()
+
+        lineas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual(lineas[0]['mensaje'], 'Conteo de ISP 1: 5')
+        self.assertEqual(lineas[0]['dispositivos'], 5)
+        self.assertIn('ValueError: roto', lineas[1]['excepcion'])
+
+if __name__ == '__main__':
+    unittest.main()
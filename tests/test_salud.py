@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas de /healthz, /readyz y los latidos de las tareas programadas
+"""
+
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from entorno_sqlite import PruebaApp, skypass
+
+class PruebaSalud(PruebaApp):
+    def setUp(self):
+        super().setUp()
+        self.cliente = skypass.app.test_client()
+
+    def latir_todas(self, intervalo=600):
+        for nombre in skypass.tareas_esperadas():
+            skypass.registrar_latido(nombre, intervalo)
+
+    def readyz(self):
+        respuesta = self.cliente.get('/readyz')
+        return respuesta.status_code, respuesta.get_json()
+
+    def test_healthz_y_create_app_idempotente(self):
+        self.assertEqual(self.cliente.get('/healthz').status_code, 200)
+        self.assertIs(skypass.create_app(), skypass.app)
+
+    def test_sin_latidos_no_esta_listo(self):
+        codigo, datos = self.readyz()
+        self.assertEqual(codigo, 503)
+        self.assertEqual(datos['db'], 'ok')
+        self.assertEqual(set(datos['tareas']), set(skypass.tareas_esperadas()))
+        self.assertEqual({t['estado'] for t in datos['tareas'].values()}, {'sin_latido'})
+
+    def test_listo_con_todas_las_tareas_al_dia(self):
+        self.latir_todas()
+        self.latir_todas()
+        self.assertEqual(skypass.LatidoTarea.query.count(), len(skypass.tareas_esperadas()))
+        codigo, datos = self.readyz()
+        self.assertEqual(codigo, 200)
+        self.assertEqual(datos['estado'], 'ok')
+
+    def test_latido_atrasado(self):
+        self.latir_todas(intervalo=60)
+        latido = skypass.LatidoTarea.query.filter_by(nombre='monitoreo').one()
+        latido.latido = datetime.now(timezone.utc) - timedelta(seconds=2 * 60 + 61)
+        skypass.db.session.commit()
+        codigo, datos = self.readyz()
+        self.assertEqual(codigo, 503)
+        self.assertEqual(datos['tareas']['monitoreo']['estado'], 'atrasada')
+        self.assertEqual(datos['tareas']['desglose']['estado'], 'ok')
+
+    def test_hilo_local_detenido(self):
+        self.latir_todas()
+        hilo = threading.Thread(target=lambda: None)
+        hilo.start()
+        hilo.join()
+        with mock.patch.dict(skypass._tareas, {'desglose': {'hilo': hilo}}):
+            codigo, datos = self.readyz()
+        self.assertEqual(codigo, 503)
+        self.assertEqual(datos['tareas']['desglose']['estado'], 'detenida')
+
+    def test_base_de_datos_caida(self):
+        with mock.patch.object(skypass.db.session, 'execute', side_effect=Exception('sin conexión')):
+            codigo, datos = self.readyz()
+        self.assertEqual(codigo, 503)
+        self.assertEqual(datos['db'], 'error')
+        self.assertNotIn('sin conexión', str(datos))
+
+if __name__ == '__main__':
+    unittest.main()